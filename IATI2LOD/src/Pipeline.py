@@ -0,0 +1,313 @@
+## Pipeline.py
+## Runs the crawl, conversion, mapping and gather data scripts as stages of one pipeline.
+
+import fnmatch, glob, hashlib, json, os, subprocess, sys, threading, time
+
+# Settings
+data_folder = "/media/Acer/School/IATI-data/"
+source_folder = os.path.dirname(os.path.abspath(__file__)) + '/'
+state_file = data_folder + "pipeline-state.json"
+log_folder = data_folder + "logs/"
+
+# Number of stages that run at the same time
+max_parallel = 4
+
+# Seconds between the runs of a stage that follows a stage that is still running
+follow_interval = 60
+
+class Stage :
+    '''Class for a script of the pipeline, with the files it reads and writes.'''
+    
+    def __init__(self, name, folder, script, inputs, outputs, always=False, follow=False):
+        '''Initializes the stage.
+        
+        Parameters
+        @name: The name of the stage.
+        @folder: The folder of the script, relative to the source folder.
+        @script: The file name of the script.
+        @inputs: A list of glob patterns of the files read, relative to the data folder.
+        @outputs: A list of the files and folders written, relative to the data folder.
+        @always: True to run the stage on every run, such as the crawl.
+        @follow: True to start the stage as soon as the stages it depends on have
+                 started, running it again until they are done. Only for scripts that
+                 skip the documents they already converted.'''
+        
+        self.name = name
+        self.folder = folder
+        self.script = script
+        self.inputs = inputs
+        self.outputs = outputs
+        self.always = always
+        self.follow = follow
+        
+        self.dependencies = []
+        self.status = 'waiting'
+
+# The stages, the dependencies follow from the inputs and outputs
+stages = [Stage('crawl', 'conversion scripts', 'IatiCrawler.py',
+                [], ['xml/activities/', 'xml/organisations/', 'xml/codelists/'], always=True),
+          Stage('activities', 'conversion scripts', 'ActivitiesToTurtle.py',
+                ['xml/activities/*.xml'], ['activity/'], follow=True),
+          Stage('organisations', 'conversion scripts', 'OrganisationsToTurtle.py',
+                ['xml/organisations/*.xml'], ['organisation/'], follow=True),
+          Stage('codelists', 'conversion scripts', 'CodelistsToTurtle.py',
+                ['xml/codelists/*.xml'], ['codelist/'], follow=True),
+          Stage('schema', 'mapping scripts', 'ExternalMappings.py',
+                [], ['mappings/Schema/']),
+          Stage('geonames-countries', 'mapping scripts', 'GeonamesCountries.py',
+                ['xml/codelists/Country.xml'], ['mappings/Geonames/geonames-countries.ttl']),
+          Stage('factbook-countries', 'mapping scripts', 'FactbookCountries.py',
+                ['xml/codelists/Country.xml'], ['mappings/Factbook/factbook-countries.ttl',
+                                                'mappings/DBPedia/dbpedia-countries-via-factbook.ttl']),
+          Stage('oecd-countries', 'mapping scripts', 'OecdCountries.py',
+                ['mappings/DBPedia/dbpedia-countries-via-factbook.ttl'], ['mappings/OECD/', 'mappings/BFS/',
+                                                                          'mappings/ECB/', 'mappings/FAO/']),
+          Stage('transparency-countries', 'mapping scripts', 'TransparencyCountries.py',
+                ['xml/codelists/Country.xml'], ['mappings/Transparency/']),
+          Stage('worldbank-countries', 'mapping scripts', 'WorldbankCountries.py',
+                ['xml/codelists/Country.xml'], ['mappings/WorldBank/worldbank-countries.ttl', 'mappings/Eurostat/']),
+          Stage('geonames-locations', 'mapping scripts', 'GeonamesLocations.py',
+                ['activity/locations/*.jsonl'], ['mappings/Geonames/geonames-locations.ttl']),
+          Stage('dbpedia-data', 'gather data scripts', 'DbpediaData.py',
+                ['mappings/DBPedia/*.ttl'], ['dataset/DBPedia/']),
+          Stage('factbook-data', 'gather data scripts', 'FactbookData.py',
+                ['mappings/Factbook/factbook-countries.ttl'], ['dataset/Factbook/']),
+          Stage('geonames-data', 'gather data scripts', 'GeonamesData.py',
+                ['mappings/Geonames/geonames-countries.ttl', 'mappings/Geonames/geonames-locations.ttl'],
+                ['dataset/Geonames/']),
+          Stage('worldbank-data', 'gather data scripts', 'WorldbankData.py',
+                ['mappings/WorldBank/worldbank-countries.ttl'], ['dataset/WorldBank/worldbank-indicators.ttl'])]
+
+print_lock = threading.Lock()
+
+def report(message):
+    '''Prints a message without mixing it with the messages of other threads.
+    
+    Parameters
+    @message: The message to print.'''
+    
+    with print_lock:
+        print time.strftime('%H:%M:%S') + " " + message
+
+def produces(stage, pattern):
+    '''Checks whether a stage writes files that match an input pattern.
+    
+    Parameters
+    @stage: A Stage.
+    @pattern: A glob pattern relative to the data folder.
+    
+    Returns
+    @produces: True if one of the outputs of the stage contains the pattern.'''
+    
+    for output in stage.outputs:
+        if output.endswith('/') and pattern.startswith(output):
+            return True
+        
+        if fnmatch.fnmatch(output, pattern):
+            return True
+    
+    return False
+
+def link_stages(stages):
+    '''Sets the dependencies of each stage to the stages that write its inputs.
+    
+    Parameters
+    @stages: A list of Stages.'''
+    
+    for stage in stages:
+        stage.dependencies = [other for other in stages
+                              if (not other == stage) and
+                                 (any([produces(other, pattern) for pattern in stage.inputs]))]
+
+def fingerprint(stage):
+    '''Returns a fingerprint of the sources and the inputs of a stage. The sources are
+    all modules in the folder of the script, since the scripts import their siblings.
+    The inputs are compared by name, size and modification time, so they are not read.
+    
+    Parameters
+    @stage: A Stage.
+    
+    Returns
+    @fingerprint: The hexadecimal md5 hash of the sources and inputs.'''
+    
+    hash = hashlib.md5()
+    
+    for file_name in sorted(glob.glob(source_folder + stage.folder + '/*.py')):
+        with open(file_name, 'rb') as source_file:
+            hash.update(os.path.basename(file_name) + '\n' + source_file.read())
+    
+    for pattern in stage.inputs:
+        for file_name in sorted(glob.glob(data_folder + pattern)):
+            status = os.stat(file_name)
+            hash.update(file_name + ' ' + str(status.st_size) + ' ' + str(status.st_mtime) + '\n')
+    
+    return hash.hexdigest()
+
+def load_state():
+    '''Returns the fingerprints of the last successful run of each stage.
+    
+    Returns
+    @state: A dictionary of stage name to fingerprint.'''
+    
+    try:
+        with open(state_file, 'r') as file:
+            return json.load(file)
+    
+    except (IOError, ValueError):
+        return {}
+
+def store_state(state):
+    '''Stores the fingerprints of the stages.
+    
+    Parameters
+    @state: A dictionary of stage name to fingerprint.'''
+    
+    with open(state_file + '.tmp', 'w') as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    
+    os.rename(state_file + '.tmp', state_file)
+
+def up_to_date(stage, state):
+    '''Checks whether a stage can be skipped, because its script and inputs did not
+    change since its last successful run and its outputs exist.
+    
+    Parameters
+    @stage: A Stage.
+    @state: A dictionary of stage name to fingerprint.
+    
+    Returns
+    @skip: True if the stage does not have to run.'''
+    
+    if stage.always:
+        return False
+    
+    if not state.get(stage.name) == fingerprint(stage):
+        return False
+    
+    for output in stage.outputs:
+        if not os.path.exists(data_folder + output):
+            return False
+    
+    return True
+
+def run_script(stage, log_file):
+    '''Runs the script of a stage in its own folder, so its imports resolve.
+    
+    Parameters
+    @stage: A Stage.
+    @log_file: An open file for the output of the script.
+    
+    Returns
+    @success: True if the script exited without error.'''
+    
+    return subprocess.call([sys.executable, stage.script], cwd=source_folder + stage.folder,
+                           stdout=log_file, stderr=subprocess.STDOUT) == 0
+
+def run_stage(stage, state, state_lock):
+    '''Runs a stage, which runs in a thread of its own. A following stage runs its
+    script again until the stages it depends on are done, and once more after that.
+    
+    Parameters
+    @stage: A Stage.
+    @state: A dictionary of stage name to fingerprint.
+    @state_lock: A lock for the state.'''
+    
+    report("Started " + stage.name + "...")
+    
+    success = True
+    
+    with open(log_folder + stage.name + '.log', 'a') as log_file:
+        while stage.follow and any([dependency.status == 'running' for dependency in stage.dependencies]):
+            success = run_script(stage, log_file)
+            
+            if not success:
+                break
+            
+            time.sleep(follow_interval)
+        
+        if success:
+            stage_fingerprint = fingerprint(stage)
+            success = run_script(stage, log_file)
+    
+    if success:
+        with state_lock:
+            state[stage.name] = stage_fingerprint
+            store_state(state)
+        
+        stage.status = 'done'
+        report("Finished " + stage.name)
+    
+    else:
+        stage.status = 'failed'
+        report("Failed " + stage.name + ", see " + log_folder + stage.name + '.log')
+
+def ready(stage):
+    '''Checks whether a waiting stage can start.
+    
+    Parameters
+    @stage: A Stage.
+    
+    Returns
+    @ready: True if all dependencies are done, or for a following stage, all have started.'''
+    
+    for dependency in stage.dependencies:
+        if dependency.status in ['done', 'skipped']:
+            continue
+        
+        if (stage.follow) and (dependency.status == 'running'):
+            continue
+        
+        return False
+    
+    return True
+
+def main():
+    '''Runs the stages of the pipeline, independent stages at the same time. Stages of
+    which a dependency failed are not run.'''
+    
+    if not os.path.isdir(log_folder):
+        os.makedirs(log_folder)
+    
+    link_stages(stages)
+    
+    state = load_state()
+    state_lock = threading.Lock()
+    threads = {}
+    
+    while True:
+        # Stages that depend on a failed stage cannot run
+        for stage in stages:
+            if (stage.status == 'waiting') and (any([dependency.status in ['failed', 'blocked']
+                                                     for dependency in stage.dependencies])):
+                stage.status = 'blocked'
+                report("Not running " + stage.name + ", a stage it depends on failed")
+        
+        for stage in stages:
+            if not ((stage.status == 'waiting') and (ready(stage))):
+                continue
+            
+            if (not any([dependency.status == 'running' for dependency in stage.dependencies])) and \
+               (up_to_date(stage, state)):
+                stage.status = 'skipped'
+                report("Skipped " + stage.name + ", its inputs did not change")
+                continue
+            
+            if len([thread for thread in threads.values() if thread.is_alive()]) >= max_parallel:
+                break
+            
+            stage.status = 'running'
+            threads[stage.name] = threading.Thread(target=run_stage, args=(stage, state, state_lock))
+            threads[stage.name].start()
+        
+        if not any([stage.status in ['waiting', 'running'] for stage in stages]):
+            break
+        
+        time.sleep(1)
+    
+    for stage in stages:
+        print stage.name + ": " + stage.status
+    
+    print "Done!"
+
+if __name__ == "__main__":
+    main()
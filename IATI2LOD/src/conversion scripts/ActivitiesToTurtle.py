@@ -1,10 +1,252 @@
 ## By Kasper Brandt
 ## Last updated on 22-05-2013
 
-import glob, json, sys, os, IatiConverter, AttributeHelper, AddProvenance
+import glob, json, sys, os, itertools, multiprocessing, IatiConverter, IatiElements, AttributeHelper, AddProvenance
+import TripleSink, ConversionManifest, HandlerStatistics
 import xml.etree.ElementTree as ET
 from rdflib import Namespace, Graph, Literal, URIRef
 
+def parse_activities(document, streaming):
+    '''Parses an activity XML and yields the activities one by one.
+    In streaming mode the XML is parsed incrementally: each iati-activity element is
+    yielded as soon as it is complete and cleared afterwards, so memory use depends
+    on the size of one activity instead of the whole document.
+    
+    Parameters
+    @document: The location of the XML file.
+    @streaming: True to parse incrementally, False to parse the whole tree at once.
+    
+    Returns
+    @version: The version of the iati-activities element.
+    @linked_data_default: The Linked Data default of the iati-activities element.
+    @activity: An ElementTree of an activity.'''
+    
+    if not streaming:
+        root = ET.parse(document).getroot()
+        version = AttributeHelper.attribute_key(root, 'version')
+        linked_data_default = AttributeHelper.attribute_key(root, 'linked-data-default')
+        
+        for activity in root.findall('iati-activity'):
+            yield version, linked_data_default, activity
+        
+        return
+    
+    root = None
+    depth = 0
+    
+    for event, element in ET.iterparse(document, events=('start', 'end')):
+        
+        if event == 'start':
+            if root == None:
+                root = element
+                version = AttributeHelper.attribute_key(root, 'version')
+                linked_data_default = AttributeHelper.attribute_key(root, 'linked-data-default')
+            
+            depth += 1
+        
+        else:
+            depth -= 1
+            
+            # Only activities that are direct children of the root
+            if (depth == 1) and (element.tag == 'iati-activity'):
+                yield version, linked_data_default, element
+                
+                element.clear()
+                root.remove(element)
+
+def write_locations(records, file_name):
+    '''Writes location records to a JSON lines file, one location per line. The file is
+    written under a temporary name first, so a partly written file is never read.
+    
+    Parameters
+    @records: A list of dictionaries of location information.
+    @file_name: The location of the file.'''
+    
+    with open(file_name + '.part', 'w') as locations_file:
+        for record in records:
+            locations_file.write(json.dumps(record, sort_keys=True) + '\n')
+    
+    os.rename(file_name + '.part', file_name)
+
+def convert_document(document, turtle_folder, Iati, streaming, output_format='turtle', bundle='activity',
+                     statistics=False, locations=False):
+    '''Converts the activities of one XML file to Turtle files and writes the provenance
+    of the document. Runs in a worker process when documents are converted in parallel.
+    
+    Parameters
+    @document: The location of the XML file.
+    @turtle_folder: The folder in which the Turtle folder of the document is created.
+    @Iati: The IATI RDFLib Namespace.
+    @streaming: True to parse the XML incrementally.
+    @output_format: 'turtle' to serialize a RDFLib Graph per activity, or 'ntriples' to
+                    write the triples of each activity directly to a N-Triples file.
+    @bundle: 'activity' to write a file per activity in a folder per document, or
+             'document' to write all activities of the document to one N-Quads file
+             in the named graph of the document, together with its provenance.
+    @statistics: True to keep HandlerStatistics of the handler calls.
+    @locations: True to write a record of each location to locations/<document>.jsonl
+                in the turtle folder.
+    
+    Returns
+    @result: A dictionary with the document name, the ids of the activities in order
+             (None for an activity without identifier), the failed elements,
+             whether the document could be parsed, the output files and the
+             handler statistics (or None).'''
+    
+    if statistics:
+        statistics = HandlerStatistics.HandlerStatistics()
+    else:
+        statistics = None
+    
+    if locations:
+        location_records = []
+    else:
+        location_records = None
+    
+    activity_ids = []
+    activities = []
+    failed_elements = []
+    files = []
+    
+    doc_id = str(document.rsplit('/',1)[1])[:-4]
+    doc_folder = turtle_folder + doc_id + '/'
+    
+    if bundle == 'document':
+        # All triples of the document are written to one N-Quads file
+        bundle_file_name = turtle_folder + doc_id + '.nq'
+        bundle_file = open(bundle_file_name + '.part', 'w')
+        bundle_sink = TripleSink.NTriplesSink(bundle_file)
+        named_graph = Iati['graph/activity/' + doc_id]
+    
+    elif not os.path.isdir(doc_folder):
+        os.makedirs(doc_folder)
+    
+    failed = False
+    last_updated = None
+    version = None
+    
+    provenance = Graph()
+    provenance.bind('iati', Iati)
+    
+    # Parse the XML file and convert each activity in XML file to RDFLib Graph
+    try:
+        for document_version, linked_data_default, activity in parse_activities(document, streaming):
+            
+            graph, id, fails = None, None, None
+            
+            try:
+                converter = IatiConverter.ConvertActivity(activity, document_version, linked_data_default)
+                
+                if (bundle == 'document') and (not converter.id == None) and (not converter.id == ""):
+                    # Write activity to the N-Quads file of the document while converting
+                    bundle_sink.start(named_graph)
+                    graph, id, last_updated, version, fails = converter.convert(Iati, bundle_sink, statistics,
+                                                                                location_records)
+                elif (output_format == 'ntriples') and (not converter.id == None) and (not converter.id == ""):
+                    # Write activity to N-Triples while converting, without a RDFLib Graph
+                    with open(doc_folder + str(converter.id.replace('/','%2F')) + '.nt', 'w') as nt_file:
+                        graph, id, last_updated, version, fails = converter.convert(Iati, TripleSink.NTriplesSink(nt_file),
+                                                                                    statistics, location_records)
+                else:
+                    graph, id, last_updated, version, fails = converter.convert(Iati, None, statistics, location_records)
+            except TypeError as e:
+                print "Error in " + document + ":" + str(e)
+            
+            if not fails == None:
+                for fail in fails:
+                    if not fail in failed_elements:
+                        failed_elements.append(fail)
+                        
+            if (not graph == None) and (not id == None):
+                if (bundle == 'activity') and (not output_format == 'ntriples'):
+                    # Write activity to Turtle and store in local folder
+                    graph_turtle = graph.serialize(format='turtle') 
+                    
+                    with open(doc_folder + str(id.replace('/','%2F')) + '.ttl', 'w') as turtle_file:
+                        turtle_file.write(graph_turtle)
+                    
+                activity_ids.append(id)
+                activities.append(id)
+                
+            else:
+                activities.append(None)
+    
+    except ET.ParseError:
+        print "Could not parse file " + document
+        failed = True
+        
+    if not failed == True:
+        # Add provenance from corresponding JSON file
+        json_document = document[:-4] + '.json'
+        
+        try:
+            with open(json_document, 'r') as open_json_doc:
+                json_parsed = json.load(open_json_doc)
+        except:
+            print "Could not parse file " + json_document
+            json_parsed = None
+        
+        provenance_converter = IatiConverter.ConvertProvenance('activity', json_parsed, provenance, 
+                                                               doc_id, last_updated, version, activity_ids)
+        provenance = provenance_converter.convert(Iati)
+        
+        if bundle == 'document':
+            # Provenance is about the named graph, so it goes in the default graph
+            bundle_sink.start()
+            
+            for triple in provenance:
+                bundle_sink.add(triple)
+        
+        else:
+            # Write provenance graph to Turtle and store in local folder
+            provenance_turtle = provenance.serialize(format='turtle')
+            
+            with open(doc_folder + 'provenance-' + doc_id + '.ttl', 'w') as turtle_file:
+                turtle_file.write(provenance_turtle)
+            
+            files.append(doc_folder + 'provenance-' + doc_id + '.ttl')
+            
+            for id in activity_ids:
+                if output_format == 'ntriples':
+                    files.append(doc_folder + str(id.replace('/','%2F')) + '.nt')
+                else:
+                    files.append(doc_folder + str(id.replace('/','%2F')) + '.ttl')
+    
+    if bundle == 'document':
+        bundle_file.close()
+        
+        if failed == True:
+            os.remove(bundle_file_name + '.part')
+        else:
+            # Only replace the previous file once the document is complete
+            os.rename(bundle_file_name + '.part', bundle_file_name)
+            files.append(bundle_file_name)
+    
+    if (locations) and (not failed == True):
+        if not os.path.isdir(turtle_folder + 'locations/'):
+            os.makedirs(turtle_folder + 'locations/')
+        
+        write_locations(location_records, turtle_folder + 'locations/' + doc_id + '.jsonl')
+        files.append(turtle_folder + 'locations/' + doc_id + '.jsonl')
+    
+    return dict([('document', document),
+                 ('activities', activities),
+                 ('failed_elements', failed_elements),
+                 ('failed', failed),
+                 ('files', files),
+                 ('statistics', getattr(statistics, 'handlers', None))])
+
+def convert_document_arguments(arguments):
+    '''Calls convert_document with a tuple of arguments, for use with a Pool.
+    
+    Parameters
+    @arguments: A tuple of the arguments of convert_document.
+    
+    Returns
+    @result: The result of convert_document.'''
+    
+    return convert_document(*arguments)
+
 def main():
     '''Converts Activity XMLs to Turtle files and stores these to local folder.'''
     
@@ -13,6 +255,35 @@ def main():
     turtle_folder = "/media/Acer/School/IATI-data/activity/"
     Iati = Namespace("http://purl.org/collections/iati/")
     
+    # Parse documents incrementally instead of building the whole tree in memory
+    streaming = True
+    
+    # Either 'turtle' (RDFLib Graph per activity) or 'ntriples' (written directly)
+    output_format = 'turtle'
+    
+    # Either 'activity' (a file per activity in a folder per document) or 'document'
+    # (one N-Quads file per document, with the activities in a named graph per document)
+    bundle = 'activity'
+    
+    # With bundle 'document', the document files are joined into N-Quads shards of
+    # about this many bytes, or None to keep one file per document
+    shard_size = None
+    
+    # A .json or .csv file to write the calls, time, triples and failures per handler
+    # to, or None to not keep handler statistics
+    statistics_file = None
+    
+    # Write a record of the label, coordinates and country of each location to
+    # locations/<document>.jsonl, which GeonamesLocations reads
+    locations = True
+    
+    # Number of documents converted in parallel, 1 converts in this process
+    processes = multiprocessing.cpu_count()
+    
+    # Only convert new and changed documents, according to the conversion manifest.
+    # Not used with shards, since the shards are written again on every run.
+    incremental = True
+    
     if not os.path.isdir(turtle_folder):
         os.makedirs(turtle_folder)
     
@@ -20,93 +291,89 @@ def main():
     activity_count = 1
     
     failed_elements = []
+    statistics = HandlerStatistics.HandlerStatistics()
+    
+    if (bundle == 'document') and (not shard_size == None):
+        shards = TripleSink.ShardWriter(turtle_folder + 'activities', '.nq', shard_size)
+    else:
+        shards = None
     
     # Retrieve XML files from the XML folder
-    for document in glob.glob(xml_folder + '*.xml'):
+    documents = sorted(glob.glob(xml_folder + '*.xml'))
+    
+    if (incremental) and (shards == None):
+        code_version = ConversionManifest.code_version(ConversionManifest.converter_modules(sys.modules[__name__]),
+                                                       [output_format, bundle, locations])
+        manifest = ConversionManifest.ConversionManifest(turtle_folder + 'manifest.json', code_version)
         
-        activity_ids = []
+        for name in manifest.remove_documents(documents):
+            print "Removed: Document " + name
         
-        doc_id = str(document.rsplit('/',1)[1])[:-4]
-        doc_folder = turtle_folder + doc_id + '/'
+        unchanged = len(documents)
+        documents = [document for document in documents if manifest.needs_conversion(document)]
+        unchanged -= len(documents)
         
-        if not os.path.isdir(doc_folder):
-            os.makedirs(doc_folder)
+        print "Unchanged: " + str(unchanged) + " documents, converting " + str(len(documents)) + " documents"
+    else:
+        manifest = None
+    
+    arguments = [(document, turtle_folder, Iati, streaming, output_format, bundle, not statistics_file == None,
+                  locations) for document in documents]
+    
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        # Results are returned in document order, so the progress below is deterministic
+        results = pool.imap(convert_document_arguments, arguments)
+    else:
+        pool = None
+        results = itertools.imap(convert_document_arguments, arguments)
+    
+    for result in results:
+        document = result['document']
         
-        failed = False
+        for id in result['activities']:
+            if not id == None:
+                print "Processing: Activity %s (# %s) in document %s (# %s)" % (str(id.replace('/','%2F')), 
+                                                                                str(activity_count),
+                                                                                str(document.rsplit('/',1)[1]), 
+                                                                                str(document_count))
+            else:
+                print "WARNING: Activity (# %s) in %s (# %s) has no identifier specified" % (str(activity_count),
+                                                                                             str(document.rsplit('/',1)[1]),
+                                                                                             str(document_count)) 
+            
+            activity_count += 1
         
-        graph = Graph()
-        provenance = Graph()
-        provenance.bind('iati', Iati)
+        for fail in result['failed_elements']:
+            if not fail in failed_elements:
+                failed_elements.append(fail)
         
-        # Parse the XML file
-        try:
-            xml = ET.parse(document)
-        except ET.ParseError:
-            print "Could not parse file " + document
-            failed = True
-            
-        # Get the version
-        if not failed == True:
-            root = xml.getroot()
-            version = AttributeHelper.attribute_key(root, 'version')
-            linked_data_default = AttributeHelper.attribute_key(root, 'linked-data-default')
-        
-            # Convert each activity in XML file to RDFLib Graph
-            for activity in xml.findall('iati-activity'):
-                
-                try:
-                    converter = IatiConverter.ConvertActivity(activity, version, linked_data_default)
-                    graph, id, last_updated, version, fails = converter.convert(Iati)
-                except TypeError as e:
-                    print "Error in " + document + ":" + str(e)
-                
-                if not fails == None:
-                    for fail in fails:
-                        if not fail in failed_elements:
-                            failed_elements.append(fail)
-                            
-                if (not graph == None) and (not id == None):
-                    print "Processing: Activity %s (# %s) in document %s (# %s)" % (str(id.replace('/','%2F')), 
-                                                                                    str(activity_count),
-                                                                                    str(document.rsplit('/',1)[1]), 
-                                                                                    str(document_count))
-                    
-                    # Write activity to Turtle and store in local folder
-                    graph_turtle = graph.serialize(format='turtle') 
-                    
-                    with open(doc_folder + str(id.replace('/','%2F')) + '.ttl', 'w') as turtle_file:
-                        turtle_file.write(graph_turtle)
-                        
-                    activity_ids.append(id)
-                    
-                else:
-                    print "WARNING: Activity (# %s) in %s (# %s) has no identifier specified" % (str(activity_count),
-                                                                                                 str(document.rsplit('/',1)[1]),
-                                                                                                 str(document_count)) 
-                            
-                activity_count += 1
-                       
+        if not result['statistics'] == None:
+            statistics.merge(result['statistics'])
+        
+        if not result['failed'] == True:
             document_count += 1
-
-            # Add provenance from corresponding JSON file
-            json_document = document[:-4] + '.json'
             
-            try:
-                with open(json_document, 'r') as open_json_doc:
-                    json_parsed = json.load(open_json_doc)
-            except:
-                print "Could not parse file " + json_document
-                json_parsed = None
-            
-            provenance_converter = IatiConverter.ConvertProvenance('activity', json_parsed, provenance, 
-                                                                   doc_id, last_updated, version, activity_ids)
-            provenance = provenance_converter.convert(Iati)
-
-            # Write provenance graph to Turtle and store in local folder
-            provenance_turtle = provenance.serialize(format='turtle')
-            
-            with open(doc_folder + 'provenance-' + doc_id + '.ttl', 'w') as turtle_file:
-                turtle_file.write(provenance_turtle)
+            if not manifest == None:
+                manifest.record(document, result['files'])
+        
+        if (bundle == 'document') and (not shard_size == None):
+            for file_name in result['files']:
+                if file_name.endswith('.nq'):
+                    shards.add(file_name)
+    
+    if not pool == None:
+        pool.close()
+        pool.join()
+    
+    if not shards == None:
+        shards.close()
+    
+    if not manifest == None:
+        manifest.save()
+    
+    if not statistics_file == None:
+        statistics.write(statistics_file)
         
     print "Failed:"
     
@@ -1,11 +1,120 @@
 from rdflib import Literal
 
+class ElementIndex :
+    '''Class for indexing the children of an XML element by tag in a single pass.
+    It offers the find, findall, attrib and text of an ElementTree element, so it
+    can be used in place of the element by the handlers and the functions below,
+    without scanning the children again for every lookup.'''
+    
+    def __init__(self, xml):
+        '''Initializes the index.
+        
+        Parameters
+        @xml: An ElementTree.'''
+        
+        self.xml = xml
+        self.tag = xml.tag
+        self.attrib = xml.attrib
+        self.text = xml.text
+        self.tail = xml.tail
+        
+        self.children = {}
+        
+        for child in xml:
+            self.children.setdefault(child.tag, []).append(child)
+    
+    def find(self, tag):
+        '''Returns the first child with a tag or None if not present.
+        
+        Parameters
+        @tag: A string of the tag or an ElementPath.
+        
+        Returns
+        @element: An ElementTree or None.'''
+        
+        try:
+            return self.children[tag][0]
+        
+        except KeyError:
+            if is_path(tag):
+                return self.xml.find(tag)
+            
+            return None
+    
+    def findall(self, tag):
+        '''Returns all children with a tag.
+        
+        Parameters
+        @tag: A string of the tag or an ElementPath.
+        
+        Returns
+        @elements: A list of ElementTrees.'''
+        
+        try:
+            return list(self.children[tag])
+        
+        except KeyError:
+            if is_path(tag):
+                return self.xml.findall(tag)
+            
+            return []
+    
+    def get(self, key, default=None):
+        '''Returns the value of a key of the element.
+        
+        Parameters
+        @key: A string of the key.
+        @default: The value if the key is not present.
+        
+        Returns
+        @value: The value of the key.'''
+        
+        return self.xml.get(key, default)
+    
+    def __iter__(self):
+        return iter(self.xml)
+    
+    def __len__(self):
+        return len(self.xml)
+
+def is_path(tag):
+    '''Checks whether a find argument is an ElementPath rather than a plain tag.
+    
+    Parameters
+    @tag: A string of the tag or an ElementPath.
+    
+    Returns
+    @path: True if the argument is an ElementPath.'''
+    
+    if tag.startswith("{"):
+        tag = tag.split("}", 1)[-1]
+    
+    for character in "/.*[":
+        if character in tag:
+            return True
+    
+    return False
+
+def index(xml):
+    '''Returns the child index of an XML element, building it if needed.
+    
+    Parameters
+    @xml: An ElementTree or an ElementIndex.
+    
+    Returns
+    @index: An ElementIndex.'''
+    
+    if isinstance(xml, ElementIndex):
+        return xml
+    
+    return ElementIndex(xml)
+
 def attribute_key(xml, key):
     '''Checks whether a key is in the XML.
     Returns the value of the key or None if not present.
     
     Parameters
-    @xml: An ElementTree.
+    @xml: An ElementTree or an ElementIndex.
     @key: A string of the key.
     
     Returns
@@ -27,7 +136,7 @@ def attribute_text(xml, attribute):
     Returns the value of the text or None if not present.
     
     Parameters
-    @xml: An ElementTree.
+    @xml: An ElementTree or an ElementIndex.
     @attribute: A string of the attribute.
     
     Returns
@@ -1,7 +1,7 @@
 ## By Kasper Brandt
 ## Last updated on 22-05-2013
 
-import glob, sys, os, IatiConverter, AttributeHelper, AddProvenance, datetime
+import glob, sys, os, IatiConverter, IatiElements, AttributeHelper, AddProvenance, ConversionManifest, datetime
 import xml.etree.ElementTree as ET
 from rdflib import Namespace, Graph, Literal, URIRef, RDF
 
@@ -12,6 +12,9 @@ def main():
     xml_folder = "/media/Acer/School/IATI-data/xml/codelists/"
     turtle_folder = "/media/Acer/School/IATI-data/codelist/"
     Iati = Namespace("http://purl.org/collections/iati/")
+    
+    # Only convert new and changed documents, according to the conversion manifest
+    incremental = True
         
     if not os.path.isdir(turtle_folder):
         os.makedirs(turtle_folder)
@@ -20,8 +23,24 @@ def main():
     
     total_elapsed_time = 0
     
+    documents = glob.glob(xml_folder + '*.xml')
+    
+    if incremental:
+        code_version = ConversionManifest.code_version(ConversionManifest.converter_modules(sys.modules[__name__]))
+        manifest = ConversionManifest.ConversionManifest(turtle_folder + 'manifest.json', code_version)
+        
+        for name in manifest.remove_documents(documents):
+            print "Removed: Document " + name
+    else:
+        manifest = None
+    
     # Retrieve XML files from the XML folder
-    for document in glob.glob(xml_folder + '*.xml'):
+    for document in documents:
+        
+        if (not manifest == None) and (not manifest.needs_conversion(document)):
+            continue
+        
+        files = []
         
         doc_id = str(document.rsplit('/',1)[1])[:-4]
         doc_folder = turtle_folder + doc_id + '/'
@@ -52,6 +71,8 @@ def main():
             with open(doc_folder + id.replace('/','%2F') + '.ttl', 'w') as turtle_file:
                 turtle_file.write(graph_turtle)
             
+            files.append(doc_folder + id.replace('/','%2F') + '.ttl')
+            
             # Add provenance of last-updated, version and source document
             provenance.add((URIRef(Iati + 'graph/codelist/' + str(id)),
                             URIRef(Iati + 'last-updated'),
@@ -88,6 +109,14 @@ def main():
         with open(doc_folder + 'provenance-' + str(id) + '.ttl', 'w') as turtle_file:
             turtle_file.write(provenance_turtle)
         
+        files.append(doc_folder + 'provenance-' + str(id) + '.ttl')
+        
+        if not manifest == None:
+            manifest.record(document, files)
+    
+    if not manifest == None:
+        manifest.save()
+    
     print "Done!"
 
 if __name__ == "__main__":
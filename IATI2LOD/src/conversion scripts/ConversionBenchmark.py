@@ -0,0 +1,107 @@
+## ConversionBenchmark.py
+## Measures the conversion throughput of IatiConverter.ConvertActivity on synthetic documents.
+
+import os, sys, time, random, resource, StringIO, IatiConverter, TripleSink, HandlerStatistics
+import ActivitiesToTurtle, SyntheticActivities
+from rdflib import Namespace
+
+def peak_memory():
+    '''Returns the peak resident set size of this process.
+    
+    Returns
+    @peak: The peak RSS in megabytes.'''
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    # Kilobytes on Linux, bytes on Mac OS X
+    if sys.platform == 'darwin':
+        return peak / (1024.0 * 1024.0)
+    
+    return peak / 1024.0
+
+def run(documents, Iati, streaming, output_format, statistics):
+    '''Converts the activities of a list of documents.
+    
+    Parameters
+    @documents: A list of XML strings.
+    @Iati: The IATI RDFLib Namespace.
+    @streaming: True to parse the XML incrementally.
+    @output_format: 'graph' to convert to a RDFLib Graph, 'turtle' to also serialize
+                    it, or 'ntriples' to write to a N-Triples sink.
+    @statistics: The HandlerStatistics to record the handler calls in.
+    
+    Returns
+    @activities: The number of converted activities.
+    @triples: The number of triples.'''
+    
+    activities = 0
+    triples = 0
+    
+    with open(os.devnull, 'w') as null_file:
+        for document in documents:
+            for version, linked_data_default, activity in ActivitiesToTurtle.parse_activities(StringIO.StringIO(document),
+                                                                                              streaming):
+                converter = IatiConverter.ConvertActivity(activity, version, linked_data_default)
+                
+                if output_format == 'ntriples':
+                    graph, id, last_updated, version, fails = converter.convert(Iati, TripleSink.NTriplesSink(null_file), statistics)
+                else:
+                    graph, id, last_updated, version, fails = converter.convert(Iati, None, statistics)
+                    
+                    if output_format == 'turtle':
+                        null_file.write(graph.serialize(format='turtle'))
+                
+                activities += 1
+                triples += len(graph)
+    
+    return activities, triples
+
+def main():
+    '''Generates synthetic activity documents in memory, converts them and reports the
+    throughput, the peak memory use and the time spent per handler.'''
+    
+    # Settings
+    Iati = Namespace("http://purl.org/collections/iati/")
+    documents = 5
+    seed = 1
+    
+    # Parse documents incrementally instead of building the whole tree in memory
+    streaming = True
+    
+    # Either 'graph', 'turtle' or 'ntriples', see run
+    output_format = 'graph'
+    
+    settings = dict([('activities', 200),
+                     ('transactions', 5),
+                     ('locations', 2),
+                     ('results', 1),
+                     ('periods', 2),
+                     ('extensions', 1)])
+    
+    generator = random.Random(seed)
+    
+    print "Generating " + str(documents) + " documents of " + str(settings['activities']) + " activities..."
+    
+    xml_documents = [SyntheticActivities.generate_document(generator, number, settings) for number in range(documents)]
+    
+    statistics = HandlerStatistics.HandlerStatistics()
+    
+    start = time.time()
+    activities, triples = run(xml_documents, Iati, streaming, output_format, statistics)
+    elapsed = time.time() - start
+    
+    print "Activities: %d in %.2f seconds (%.1f activities/sec)" % (activities, elapsed, activities / elapsed)
+    print "Triples: %d (%.1f triples/sec)" % (triples, triples / elapsed)
+    print "Peak RSS: %.1f MB" % peak_memory()
+    print
+    print "%-22s %10s %10s %8s %10s %9s" % ("Handler", "Calls", "Seconds", "Share", "Triples", "Failures")
+    
+    for name, handler in sorted(statistics.handlers.items(), key=lambda item: item[1]['seconds'], reverse=True):
+        print "%-22s %10d %10.3f %7.1f%% %10d %9d" % (name, handler['calls'], handler['seconds'],
+                                                      100 * handler['seconds'] / elapsed,
+                                                      handler['triples'], handler['failures'])
+    
+    print "Done!"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+## ConversionManifest.py
+## Records the source hash and output files of each converted document, so a
+## rerun only converts new or changed documents.
+
+import hashlib, json, os, types
+
+# Settings
+chunk_size = 1024 * 1024
+save_interval = 100
+
+def file_hash(file_name):
+    '''Returns the md5 hash of a file, read in chunks.
+    
+    Parameters
+    @file_name: The location of the file.
+    
+    Returns
+    @hash: The hexadecimal md5 hash.'''
+    
+    hash = hashlib.md5()
+    
+    with open(file_name, 'rb') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            
+            if not chunk:
+                break
+            
+            hash.update(chunk)
+    
+    return hash.hexdigest()
+
+def converter_modules(module):
+    '''Returns a module and the modules of its folder that it imports, directly or
+    through each other, so the code version covers every module of the conversion.
+    
+    Parameters
+    @module: The module of the conversion script.
+    
+    Returns
+    @modules: A list of the modules, sorted by name.'''
+    
+    folder = os.path.dirname(os.path.abspath(module.__file__))
+    
+    modules = {}
+    pending = [module]
+    
+    while pending:
+        current = pending.pop()
+        
+        if current.__name__ in modules:
+            continue
+        
+        modules[current.__name__] = current
+        
+        for value in vars(current).values():
+            if (isinstance(value, types.ModuleType)) and (hasattr(value, '__file__')) and \
+               (os.path.dirname(os.path.abspath(value.__file__)) == folder):
+                pending.append(value)
+    
+    return [modules[name] for name in sorted(modules.keys())]
+
+def code_version(modules, settings=None):
+    '''Returns a version of the converter code, which changes whenever the source
+    of one of the modules or one of the output settings changes.
+    
+    Parameters
+    @modules: A list of the modules used for the conversion, see converter_modules.
+    @settings: A list of settings that influence the output or None.
+    
+    Returns
+    @version: The hexadecimal md5 hash of the sources and settings.'''
+    
+    hash = hashlib.md5()
+    
+    for module in modules:
+        hash.update(file_hash(os.path.splitext(module.__file__)[0] + '.py'))
+    
+    if not settings == None:
+        hash.update(repr(settings))
+    
+    return hash.hexdigest()
+
+class ConversionManifest :
+    '''Class for keeping the conversion manifest of a folder of XML documents in a
+    JSON file. Each entry holds the hash, size and modification time of the source,
+    the code version that converted it and the output files.'''
+    
+    def __init__(self, file_name, version):
+        '''Initializes the manifest.
+        
+        Parameters
+        @file_name: The location of the JSON file.
+        @version: The code version of the current run, see code_version.'''
+        
+        self.file_name = file_name
+        self.version = version
+        self.changes = 0
+        
+        try:
+            with open(self.file_name, 'r') as manifest_file:
+                self.documents = json.load(manifest_file)['documents']
+        
+        except (IOError, ValueError, KeyError):
+            self.documents = {}
+    
+    def source_hash(self, document):
+        '''Returns the hash of a source document. The stored hash is reused when the
+        size and modification time did not change, so unchanged files are not read.
+        
+        Parameters
+        @document: The location of the XML file.
+        
+        Returns
+        @hash: The hexadecimal md5 hash of the file.'''
+        
+        status = os.stat(document)
+        entry = self.documents.get(os.path.basename(document))
+        
+        if (not entry == None) and (entry['size'] == status.st_size) and (entry['modified'] == status.st_mtime):
+            return entry['hash']
+        
+        return file_hash(document)
+    
+    def needs_conversion(self, document):
+        '''Checks whether a document is new, changed, converted by other code or has
+        missing output files.
+        
+        Parameters
+        @document: The location of the XML file.
+        
+        Returns
+        @convert: True if the document should be converted.'''
+        
+        entry = self.documents.get(os.path.basename(document))
+        
+        if entry == None:
+            return True
+        
+        if not entry['version'] == self.version:
+            return True
+        
+        if not entry['hash'] == self.source_hash(document):
+            return True
+        
+        for file_name in entry['files']:
+            if not os.path.isfile(file_name):
+                return True
+        
+        return False
+    
+    def record(self, document, files):
+        '''Records the conversion of a document. Output files of an earlier conversion
+        that were not written again, such as removed activities, are deleted.
+        
+        Parameters
+        @document: The location of the XML file.
+        @files: A list of the output files.'''
+        
+        name = os.path.basename(document)
+        status = os.stat(document)
+        
+        self.remove_outputs(name, files)
+        
+        self.documents[name] = dict([('hash', self.source_hash(document)),
+                                     ('size', status.st_size),
+                                     ('modified', status.st_mtime),
+                                     ('version', self.version),
+                                     ('files', files)])
+        
+        self.changes += 1
+        
+        # Save regularly, so an interrupted run keeps most of its progress
+        if self.changes % save_interval == 0:
+            self.save()
+    
+    def remove_outputs(self, name, keep=None):
+        '''Deletes the output files of a document and the folders left empty.
+        
+        Parameters
+        @name: The file name of the XML document.
+        @keep: A list of files that should not be deleted or None.'''
+        
+        entry = self.documents.get(name)
+        
+        if entry == None:
+            return
+        
+        if keep == None:
+            keep = []
+        
+        for file_name in entry['files']:
+            if (not file_name in keep) and (os.path.isfile(file_name)):
+                os.remove(file_name)
+                
+                folder = os.path.dirname(file_name)
+                
+                if os.listdir(folder) == []:
+                    os.rmdir(folder)
+    
+    def remove_documents(self, documents):
+        '''Deletes the outputs and entries of documents that are no longer in the
+        XML folder.
+        
+        Parameters
+        @documents: A list of the locations of all current XML files.
+        
+        Returns
+        @removed: A list of the file names of the removed documents.'''
+        
+        current = set([os.path.basename(document) for document in documents])
+        removed = sorted([name for name in self.documents if not name in current])
+        
+        for name in removed:
+            self.remove_outputs(name)
+            del self.documents[name]
+        
+        return removed
+    
+    def save(self):
+        '''Writes the manifest to its JSON file.'''
+        
+        # Write to a temporary file first, so an interrupted run leaves no broken manifest
+        with open(self.file_name + '.tmp', 'w') as manifest_file:
+            json.dump(dict([('version', self.version),
+                            ('documents', self.documents)]), manifest_file)
+        
+        os.rename(self.file_name + '.tmp', self.file_name)
@@ -0,0 +1,214 @@
+## CrawlState.py
+## Persistent record of the crawl progress of each registry document.
+
+import sqlite3, threading, datetime
+
+class CrawlState :
+    '''Class for keeping the per-document crawl state in a SQLite database.'''
+    
+    def __init__(self, database):
+        '''Initializes the crawl state.
+        
+        Parameters
+        @database: The location of the SQLite database file.'''
+        
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS runs (
+                                       id INTEGER PRIMARY KEY,
+                                       started TEXT,
+                                       finished TEXT)''')
+        
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS documents (
+                                       type TEXT,
+                                       name TEXT,
+                                       metadata_modified TEXT,
+                                       status TEXT,
+                                       change TEXT,
+                                       size INTEGER,
+                                       hash TEXT,
+                                       run INTEGER,
+                                       updated TEXT,
+                                       PRIMARY KEY (type, name))''')
+        
+        self.connection.commit()
+        
+        self.run = None
+    
+    def start_run(self):
+        '''Starts a new run, or resumes the last run if it did not finish.
+        
+        Returns
+        @resumed: True if an interrupted run is resumed.'''
+        
+        with self.lock:
+            last_run = self.connection.execute('SELECT id, finished FROM runs ORDER BY id DESC LIMIT 1').fetchone()
+            
+            if (not last_run == None) and (last_run[1] == None):
+                self.run = last_run[0]
+                return True
+            
+            cursor = self.connection.execute('INSERT INTO runs (started) VALUES (?)',
+                                             (str(datetime.datetime.now()),))
+            self.connection.commit()
+            
+            self.run = cursor.lastrowid
+            return False
+    
+    def finish_run(self):
+        '''Marks the current run as finished.'''
+        
+        with self.lock:
+            self.connection.execute('UPDATE runs SET finished = ? WHERE id = ?',
+                                    (str(datetime.datetime.now()), self.run))
+            self.connection.commit()
+    
+    def lookup(self, type, name):
+        '''Returns the stored state of a document.
+        
+        Parameters
+        @type: The type of the document, such as activities.
+        @name: The document name.
+        
+        Returns
+        @state: A dictionary of the document state or None if the document is unknown.'''
+        
+        with self.lock:
+            row = self.connection.execute('''SELECT metadata_modified, status, change, size, hash, run
+                                             FROM documents WHERE type = ? AND name = ?''',
+                                          (type, name)).fetchone()
+        
+        if row == None:
+            return None
+        
+        return dict([('metadata_modified', row[0]),
+                     ('status', row[1]),
+                     ('change', row[2]),
+                     ('size', row[3]),
+                     ('hash', row[4]),
+                     ('run', row[5])])
+    
+    def done_in_run(self, type, name):
+        '''Checks whether a document was already handled in the current run,
+        which is the case when an interrupted run is resumed.
+        
+        Parameters
+        @type: The type of the document.
+        @name: The document name.
+        
+        Returns
+        @done: True if the document does not have to be checked again.'''
+        
+        state = self.lookup(type, name)
+        
+        if state == None:
+            return False
+        
+        return (state['run'] == self.run) and (not state['status'] == 'failed')
+    
+    def needs_update(self, type, name, metadata_modified):
+        '''Checks whether a document changed in the registry since it was stored.
+        
+        Parameters
+        @type: The type of the document.
+        @name: The document name.
+        @metadata_modified: The modification date reported by the registry.
+        
+        Returns
+        @update: True if the document should be downloaded.'''
+        
+        state = self.lookup(type, name)
+        
+        if state == None:
+            return True
+        
+        if not state['status'] in ['downloaded', 'unchanged']:
+            return True
+        
+        return not state['metadata_modified'] == metadata_modified
+    
+    def record(self, type, name, metadata_modified, status, size=None, hash=None):
+        '''Records the result of crawling a document in the current run.
+        
+        Parameters
+        @type: The type of the document.
+        @name: The document name.
+        @metadata_modified: The modification date reported by the registry or None.
+        @status: One of downloaded, unchanged, skipped or failed.
+        @size: The size of the stored XML in bytes or None.
+        @hash: The md5 hash of the stored XML or None.'''
+        
+        previous = self.lookup(type, name)
+        
+        if status in ['failed', 'skipped']:
+            # Only documents that were checked in the registry are new or updated
+            change = status
+        elif (previous == None) or (previous['hash'] == None):
+            # Not stored before, such as a document that was only skipped
+            change = 'new'
+        elif (status == 'downloaded') and (not previous['hash'] == hash):
+            change = 'updated'
+        elif (previous['run'] == self.run) and (not previous['change'] == 'failed'):
+            # Keep the change of the interrupted run that is resumed
+            change = previous['change']
+        else:
+            change = 'unchanged'
+        
+        if (size == None) and (not previous == None) and (not status == 'failed'):
+            size = previous['size']
+        
+        if (hash == None) and (not previous == None) and (not status == 'failed'):
+            hash = previous['hash']
+        
+        with self.lock:
+            self.connection.execute('''INSERT OR REPLACE INTO documents
+                                       (type, name, metadata_modified, status, change, size, hash, run, updated)
+                                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                    (type, name, metadata_modified, status, change, size, hash,
+                                     self.run, str(datetime.datetime.now())))
+            self.connection.commit()
+    
+    def mark_removed(self, type, names):
+        '''Marks the documents of a type that are no longer in the registry.
+        
+        Parameters
+        @type: The type of the documents.
+        @names: A list of all document names currently in the registry.
+        
+        Returns
+        @removed: A list of removed document names.'''
+        
+        current = set(names)
+        
+        with self.lock:
+            stored = self.connection.execute('''SELECT name FROM documents
+                                                WHERE type = ? AND NOT status = 'removed' ''',
+                                             (type,)).fetchall()
+            
+            removed = [row[0] for row in stored if not row[0] in current]
+            
+            for name in removed:
+                self.connection.execute('''UPDATE documents SET status = 'removed', change = 'removed', run = ?
+                                           WHERE type = ? AND name = ?''',
+                                        (self.run, type, name))
+            
+            self.connection.commit()
+        
+        return removed
+    
+    def changes(self, type):
+        '''Returns the number of documents per change in the current run.
+        
+        Parameters
+        @type: The type of the documents.
+        
+        Returns
+        @changes: A dictionary of change (new, updated, unchanged, skipped, failed, removed) to count.'''
+        
+        with self.lock:
+            rows = self.connection.execute('''SELECT change, COUNT(*) FROM documents
+                                              WHERE type = ? AND run = ? GROUP BY change''',
+                                           (type, self.run)).fetchall()
+        
+        return dict(rows)
@@ -2,13 +2,13 @@
 ## Last updated on 02-05-2013
 
 import xml.etree.ElementTree as ET
-import os, sys, httplib2, httplib, json, urllib, urllib2
+import os, sys, httplib2, httplib, json, urllib, urllib2, HttpClient
 
 # Cache login information
 url = 'http://eculture.cs.vu.nl:1987/iati/servlets/login'   
 body = {'user': 'admin', 'password': 'iatiadmin'}
 headers = {'Content-type': 'application/x-www-form-urlencoded'}
-response, content = httplib2.Http().request(url, 'POST', headers=headers, body=urllib.urlencode(body))
+response, content = HttpClient.request(url, 'POST', headers=headers, body=urllib.urlencode(body))
 
 headers = {'Cookie': response['set-cookie']}
 
@@ -56,7 +56,7 @@ for class_thing in classes:
     print "Retrieving " + class_thing + " count from triple store..."
     # Request all location with coordinates and precision
     try:
-        response, content = httplib2.Http().request(request_url, 'POST', headers=headers)
+        response, content = HttpClient.request(request_url, 'POST', headers=headers)
     except httplib.IncompleteRead:
         class_dict[class_thing] = 0
         done = True
@@ -131,7 +131,7 @@ for relation in relations:
     print "Retrieving " + relation + " count from triple store..."
     # Request all location with coordinates and precision
     try:
-        response, content = httplib2.Http().request(request_url, 'POST', headers=headers)
+        response, content = HttpClient.request(request_url, 'POST', headers=headers)
     except httplib.IncompleteRead:
         relation_dict[relation] = 0
         done = True
@@ -0,0 +1,121 @@
+## HandlerStatistics.py
+## Optional counters of the calls, time, triples and failures per element handler.
+
+import csv, json, time
+
+class CountingGraph :
+    '''Class for counting the triples that the element classes add to a RDFLib Graph
+    or triple sink. Other methods are passed on to the wrapped graph.'''
+    
+    def __init__(self, graph, statistics):
+        '''Initializes the counting graph.
+        
+        Parameters
+        @graph: A RDFLib Graph or triple sink.
+        @statistics: The HandlerStatistics to count the triples for.'''
+        
+        self.graph = graph
+        self.statistics = statistics
+    
+    def add(self, triple):
+        '''Adds a triple to the wrapped graph and counts it.
+        
+        Parameters
+        @triple: A tuple of subject, predicate and object.'''
+        
+        self.statistics.triples += 1
+        self.graph.add(triple)
+    
+    def __getattr__(self, name):
+        return getattr(self.graph, name)
+    
+    def __len__(self):
+        return len(self.graph)
+    
+    def __iter__(self):
+        return iter(self.graph)
+
+class HandlerStatistics :
+    '''Class for recording the number of calls, the wall time, the number of triples
+    emitted and the number of failures of each element handler.'''
+    
+    fields = ['calls', 'seconds', 'triples', 'failures']
+    
+    def __init__(self):
+        '''Initializes the statistics.'''
+        
+        self.handlers = {}
+        self.triples = 0
+    
+    def call(self, name, function, *arguments):
+        '''Calls a handler and records its statistics. Exceptions of the handler are
+        counted as a failure and raised again.
+        
+        Parameters
+        @name: The name of the handler.
+        @function: The handler function.
+        @arguments: The arguments of the handler function.
+        
+        Returns
+        @result: The result of the handler function.'''
+        
+        start = time.time()
+        triples = self.triples
+        failed = True
+        
+        try:
+            result = function(*arguments)
+            failed = False
+            
+            return result
+        
+        finally:
+            self.record(name, 1, time.time() - start, self.triples - triples, int(failed))
+    
+    def record(self, name, calls, seconds, triples, failures):
+        '''Adds to the statistics of a handler.
+        
+        Parameters
+        @name: The name of the handler.
+        @calls: The number of calls.
+        @seconds: The wall time in seconds.
+        @triples: The number of triples emitted.
+        @failures: The number of failed calls.'''
+        
+        try:
+            handler = self.handlers[name]
+        except KeyError:
+            handler = self.handlers[name] = dict([(field, 0) for field in self.fields])
+        
+        handler['calls'] += calls
+        handler['seconds'] += seconds
+        handler['triples'] += triples
+        handler['failures'] += failures
+    
+    def merge(self, handlers):
+        '''Adds the statistics of another run, such as a worker process.
+        
+        Parameters
+        @handlers: A dictionary of handler name to statistics, as in self.handlers.'''
+        
+        for name, handler in handlers.items():
+            self.record(name, handler['calls'], handler['seconds'], handler['triples'], handler['failures'])
+    
+    def write(self, file_name):
+        '''Writes the statistics to a CSV file if the file name ends with .csv, or to
+        a JSON file otherwise.
+        
+        Parameters
+        @file_name: The location of the file.'''
+        
+        if file_name.endswith('.csv'):
+            with open(file_name, 'wb') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(['handler'] + self.fields)
+                
+                for name in sorted(self.handlers):
+                    writer.writerow([name] + [self.handlers[name][field] for field in self.fields])
+        
+        else:
+            with open(file_name, 'w') as json_file:
+                json.dump(self.handlers, json_file, indent=2, sort_keys=True)
@@ -0,0 +1,107 @@
+## HttpCache.py
+## On-disk cache of response validators for conditional GET requests.
+
+import hashlib, json, os
+
+class HttpCache :
+    '''Class for storing the ETag, Last-Modified and content hash of downloaded URLs.'''
+    
+    def __init__(self, folder):
+        '''Initializes the cache.
+        
+        Parameters
+        @folder: The folder in which the cache entries are stored.'''
+        
+        self.folder = folder
+        
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+    
+    def entry_file(self, url):
+        '''Returns the file name of the cache entry of an URL.
+        
+        Parameters
+        @url: The URL of the entry.
+        
+        Returns
+        @file_name: The location of the entry file.'''
+        
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        
+        hash = hashlib.md5()
+        hash.update(url)
+        
+        return self.folder + hash.hexdigest() + '.json'
+    
+    def lookup(self, url):
+        '''Returns the cache entry of an URL.
+        
+        Parameters
+        @url: The URL of the entry.
+        
+        Returns
+        @entry: A dictionary with the keys url, etag, last_modified, hash and
+                resources_hash or None if the URL is not cached.'''
+        
+        try:
+            with open(self.entry_file(url), 'r') as entry_file:
+                entry = json.load(entry_file)
+        
+        except (IOError, ValueError):
+            return None
+        
+        if not entry.get('url') == url:
+            return None
+        
+        return entry
+    
+    def store(self, url, response, content_hash, resources_hash, entry=None):
+        '''Stores the validators of a response.
+        
+        Parameters
+        @url: The URL of the entry.
+        @response: The response headers of the download.
+        @content_hash: The md5 hash of the downloaded content.
+        @resources_hash: The hash of the resource according to the registry or None.
+        @entry: The previous cache entry, of which the validators are kept when
+                the response does not repeat them (e.g. a 304 response).'''
+        
+        if entry == None:
+            entry = {}
+        
+        entry = dict([('url', url),
+                      ('etag', response.get('etag', entry.get('etag'))),
+                      ('last_modified', response.get('last-modified', entry.get('last_modified'))),
+                      ('hash', content_hash),
+                      ('resources_hash', resources_hash)])
+        
+        file_name = self.entry_file(url)
+        
+        # Write to a temporary file first, so an interrupted run leaves no broken entry
+        with open(file_name + '.tmp', 'w') as entry_file:
+            json.dump(entry, entry_file)
+        
+        os.rename(file_name + '.tmp', file_name)
+    
+    def conditional_headers(self, entry):
+        '''Returns the headers for a conditional GET request.
+        
+        Parameters
+        @entry: A cache entry or None.
+        
+        Returns
+        @headers: A dictionary of request headers.'''
+        
+        headers = {}
+        
+        if entry == None:
+            return headers
+        
+        if not entry.get('etag') == None:
+            headers['If-None-Match'] = entry['etag']
+        
+        if not entry.get('last_modified') == None:
+            headers['If-Modified-Since'] = entry['last_modified']
+        
+        return headers
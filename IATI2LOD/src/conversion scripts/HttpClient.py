@@ -0,0 +1,156 @@
+## HttpClient.py
+## Shared HTTP client with keep-alive connections per host.
+## The mapping and gather data scripts folders have a copy without download, so
+## changes to the other functions go in all three copies.
+
+import hashlib, httplib, httplib2, os, socket, threading, urllib2
+
+# Settings
+cache_folder = None
+timeout = 60
+chunk_size = 1024 * 1024
+
+pool = threading.local()
+
+class HttpError(Exception):
+    '''Raised when a server answers with a status other than 200.'''
+    
+    def __init__(self, url, status):
+        '''Initializes the error.
+        
+        Parameters
+        @url: The URL that was requested.
+        @status: The status of the response.'''
+        
+        Exception.__init__(self, "HTTP status " + str(status) + " for " + str(url))
+        
+        self.url = url
+        self.status = status
+
+def get_http():
+    '''Returns the httplib2 Http object of the current thread.
+    The Http object keeps one open connection per host, so consecutive requests
+    to the same host reuse the connection instead of connecting again.
+    
+    Returns
+    @http: A httplib2 Http object.'''
+    
+    try:
+        return pool.http
+    
+    except AttributeError:
+        pool.http = httplib2.Http(cache_folder, timeout=timeout)
+        return pool.http
+
+def reset():
+    '''Closes the connections of the current thread.'''
+    
+    try:
+        http = pool.http
+    except AttributeError:
+        return
+    
+    for connection in http.connections.values():
+        connection.close()
+    
+    del pool.http
+
+def request(url, method="GET", headers=None, body=None):
+    '''Sends a request over the pooled connections of the current thread. GET and HEAD
+    requests are retried once on a new connection if the connection breaks.
+    
+    Parameters
+    @url: The URL to connect to.
+    @method: The HTTP method.
+    @headers: A dictionary of request headers or None.
+    @body: The request body or None.
+    
+    Returns
+    @response: The httplib2 Response.
+    @content: The content of the response.'''
+    
+    try:
+        return get_http().request(url, method, headers=headers, body=body)
+    
+    except (socket.error, httplib.HTTPException):
+        # A broken keep-alive connection is dropped. Only idempotent requests are tried
+        # once more, since the server may have handled the first one already.
+        reset()
+        
+        if not method in ['GET', 'HEAD']:
+            raise
+        
+        return get_http().request(url, method, headers=headers, body=body)
+
+def read(url, headers=None):
+    '''Returns the content of a GET request.
+    
+    Parameters
+    @url: The URL to connect to.
+    @headers: A dictionary of request headers or None.
+    
+    Returns
+    @content: The content of the response.'''
+    
+    response, content = request(url, "GET", headers=headers)
+    
+    if not response['status'] == '200':
+        raise HttpError(url, response['status'])
+    
+    return content
+
+def download(url, file_name, headers=None):
+    '''Streams the content of a GET request to a file in chunks, computing the md5
+    hash on the fly, so memory use does not depend on the size of the content.
+    The file is removed again if the download fails halfway.
+    
+    Parameters
+    @url: The URL to connect to.
+    @file_name: The location of the file to write to.
+    @headers: A dictionary of request headers or None.
+    
+    Returns
+    @response: A dictionary of the status and the (lower case) response headers.
+    @size: The number of bytes written or None if the status is not 200.
+    @content_hash: The md5 hash of the content or None if the status is not 200.'''
+    
+    if headers == None:
+        headers = {}
+    
+    try:
+        stream = urllib2.urlopen(urllib2.Request(url, headers=headers), timeout=timeout)
+    except urllib2.HTTPError as e:
+        # Also raised for statuses such as 304, the error is the response
+        stream = e
+    
+    try:
+        response = dict([(key.lower(), value) for key, value in stream.info().items()])
+        response['status'] = str(stream.getcode())
+        
+        if not response['status'] == '200':
+            return response, None, None
+        
+        hash = hashlib.md5()
+        size = 0
+        
+        try:
+            with open(file_name, 'wb') as file:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    
+                    if not chunk:
+                        break
+                    
+                    hash.update(chunk)
+                    size += len(chunk)
+                    file.write(chunk)
+        
+        except:
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+            raise
+    
+    finally:
+        stream.close()
+    
+    return response, size, hash.hexdigest()
@@ -3,7 +3,104 @@
 
 from rdflib import Namespace, Literal, XSD, URIRef, Graph, RDF, RDFS
 import xml.etree.ElementTree as ET
-import datetime, IatiElements, AttributeHelper, AddProvenance
+import datetime, inspect, IatiElements, AttributeHelper, AddProvenance
+
+
+class ElementDispatcher :
+    '''Class for looking up the handler of an element tag in an element class.
+    The handlers are collected once per element class and the handler of each
+    distinct tag is cached, so the tag is only normalised the first time it is seen.'''
+    
+    def __init__(self, element_class, handler_name, handler_arguments=['self', 'xml']):
+        '''Initializes the dispatcher.
+        
+        Parameters
+        @element_class: The element class, such as IatiElements.ActivityElements.
+        @handler_name: A function returning the handler name of a raw tag.
+        @handler_arguments: The argument names of the handlers of the element class.'''
+        
+        self.handler_name = handler_name
+        self.handlers = {}
+        self.tags = {}
+        
+        # The public methods with the arguments of a handler, except the general methods,
+        # so helper methods of the element class are never called for a tag
+        not_handlers = ['get_result', 'process_unknown_tag', 'convert_unknown']
+        
+        for name, function in vars(element_class).items():
+            if (not inspect.isfunction(function)) or (name[:1] == "_") or (name in not_handlers):
+                continue
+            
+            if inspect.getargspec(function).args == handler_arguments:
+                self.handlers[name] = function
+    
+    def lookup(self, tag):
+        '''Returns the handler of a tag.
+        
+        Parameters
+        @tag: The raw (possibly namespaced) tag of the element.
+        
+        Returns
+        @funcname: The handler name of the tag.
+        @handler: The handler function, to be called with the element class instance
+                  as first argument, or None if the tag is unknown.'''
+        
+        try:
+            return self.tags[tag]
+        
+        except KeyError:
+            funcname = self.handler_name(tag)
+            self.tags[tag] = (funcname, self.handlers.get(funcname))
+            
+            return self.tags[tag]
+
+def activity_handler_name(tag):
+    '''Returns the handler name of an activity element tag.
+    
+    Parameters
+    @tag: The raw tag of the element.
+    
+    Returns
+    @funcname: The handler name.'''
+    
+    if "}" in tag:
+        funcname = tag.split("}")[1]
+    elif ":" in tag:
+        funcname = tag.split(":")[1]
+    else:
+        funcname = tag
+    
+    return funcname.replace("-","_").replace("default_", "")
+
+def plain_handler_name(tag):
+    '''Returns the handler name of an organisation or codelist element tag.
+    
+    Parameters
+    @tag: The raw tag of the element.
+    
+    Returns
+    @funcname: The handler name.'''
+    
+    return tag.replace("-","_")
+
+activity_dispatcher = ElementDispatcher(IatiElements.ActivityElements, activity_handler_name)
+organisation_dispatcher = ElementDispatcher(IatiElements.OrganisationElements, plain_handler_name)
+codelist_dispatcher = ElementDispatcher(IatiElements.CodelistElements, plain_handler_name,
+                                        ['self', 'xml', 'code', 'language', 'category_code'])
+
+def call_handler(converter, funcname, function, *arguments):
+    '''Calls a handler, through the handler statistics of the converter if these are kept.
+    
+    Parameters
+    @converter: The element class instance.
+    @funcname: The name of the handler.
+    @function: The handler function.
+    @arguments: The arguments of the handler function.'''
+    
+    if converter.statistics == None:
+        return function(*arguments)
+    
+    return converter.statistics.call(funcname, function, *arguments)
 
 
 class ConvertActivity :
@@ -114,11 +211,14 @@ class ConvertActivity :
         
         return defaults
     
-    def convert(self, namespace):
+    def convert(self, namespace, sink=None, statistics=None, locations=None):
         '''Converts the XML file into a RDFLib graph.
         
         Parameters
         @namespace: A RDFLib Namespace.
+        @sink: A triple sink to write to instead of a new RDFLib Graph, or None.
+        @statistics: A HandlerStatistics.HandlerStatistics to record the handler calls in, or None.
+        @locations: A list to add a record of each location of the activity to, or None.
         
         Returns
         @graph: The RDFLib Graph of the activity.
@@ -132,31 +232,37 @@ class ConvertActivity :
         
         defaults = self.get_activity_defaults()
         defaults['namespace'] = namespace
+        defaults['sink'] = sink
+        defaults['statistics'] = statistics
+        defaults['locations'] = locations
         
         converter = IatiElements.ActivityElements(defaults)
         
         for attribute in self.xml:
             
-            try:
-                if ":" in attribute.tag:
-                    funcname = attribute.tag.split(":")[1].replace("-","_").replace("default_", "")
-                if "}" in attribute.tag:
-                    funcname = attribute.tag.split("}")[1].replace("-","_").replace("default_", "")
-                if (not ":" in attribute.tag) and (not "}" in attribute.tag):
-                    funcname = attribute.tag.replace("-","_").replace("default_", "")
+            funcname, update = activity_dispatcher.lookup(attribute.tag)
             
-                update = getattr(converter, funcname)
-                update(attribute)
-                
-            except AttributeError as e:
+            if update == None:
+                # Non-IATI standard element
                 try:
-                    converter.convert_unknown(attribute)
+                    call_handler(converter, 'convert_unknown', converter.convert_unknown, attribute)
                 except:
                     print "Could not convert "+ funcname + " in file " + self.id
                     
                     if not funcname in self.failed:
                         self.failed.append(funcname)
-                    
+                
+                continue
+            
+            try:
+                # The children are indexed once for all lookups of the handler
+                call_handler(converter, funcname, update, converter, AttributeHelper.ElementIndex(attribute))
+                
+            except Exception as e:
+                print "Error in " + funcname + " in file " + self.id + ": " + str(e)
+                
+                if not funcname in self.failed:
+                    self.failed.append(funcname)
         
         return converter.get_result(), self.id, self.last_updated, self.version, self.failed
         
@@ -185,11 +291,12 @@ class ConvertCodelist :
         
         return defaults        
         
-    def convert(self, namespace):
+    def convert(self, namespace, sink=None):
         '''Converts the XML file into a RDFLib graph.
         
         Parameters
         @namespace: A RDFLib Namespace.
+        @sink: A triple sink to write to instead of a new RDFLib Graph, or None.
         
         Returns
         @graph: The RDFLib Graph of the activity.
@@ -201,6 +308,7 @@ class ConvertCodelist :
 
         defaults = self.get_codelist_defaults()
         defaults['namespace'] = namespace
+        defaults['sink'] = sink
         
         converter = IatiElements.CodelistElements(defaults)
         
@@ -213,13 +321,16 @@ class ConvertCodelist :
             
             for attribute in entry:
                 
-                try:
-                    funcname = attribute.tag.replace("-","_")
+                funcname, update = codelist_dispatcher.lookup(attribute.tag)
+                
+                if update == None:
+                    print "Error in " + funcname + ", " + self.id + ": unknown element"
+                    continue
                 
-                    update = getattr(converter, funcname)
-                    update(attribute, code, language, category_code)
+                try:
+                    update(converter, attribute, code, language, category_code)
                     
-                except AttributeError as e:
+                except Exception as e:
                     print "Error in " + funcname + ", " + self.id + ": " + str(e)
         
         
@@ -290,11 +401,13 @@ class ConvertOrganisation :
         
         return defaults
     
-    def convert(self, namespace):
+    def convert(self, namespace, sink=None, statistics=None):
         '''Converts the XML file into a RDFLib graph.
         
         Parameters
         @namespace: A RDFLib Namespace.
+        @sink: A triple sink to write to instead of a new RDFLib Graph, or None.
+        @statistics: A HandlerStatistics.HandlerStatistics to record the handler calls in, or None.
         
         Returns
         @graph: The RDFLib Graph of the activity.
@@ -306,29 +419,30 @@ class ConvertOrganisation :
         
         defaults = self.get_organisation_defaults()
         defaults['namespace'] = namespace
+        defaults['sink'] = sink
+        defaults['statistics'] = statistics
         
         converter = IatiElements.OrganisationElements(defaults)
         
         for attribute in self.xml:
             
-            try:
-                if ":" in attribute.tag:
-                    funcname = attribute.tag.split(":")[1].replace("-","_").replace("default_", "")
-                if "}" in attribute.tag:
-                    funcname = attribute.tag.split("}")[1].replace("-","_").replace("default_", "")
-                if (not ":" in attribute.tag) and (not "}" in attribute.tag):
-                    funcname = attribute.tag.replace("-","_").replace("default_", "")
-                
-                funcname = attribute.tag.replace("-","_")
+            funcname, update = organisation_dispatcher.lookup(attribute.tag)
             
-                update = getattr(converter, funcname)
-                update(attribute)
-                
-            except AttributeError as e:
+            if update == None:
+                # Non-IATI standard element
                 try:
-                    converter.convert_unknown(attribute)
-                except:
+                    call_handler(converter, 'convert_unknown', converter.convert_unknown, attribute)
+                except Exception as e:
                     print "Could not convert "+ funcname + " in file " + self.id + ": " + str(e)
+                
+                continue
+            
+            try:
+                # The children are indexed once for all lookups of the handler
+                call_handler(converter, funcname, update, converter, AttributeHelper.ElementIndex(attribute))
+                
+            except Exception as e:
+                print "Error in " + funcname + " in file " + self.id + ": " + str(e)
         
         return converter.get_result(), self.id, self.last_updated
 
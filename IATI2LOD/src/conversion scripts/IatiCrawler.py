@@ -4,27 +4,169 @@
 
 import xml.etree.ElementTree as ET
 from datetime import date
-import sys, httplib2, json, os
+from urlparse import urlparse
+import sys, httplib, httplib2, json, os, threading, time, Queue, HttpClient, HttpCache, CrawlState
 
-def get_request(url, json_format):
-    '''Connect to url and return content.
+# Per-host concurrency caps for the concurrent crawl mode
+host_limit = None
+host_slots = {}
+host_slots_lock = threading.Lock()
+print_lock = threading.Lock()
+
+# On-disk cache of ETags, Last-Modified dates and hashes of downloaded XMLs
+http_cache = None
+
+# Persistent per-document crawl state
+crawl_state = None
+
+def set_host_limit(limit):
+    '''Sets the maximum number of simultaneous requests per host.
+    
+    Parameters
+    @limit: The maximum number of requests per host or None for no cap.'''
+    
+    global host_limit
+    
+    with host_slots_lock:
+        host_limit = limit
+        host_slots.clear()
+
+def host_slot(url):
+    '''Returns the semaphore guarding the host of the url.
+    
+    Parameters
+    @url: The URL that is about to be requested.
+    
+    Returns
+    @slot: A BoundedSemaphore for the host or None if there is no cap.'''
+    
+    if host_limit == None:
+        return None
+    
+    host = urlparse(url).netloc
+    
+    with host_slots_lock:
+        if not host in host_slots:
+            host_slots[host] = threading.BoundedSemaphore(host_limit)
+        
+        return host_slots[host]
+
+def set_http_cache(folder):
+    '''Enables conditional downloads using the cache in the given folder.
+    
+    Parameters
+    @folder: The location of the cache folder or None to disable the cache.'''
+    
+    global http_cache
+    
+    if folder == None:
+        http_cache = None
+    else:
+        http_cache = HttpCache.HttpCache(folder)
+
+def set_crawl_state(database):
+    '''Enables the persistent crawl state stored in the given database.
+    
+    Parameters
+    @database: The location of the SQLite database or None to disable the state.
+    
+    Returns
+    @state: The CrawlState or None.'''
+    
+    global crawl_state
+    
+    if database == None:
+        crawl_state = None
+    else:
+        crawl_state = CrawlState.CrawlState(database)
+    
+    return crawl_state
+
+def report(message):
+    '''Prints a message without interleaving output of other crawl threads.
+    
+    Parameters
+    @message: The message to be printed.'''
+    
+    with print_lock:
+        print message
+
+def request(url, headers=None):
+    '''Connect to url and return the response and content.
     
     Parameters
     @url: The URL to connect to.
-    @json_format: True for json and False for other formats.
+    @headers: A dictionary of request headers or None.
     
     Returns
-    @data: Dictionary of response.'''
+    @response: The response headers or None in case of a fail.
+    @content: The content of the response or None in case of a fail.'''
+    
+    slot = host_slot(url)
+    
+    if not slot == None:
+        slot.acquire()
     
     try:
-        response, content = httplib2.Http().request(url, "GET")
+        response, content = HttpClient.request(url, "GET", headers=headers)
         
     except httplib2.ServerNotFoundError as e:
         print e
-        sys.exit(0)
+        sys.exit(1)
         
     except KeyError as e:
         print "Something went wrong while connecting to " + url
+        return None, None
+    
+    finally:
+        if not slot == None:
+            slot.release()
+    
+    return response, content
+
+def download(url, file_name, headers=None):
+    '''Connect to url and stream the content to a file.
+    
+    Parameters
+    @url: The URL to connect to.
+    @file_name: The location of the file to write to.
+    @headers: A dictionary of request headers or None.
+    
+    Returns
+    @response: The response headers or None in case of a fail.
+    @size: The number of bytes written or None.
+    @content_hash: The md5 hash of the content or None.'''
+    
+    slot = host_slot(url)
+    
+    if not slot == None:
+        slot.acquire()
+    
+    try:
+        return HttpClient.download(url, file_name, headers)
+    
+    except (IOError, httplib.HTTPException) as e:
+        # Includes URLError, socket errors and timeouts
+        print "Something went wrong while connecting to " + url + ": " + str(e)
+        return None, None, None
+    
+    finally:
+        if not slot == None:
+            slot.release()
+
+def get_request(url, json_format):
+    '''Connect to url and return content.
+    
+    Parameters
+    @url: The URL to connect to.
+    @json_format: True for json and False for other formats.
+    
+    Returns
+    @data: Dictionary of response.'''
+    
+    response, content = request(url)
+    
+    if response == None:
         return None
     
     if response['status'] == '200':
@@ -40,32 +182,205 @@ def get_request(url, json_format):
         print "Something went wrong while connecting to " + url
         return None
 
-def save_to_folder(folder, xml_url, name):
+def save_to_folder(folder, xml_url, name, resources_hash=None):
     '''Check connection to IATI API and retrieve all document names.
     Retrieve all document names and the last time the server has checked for updates.
+    When the HTTP cache is enabled, the XML is only downloaded and written if it changed.
+    The XML is streamed to a temporary file which replaces the stored copy once complete.
     
     Parameters
     @folder: The location of the folder.
     @xml_url: The URL of the XML containing activities.
-    @name: The document name.'''
+    @name: The document name.
+    @resources_hash: The hash of the XML according to the registry or None.
+    
+    Returns
+    @saved: True if the XML was written, False if it was unchanged and None in case of a fail.
+    @size: The size of the stored XML in bytes or None.
+    @content_hash: The md5 hash of the stored XML or None.'''
+    
+    if http_cache == None:
+        entry = None
+        stored = False
+    else:
+        entry = http_cache.lookup(xml_url)
+        stored = os.path.isfile(folder + name)
+    
+    if (stored) and (not entry == None) and (not resources_hash == None):
+        # The registry reports the same hash as the stored copy
+        if entry.get('resources_hash') == resources_hash:
+            return False, os.path.getsize(folder + name), entry.get('hash')
+    
+    if stored:
+        headers = http_cache.conditional_headers(entry)
+    else:
+        headers = {}
+    
+    temporary_file = folder + name + '.part'
+    
+    response, size, content_hash = download(xml_url, temporary_file, headers)
+    
+    if response == None:
+        return None, None, None
+    
+    if (stored) and (response['status'] == '304'):
+        # Not modified on the publisher's server
+        http_cache.store(xml_url, response, entry['hash'], resources_hash, entry)
+        return False, os.path.getsize(folder + name), entry['hash']
+    
+    if not response['status'] == '200':
+        print "Something went wrong while connecting to " + xml_url
+        return None, None, None
+    
+    if (stored) and (not entry == None) and (entry.get('hash') == content_hash):
+        # Same bytes as the stored copy
+        os.remove(temporary_file)
+        http_cache.store(xml_url, response, content_hash, resources_hash, entry)
+        return False, size, content_hash
+    
+    # Replace the stored copy at once, so it is never partially written
+    os.rename(temporary_file, folder + name)
+    
+    if not http_cache == None:
+        http_cache.store(xml_url, response, content_hash, resources_hash)
+    
+    return True, size, content_hash
+
+def get_resources_hash(data):
+    '''Returns the hash of the first resource of a dataset.
+    
+    Parameters
+    @data: The parsed JSON metadata of a dataset.
+    
+    Returns
+    @resources_hash: The hash of the resource or None if not available.'''
+    
+    try:
+        resources_hash = data['resources'][0]['hash']
+    except (KeyError, IndexError, TypeError):
+        return None
+    
+    if (resources_hash == None) or (resources_hash == ""):
+        return None
+    
+    return resources_hash
+    
+def load_listing(listing_cache, type, max_age):
+    '''Returns the cached list of document names if it is recent enough.
     
-    xml = get_request(xml_url, False)
+    Parameters
+    @listing_cache: The folder of the listing cache.
+    @type: The type of documents.
+    @max_age: The maximum age of the cached list in seconds.
+    
+    Returns
+    @all_documents: A list of a all document names or None if not cached.'''
+    
+    try:
+        with open(listing_cache + 'listing-' + str(type) + '.json', 'r') as file:
+            listing = json.load(file)
+    
+    except (IOError, ValueError):
+        return None
     
-    if not xml == None:
+    if time.time() - listing['retrieved'] > max_age:
+        return None
+    
+    return listing['documents']
+
+def store_listing(listing_cache, type, all_documents):
+    '''Stores the list of document names in the listing cache.
+    
+    Parameters
+    @listing_cache: The folder of the listing cache.
+    @type: The type of documents.
+    @all_documents: A list of a all document names.'''
+    
+    if not os.path.isdir(listing_cache):
+        os.makedirs(listing_cache)
+    
+    file_name = listing_cache + 'listing-' + str(type) + '.json'
+    
+    with open(file_name + '.tmp', 'w') as file:
+        json.dump(dict([('retrieved', time.time()),
+                        ('documents', all_documents)]), file)
+    
+    os.rename(file_name + '.tmp', file_name)
+
+def page_worker(queue, pages):
+    '''Takes page URLs from the queue and retrieves them until the queue is empty.
+    
+    Parameters
+    @queue: A Queue of (offset, url) tuples.
+    @pages: A dictionary in which the results of each offset are stored.'''
+    
+    while True:
+        try:
+            offset, page_url = queue.get_nowait()
+        except Queue.Empty:
+            return
+        
+        try:
+            documents = get_request(page_url, True)
+            pages[offset] = documents['results']
+        except (Exception, SystemExit) as e:
+            report("Could not retrieve " + str(page_url) + ": " + str(e))
+            pages[offset] = None
         
-        with open(folder + name, 'w') as file:
-            file.write(xml)
+        queue.task_done()
+
+def retrieve_pages(url, document_count, limit, workers):
+    '''Retrieves the pages of a registry search concurrently.
+    
+    Parameters
+    @url: The URL of the search.
+    @document_count: The total number of documents of the search.
+    @limit: The max limit of the IATI server, used as page size.
+    @workers: The number of pages that are retrieved simultaneously.
     
-def retrieve_document_names(iati_url, limit, type):
+    Returns
+    @pages: A list of the results of each page, in order, or None for a failed page.'''
+    
+    offsets = range(0, document_count, limit)
+    pages = {}
+    queue = Queue.Queue()
+    
+    for offset in offsets:
+        queue.put((offset, url + "&limit=" + str(limit) + "&offset=" + str(offset)))
+    
+    threads = []
+    
+    for worker in range(max(1, min(workers, len(offsets)))):
+        thread = threading.Thread(target=page_worker, args=(queue, pages))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    
+    for thread in threads:
+        thread.join()
+    
+    return [pages.get(offset) for offset in offsets]
+
+def retrieve_document_names(iati_url, limit, type, workers=1, listing_cache=None, max_age=3600):
     '''Check connection to IATI API and retrieve all document names.
     
     Parameters
     @iati_url: The URL of the IATI datasets.
     @limit: The max limit of the IATI server.
     @type: The type of documents that should be retrieved.
+    @workers: The number of pages that are retrieved simultaneously.
+    @listing_cache: The folder in which the list is cached or None to disable the cache.
+    @max_age: The number of seconds a cached list is used before it is retrieved again.
     
     Returns
     @all_documents: A list of a all document names.'''
+    
+    if not listing_cache == None:
+        all_documents = load_listing(listing_cache, type, max_age)
+        
+        if not all_documents == None:
+            print "Using cached document list..."
+            return all_documents
 
     # Set IATI url
     if type == 'activities':
@@ -86,19 +401,19 @@ def retrieve_document_names(iati_url, limit, type):
         print "Connection to IATI API established..."
         
         document_count = data['count']
-        offset = 0
-        
-        while document_count > 0:
+        seen = set()
         
-            document_count_url = url + "&limit=" + str(document_count) + "&offset=" + str(offset)
-            
-            documents = get_request(document_count_url, True)
+        # Pages of at most limit documents, retrieved concurrently now that the count is known
+        for documents in retrieve_pages(url, document_count, limit, workers):
             
-            for document in documents['results']:
-                all_documents.append(document)
+            if documents == None:
+                print "Something went wrong while retrieving the document list..."
+                sys.exit(1)
             
-            offset += limit
-            document_count -= limit
+            for document in documents:
+                if not document in seen:
+                    seen.add(document)
+                    all_documents.append(document)
             
         print "Document list retrieved..."
     
@@ -115,11 +430,128 @@ def retrieve_document_names(iati_url, limit, type):
     
     else:
         print "Something went wrong while connecting to the IATI API..."
-        sys.exit(0)
+        sys.exit(1)
+    
+    if not listing_cache == None:
+        store_listing(listing_cache, type, all_documents)
     
     return all_documents
 
-def update_documents(folder, iati_url, all_documents, server_update, type):
+def update_document(folder, url, document, server_update, json_bool, counter, total, type=None):
+    '''Checks a single document with the last time the server has been updated
+    and stores it in the folder if needed.
+    
+    Parameters
+    @folder: Location of folder in which XML files are to be saved.
+    @url: The URL of the document metadata, without the document name.
+    @document: The document name.
+    @server_update: A DateTime of the last time the XMLs were checked or None to rely
+                    on the crawl state only.
+    @json_bool: True for activities and organisations, False for codelists.
+    @counter: The position of the document in the list of documents.
+    @total: The total number of documents.
+    @type: The type of the document, used as key in the crawl state.'''
+    
+    if (not crawl_state == None) and (crawl_state.done_in_run(type, document)):
+        # Already handled before the interrupted run was resumed
+        report("Done before: " + str(counter) + " out of " + str(total) + " (" + str(document) + ")...")
+        return
+    
+    data = get_request(url + str(document), json_bool)
+    
+    if data == None:
+        report("Skipping " + str(document) + "...")
+        
+        if not crawl_state == None:
+            crawl_state.record(type, document, None, 'failed')
+        
+        return
+    
+    if json_bool:
+        modified = data['metadata_modified']
+        update = (data['isopen']) and ((server_update == None) or (server_update < modified))
+    else:
+        parsed_codelist_xml = ET.fromstring(data)
+        
+        modified = parsed_codelist_xml.attrib['date-last-modified']
+        update = (server_update == None) or (server_update < modified)
+    
+    if json_bool:
+        xml_name = document + '.xml'
+    else:
+        xml_name = document
+    
+    if (update) and (not crawl_state == None):
+        update = (crawl_state.needs_update(type, document, modified)) or (not os.path.isfile(folder + xml_name))
+        
+        if not update:
+            crawl_state.record(type, document, modified, 'unchanged')
+            report("Unchanged in registry " + str(document) + "...")
+            return
+    
+    if not update:
+        report("Skipping " + str(document) + "...")
+        
+        if not crawl_state == None:
+            crawl_state.record(type, document, modified, 'skipped')
+        
+        return
+    
+    if json_bool:
+        # Save JSON metadata to folder
+        with open(folder + document + '.json', 'w') as file:
+            file.write(json.dumps(data, sort_keys=True, indent=4, separators=(',', ': ')))
+        
+        # Save XML to folder
+        xml_url = data['download_url'].replace(' ','%20')
+        saved, size, content_hash = save_to_folder(folder, xml_url, xml_name, get_resources_hash(data))
+        
+    else:
+        xml_url = url + str(document)
+        saved, size, content_hash = save_to_folder(folder, xml_url, xml_name)
+    
+    if saved == None:
+        status = 'failed'
+        report("Failed: " + str(counter) + " out of " + str(total) + " (" + str(xml_url) + ")...")
+    elif saved:
+        status = 'downloaded'
+        report("Progress: " + str(counter) + " out of " + str(total) + " (" + str(xml_url) + ")...")
+    else:
+        status = 'unchanged'
+        report("Unchanged: " + str(counter) + " out of " + str(total) + " (" + str(xml_url) + ")...")
+    
+    if not crawl_state == None:
+        crawl_state.record(type, document, modified, status, size, content_hash)
+
+def crawl_worker(queue, folder, url, server_update, json_bool, total, type):
+    '''Takes documents from the queue and updates them until the queue is empty.
+    
+    Parameters
+    @queue: A Queue of (counter, document) tuples.
+    @folder: Location of folder in which XML files are to be saved.
+    @url: The URL of the document metadata, without the document name.
+    @server_update: A DateTime of the last time the XMLs were checked.
+    @json_bool: True for activities and organisations, False for codelists.
+    @total: The total number of documents.
+    @type: The type of the documents.'''
+    
+    while True:
+        try:
+            counter, document = queue.get_nowait()
+        except Queue.Empty:
+            return
+        
+        try:
+            update_document(folder, url, document, server_update, json_bool, counter, total, type)
+        except (Exception, SystemExit) as e:
+            report("Could not update " + str(document) + ": " + str(e))
+            
+            if not crawl_state == None:
+                crawl_state.record(type, document, None, 'failed')
+        
+        queue.task_done()
+
+def update_documents(folder, iati_url, all_documents, server_update, type, workers=1):
     '''Checking documents with the last time the server has been updated.
     Updates the triple store with new or updated activities.
     
@@ -127,8 +559,10 @@ def update_documents(folder, iati_url, all_documents, server_update, type):
     @folder: Location of folder in which XML files are to be saved.
     @iati_url: The URL of the IATI API.
     @all_documents: A list of a all document names.
-    @server_update: A DateTime of the last time the XMLs were checked.
-    @type: The type of documents that should be retrieved.'''
+    @server_update: A DateTime of the last time the XMLs were checked or None to rely
+                    on the crawl state only.
+    @type: The type of documents that should be retrieved.
+    @workers: The number of documents that are crawled simultaneously.'''
     
     # Settings
     if type == 'activities' or type == 'organisations':
@@ -140,7 +574,7 @@ def update_documents(folder, iati_url, all_documents, server_update, type):
     
     #folder = str(folder) + str(type) + '/Update ' + str(date.today()) + '/'
     folder = str(folder) + str(type) + '/'
-    counter = 1
+    total = len(all_documents)
     
     if not os.path.isdir(folder):
         os.makedirs(folder)
@@ -149,38 +583,30 @@ def update_documents(folder, iati_url, all_documents, server_update, type):
 #    if type == 'activities':
 #        all_documents = all_documents[-100:]
     
-    # Check the last update for each document.
-    for document in all_documents:
-        
-        data = get_request(url + str(document), json_bool)
-        
-        if json_bool:
-            # Check if the activity or organisation data is open and if updating is needed.
-            if (data['isopen']) and (server_update < data['metadata_modified']):
-                
-                # Save JSON metadata to folder
-                with open(folder + document + '.json', 'w') as file:
-                    file.write(json.dumps(data, sort_keys=True, indent=4, separators=(',', ': ')))
-                
-                # Save XML to folder
-                save_to_folder(folder, data['download_url'].replace(' ','%20'), document + '.xml')
-                print "Progress: " + str(counter) + " out of " + str(len(all_documents)) + " (" + str(data['download_url'].replace(' ','%20')) + ")..."
-                    
-            else:
-                print "Skipping " + str(document) + "..."
+    if workers <= 1:
+        # Check the last update for each document.
+        for counter, document in enumerate(all_documents, 1):
+            update_document(folder, url, document, server_update, json_bool, counter, total, type)
         
-        else:
-            parsed_codelist_xml = ET.fromstring(data)
-            
-            if server_update < parsed_codelist_xml.attrib['date-last-modified']:
-                
-                save_to_folder(folder, url + str(document), document)
-                print "Progress: " + str(counter) + " out of " + str(len(all_documents)) + "..."
-                
-            else:
-                print "Skipping " + str(document) + "..."
-        
-        counter += 1
+        return
+    
+    # Check the documents concurrently, each worker takes the next document from the queue.
+    queue = Queue.Queue()
+    
+    for counter, document in enumerate(all_documents, 1):
+        queue.put((counter, document))
+    
+    threads = []
+    
+    for worker in range(min(workers, total)):
+        thread = threading.Thread(target=crawl_worker,
+                                  args=(queue, folder, url, server_update, json_bool, total, type))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    
+    for thread in threads:
+        thread.join()
 
 def main():
     '''Crawls the IATI registry for activity, organisation and codelist XMLs 
@@ -189,21 +615,51 @@ def main():
     # Initial settings
     max_limit = 1000
     folder = "/media/Acer/School/IATI-data/xml/"
+    cache_folder = "/media/Acer/School/IATI-data/xml/cache/"
+    state_database = "/media/Acer/School/IATI-data/xml/crawl-state.db"
     iati_url = "http://www.iatiregistry.org/api/"
     retrieve = ['activities', 'organisations', 'codelists']
     
-    # Last time the script was run: "2013-01-06"
-    last_time_updated = "1990"
+    # Concurrency: number of simultaneous documents and requests per host
+    workers = 16
+    max_per_host = 4
+    
+    # Document lists younger than this number of seconds are not retrieved again
+    listing_max_age = 6 * 60 * 60
+    
+    # Documents are compared with their metadata_modified in the crawl state,
+    # so no global last update time is needed.
+    last_time_updated = None
+    
+    set_host_limit(max_per_host)
+    set_http_cache(cache_folder)
+    state = set_crawl_state(state_database)
+    
+    if state.start_run():
+        print "Resuming interrupted crawl..."
     
     for type in retrieve:
         print "Start retrieving " + str(type) + "..."
         
         # Check whether the IATI API is working and retrieve all document names
-        all_documents = retrieve_document_names(iati_url, max_limit, type)
+        all_documents = retrieve_document_names(iati_url, max_limit, type, workers, cache_folder, listing_max_age)
     
         print "Storing XML files to local folder..."
         # Adds XMLs to local folder.
-        update_documents(folder, iati_url, all_documents, last_time_updated, type)
+        update_documents(folder, iati_url, all_documents, last_time_updated, type, workers)
+        
+        # Report what changed since the last run
+        removed = state.mark_removed(type, all_documents)
+        changes = state.changes(type)
+        
+        print "Changes in " + str(type) + ":"
+        for change in ['new', 'updated', 'unchanged', 'skipped', 'failed', 'removed']:
+            print "    " + change + ": " + str(changes.get(change, 0))
+        
+        for document in removed:
+            print "    Removed from registry: " + str(document)
+    
+    state.finish_run()
     
     print "Done!"
     
@@ -3,7 +3,7 @@
 
 from rdflib import RDF, RDFS, Literal, URIRef, Namespace, OWL
 from rdflib.graph import Graph
-import AttributeHelper, hashlib
+import AttributeHelper, HandlerStatistics, TermCache, hashlib
 
 class ActivityElements :
     '''Class for converting XML elements of self.iati activities to a RDFLib self.graph.'''
@@ -12,7 +12,7 @@ class ActivityElements :
         '''Initializes class.
         
         Parameters
-        @defaults: A dictionary of defaults.'''
+        @defaults: A dictionary of defaults, optionally with a triple sink under 'sink'.'''
         
         self.id = defaults['id'].replace(" ", "%20")
         self.default_language = defaults['language']
@@ -23,10 +23,27 @@ class ActivityElements :
         self.default_tied_status = defaults['tied_status']
         self.hierarchy = defaults['hierarchy']
         self.linked_data_uri = defaults['linked_data_uri']
-        self.iati = defaults['namespace']
-        self.iati_custom = Namespace(defaults['namespace'] + "custom/")
+        self.iati = TermCache.namespace(defaults['namespace'])
+        self.iati_custom = TermCache.namespace(defaults['namespace'] + "custom/")
+        
+        # A RDFLib Graph, unless a triple sink such as TripleSink.NTriplesSink is given
+        if defaults.get('sink') == None:
+            self.graph = Graph()
+        else:
+            self.graph = defaults['sink']
+        
+        # Optional HandlerStatistics, for which the added triples are counted
+        self.statistics = defaults.get('statistics')
+        
+        if not self.statistics == None:
+            self.graph = HandlerStatistics.CountingGraph(self.graph, self.statistics)
+        
+        # Optional list to which a record of each location is added, for matching the
+        # locations without reading the converted activities again
+        self.locations = defaults.get('locations')
+        self.location_records = []
+        self.country_label = None
         
-        self.graph = Graph()
         self.graph.bind('iati', self.iati)
         self.graph.bind('iati-custom', self.iati_custom)
         self.graph.bind('activity', self.iati['activity/'])
@@ -55,8 +72,44 @@ class ActivityElements :
         Returns
         @graph: The RDFLib self.graph with added statements.'''
         
+        if not self.locations == None:
+            for record in self.location_records:
+                if not self.country_label == None:
+                    record['country_label'] = self.country_label
+                
+                self.locations.append(record)
+        
+        if not self.statistics == None:
+            return self.graph.graph
+        
         return self.graph
     
+    def _add_location_record(self, hash_location, name, coordinates):
+        '''Adds a record of a location with its label and coordinates to the location records.
+        The country label of the activity is added when the activity is done.
+        
+        Parameters
+        @hash_location: The hash of the location.
+        @name: The ElementTree of the name element or None.
+        @coordinates: The ElementTree of the coordinates element or None.'''
+        
+        record = dict([('id', unicode(self.iati['activity/' + self.id + '/location/' + str(hash_location)]))])
+        
+        if not name == None:
+            label = AttributeHelper.attribute_language(name, self.default_language)
+            
+            if not label == None:
+                record['label'] = unicode(label)
+        
+        if not coordinates == None:
+            for key in ['latitude', 'longitude', 'precision']:
+                value = AttributeHelper.attribute_key(coordinates, key)
+                
+                if not value == None:
+                    record[key] = value
+        
+        self.location_records.append(record)
+    
     def process_unknown_tag(self, tag):
         '''Returns the correct tag for use in unknown elements.
         
@@ -613,6 +666,10 @@ class ActivityElements :
                 self.graph.add((self.iati['activity/' + self.id + '/recipient-country/' + str(code)],
                                 self.iati['percentage'],
                                 Literal(percentage)))
+            
+            # The first recipient country is the country of the locations of the activity
+            if (not self.locations == None) and (self.country_label == None) and (not country_name == None):
+                self.country_label = unicode(country_name)
     
     def recipient_region(self, xml):
         '''Converts the XML of the recipient-region element to a RDFLib self.graph.
@@ -719,6 +776,9 @@ class ActivityElements :
                 
         if hash_created:
             hash_location = hash.hexdigest()
+            
+            if not self.locations == None:
+                self._add_location_record(hash_location, name, coordinates)
     
             self.graph.add((self.iati['activity/' + self.id],
                             self.iati['activity-location'],
@@ -1819,9 +1879,16 @@ class ActivityElements :
         Parameters
         @xml: The XML of this element.'''
         
+        # Keys
+        attached = AttributeHelper.attribute_key(xml, 'attached')
+        
         # Elements
-        conditions_container = xml.find('conditions')
-        conditions = conditions_container.findall('condition')
+        conditions = xml.findall('condition')
+        
+        if not attached == None:
+            self.graph.add((self.iati['activity/' + self.id],
+                            self.iati['activity-conditions-attached'],
+                            Literal(attached)))
         
         if not conditions == []:
             
@@ -1957,6 +2024,8 @@ class ActivityElements :
             if not indicators == []:
                 
                 for indicator in indicators:
+                    indicator = AttributeHelper.index(indicator)
+                    
                     # Create hash
                     # Required: one of title or description
                     
@@ -2078,6 +2147,8 @@ class ActivityElements :
                         if not periods == []:
                             
                             for period in periods:
+                                period = AttributeHelper.index(period)
+                                
                                 # Elements
                                 period_start = period.find('period-start')
                                 period_end = period.find('period-end')
@@ -2229,16 +2300,20 @@ class CodelistElements :
         '''Initializes class.
         
         Parameters
-        @defaults: A dictionary of defaults.'''
+        @defaults: A dictionary of defaults, optionally with a triple sink under 'sink'.'''
         
         self.id = defaults['id']
         self.default_language = defaults['language']
         
-        self.iati = Namespace(defaults['namespace'])
-        self.codelist = Namespace(self.iati['codelist/'])
+        self.iati = TermCache.namespace(defaults['namespace'])
+        self.codelist = TermCache.namespace(self.iati['codelist/'])
         self.codelist_uri = Namespace(self.codelist[str(self.id) + '/'])
         
-        self.graph = Graph()
+        # A RDFLib Graph, unless a triple sink such as TripleSink.NTriplesSink is given
+        if defaults.get('sink') == None:
+            self.graph = Graph()
+        else:
+            self.graph = defaults['sink']
         
         self.graph.bind('iati', self.iati)
         self.graph.bind('codelist', self.codelist)
@@ -2434,17 +2509,28 @@ class OrganisationElements :
         '''Initializes class.
         
         Parameters
-        @defaults: A dictionary of defaults.'''
+        @defaults: A dictionary of defaults, optionally with a triple sink under 'sink'.'''
         
         self.id = defaults['id'].replace(" ", "%20")
         self.default_language = defaults['language']
         self.default_currency = defaults['currency']
         
-        self.iati = Namespace(defaults['namespace'])
-        self.iati_custom = Namespace(defaults['namespace'] + "custom/")
+        self.iati = TermCache.namespace(defaults['namespace'])
+        self.iati_custom = TermCache.namespace(defaults['namespace'] + "custom/")
         self.org_uri = Namespace(self.iati['organisation/' + self.id])
         
-        self.graph = Graph()
+        # A RDFLib Graph, unless a triple sink such as TripleSink.NTriplesSink is given
+        if defaults.get('sink') == None:
+            self.graph = Graph()
+        else:
+            self.graph = defaults['sink']
+        
+        # Optional HandlerStatistics, for which the added triples are counted
+        self.statistics = defaults.get('statistics')
+        
+        if not self.statistics == None:
+            self.graph = HandlerStatistics.CountingGraph(self.graph, self.statistics)
+        
         self.graph.bind('iati', self.iati)
         self.graph.bind('iati-custom', self.iati_custom)
         self.graph.bind('owl', 'http://www.w3.org/2002/07/owl#')
@@ -2462,24 +2548,15 @@ class OrganisationElements :
                         self.org_uri))
        
 
-    def __update_progress(self, element):
-        '''Updates the progress of the number of elements.
-        
-        Parameters
-        @element: A string of the element name.'''
-        
-        try:
-            self.progress[element] += 1
-        except KeyError:
-            self.progress[element] = 1
-
-            
     def get_result(self):
         '''Returns the resulting self.graph of the activity.
         
         Returns
         @graph: The RDFLib self.graph with added statements.'''
         
+        if not self.statistics == None:
+            return self.graph.graph
+        
         return self.graph
     
     def process_unknown_tag(self, tag):
@@ -1,7 +1,8 @@
 ## By Kasper Brandt
 ## Last updated on 22-05-2013
 
-import glob, sys, json, os, IatiConverter, AttributeHelper
+import glob, sys, json, os, IatiConverter, IatiElements, AttributeHelper, AddProvenance, ConversionManifest
+import HandlerStatistics
 import xml.etree.ElementTree as ET
 from rdflib import Namespace, Graph, Literal, URIRef
 
@@ -12,6 +13,13 @@ def main():
     xml_folder = "/media/Acer/School/IATI-data/xml/organisations/"
     turtle_folder = "/media/Acer/School/IATI-data/organisation/"
     Iati = Namespace("http://purl.org/collections/iati/")
+    
+    # A .json or .csv file to write the calls, time, triples and failures per handler
+    # to, or None to not keep handler statistics
+    statistics_file = None
+    
+    # Only convert new and changed documents, according to the conversion manifest
+    incremental = True
         
     if not os.path.isdir(turtle_folder):
         os.makedirs(turtle_folder)
@@ -19,10 +27,30 @@ def main():
     document_count = 1
     organisation_count = 1
     
+    if not statistics_file == None:
+        statistics = HandlerStatistics.HandlerStatistics()
+    else:
+        statistics = None
+    
+    documents = glob.glob(xml_folder + '*.xml')
+    
+    if incremental:
+        code_version = ConversionManifest.code_version(ConversionManifest.converter_modules(sys.modules[__name__]))
+        manifest = ConversionManifest.ConversionManifest(turtle_folder + 'manifest.json', code_version)
+        
+        for name in manifest.remove_documents(documents):
+            print "Removed: Document " + name
+    else:
+        manifest = None
+    
     # Retrieve XML files from the XML folder
-    for document in glob.glob(xml_folder + '*.xml'):
+    for document in documents:
+        
+        if (not manifest == None) and (not manifest.needs_conversion(document)):
+            continue
         
         organisation_ids = []
+        files = []
         
         doc_fail = False
         
@@ -53,7 +81,7 @@ def main():
                     
                     try:
                         converter = IatiConverter.ConvertOrganisation(organisation)
-                        graph, id, last_updated = converter.convert(Iati)
+                        graph, id, last_updated = converter.convert(Iati, None, statistics)
                     except TypeError as e:
                         print "Error in " + document + ":" + str(e)
                     
@@ -65,6 +93,8 @@ def main():
                         
                         with open(doc_folder + str(id.replace('/','%2F')) + '.ttl', 'w') as turtle_file:
                             turtle_file.write(graph_turtle)
+                        
+                        files.append(doc_folder + str(id.replace('/','%2F')) + '.ttl')
                     
                     organisation_count += 1
                     organisation_ids.append(id)
@@ -73,7 +103,7 @@ def main():
                     
                     try:
                         converter = IatiConverter.ConvertOrganisation(organisation)
-                        graph, id, last_updated = converter.convert(Iati)
+                        graph, id, last_updated = converter.convert(Iati, None, statistics)
                     except TypeError as e:
                         print "Error in " + document + ":" + str(e)
                     
@@ -85,6 +115,8 @@ def main():
                         
                         with open(doc_folder + str(id.replace('/','%2F')) + '.ttl', 'w') as turtle_file:
                             turtle_file.write(graph_turtle)
+                        
+                        files.append(doc_folder + str(id.replace('/','%2F')) + '.ttl')
                     
                     organisation_count += 1
                     organisation_ids.append(id)
@@ -93,7 +125,7 @@ def main():
                 
                 try:
                     converter = IatiConverter.ConvertOrganisation(xml.getroot())
-                    graph, id, last_updated = converter.convert(Iati)
+                    graph, id, last_updated = converter.convert(Iati, None, statistics)
                 except TypeError as e:
                     print "Error in " + document + ":" + str(e)
                 
@@ -105,6 +137,8 @@ def main():
                     
                     with open(doc_folder + str(id.replace('/','%2F')) + '.ttl', 'w') as turtle_file:
                         turtle_file.write(graph_turtle)
+                    
+                    files.append(doc_folder + str(id.replace('/','%2F')) + '.ttl')
                 
                 organisation_count += 1
                 organisation_ids.append(id)
@@ -130,7 +164,18 @@ def main():
             
             with open(doc_folder + 'provenance-' + doc_id + '.ttl', 'w') as turtle_file:
                 turtle_file.write(provenance_turtle)
-        
+            
+            files.append(doc_folder + 'provenance-' + doc_id + '.ttl')
+            
+            if not manifest == None:
+                manifest.record(document, files)
+    
+    if not manifest == None:
+        manifest.save()
+    
+    if not statistics == None:
+        statistics.write(statistics_file)
+    
     print "Done!"
     
 if __name__ == "__main__":
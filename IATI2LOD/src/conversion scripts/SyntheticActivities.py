@@ -0,0 +1,268 @@
+## SyntheticActivities.py
+## Generates synthetic iati-activities documents for benchmarking the conversion.
+
+import os, json, random
+import xml.etree.ElementTree as ET
+
+versions = ['1.01', '1.02', '1.03']
+languages = ['en', 'fr', 'es', 'nl']
+currencies = ['USD', 'EUR', 'GBP', 'SEK']
+countries = ['KE', 'UG', 'TZ', 'ET', 'NG', 'GH', 'BD', 'NP', 'AF', 'HT', 'BO', 'PE']
+sectors = ['11220', '12220', '14030', '15110', '23030', '31120', '43040', '72010']
+transaction_types = ['C', 'D', 'E', 'IF', 'IR', 'LR', 'R']
+words = ['water', 'health', 'education', 'rural', 'support', 'programme', 'capacity', 'building',
+         'district', 'sanitation', 'energy', 'food', 'security', 'governance', 'training', 'wells']
+
+extension_namespace = "http://example.org/iati-extension"
+
+def text(generator, count):
+    '''Returns a text of random words.
+    
+    Parameters
+    @generator: A random.Random instance.
+    @count: The number of words.
+    
+    Returns
+    @text: A string of the words.'''
+    
+    return " ".join([generator.choice(words) for index in range(count)])
+
+def date(generator):
+    '''Returns a random ISO date.
+    
+    Parameters
+    @generator: A random.Random instance.
+    
+    Returns
+    @date: A string of the date.'''
+    
+    return "%04d-%02d-%02d" % (generator.randint(2005, 2013), generator.randint(1, 12), generator.randint(1, 28))
+
+def add_element(parent, tag, content=None, **keys):
+    '''Adds a child element to an ElementTree.
+    
+    Parameters
+    @parent: The parent ElementTree.
+    @tag: The tag of the child.
+    @content: The text of the child or None.
+    @keys: The attributes of the child.
+    
+    Returns
+    @element: The ElementTree of the child.'''
+    
+    element = ET.SubElement(parent, tag, dict([(key.replace('_', '-'), value) for key, value in keys.items()]))
+    
+    if not content == None:
+        element.text = content
+    
+    return element
+
+def add_transaction(generator, activity, currency, reporting_ref):
+    '''Adds a transaction element to an activity.
+    
+    Parameters
+    @generator: A random.Random instance.
+    @activity: The ElementTree of the activity.
+    @currency: The currency of the activity.
+    @reporting_ref: The reference of the reporting organisation.'''
+    
+    transaction = add_element(activity, 'transaction')
+    transaction_date = date(generator)
+    
+    add_element(transaction, 'transaction-type', code=generator.choice(transaction_types))
+    add_element(transaction, 'provider-org', text(generator, 2), ref=reporting_ref)
+    add_element(transaction, 'receiver-org', text(generator, 2), ref="XM-DAC-" + str(generator.randint(1, 999)))
+    add_element(transaction, 'value', str(generator.randint(100, 10000000)),
+                currency=currency, value_date=transaction_date)
+    add_element(transaction, 'description', text(generator, 6))
+    add_element(transaction, 'transaction-date', iso_date=transaction_date)
+    add_element(transaction, 'flow-type', code="10")
+    add_element(transaction, 'finance-type', code="110")
+    add_element(transaction, 'aid-type', code="C01")
+    add_element(transaction, 'tied-status', code="5")
+
+def add_location(generator, activity, country):
+    '''Adds a location element to an activity.
+    
+    Parameters
+    @generator: A random.Random instance.
+    @activity: The ElementTree of the activity.
+    @country: The recipient country code of the activity.'''
+    
+    location = add_element(activity, 'location', percentage=str(generator.randint(1, 100)))
+    name = text(generator, 1).capitalize()
+    
+    add_element(location, 'location-type', code=generator.choice(['PPL', 'PPLA', 'ADM1', 'ADM2']))
+    add_element(location, 'name', name)
+    add_element(location, 'description', text(generator, 4))
+    add_element(location, 'administrative', name, country=country, adm1=text(generator, 1).capitalize())
+    add_element(location, 'coordinates', latitude="%.5f" % generator.uniform(-30, 30),
+                longitude="%.5f" % generator.uniform(-80, 100), precision=str(generator.randint(1, 8)))
+    add_element(location, 'gazetteer-entry', str(generator.randint(100000, 9999999)), gazetteer_ref="GEO")
+
+def add_result(generator, activity, periods):
+    '''Adds a result element with an indicator to an activity.
+    
+    Parameters
+    @generator: A random.Random instance.
+    @activity: The ElementTree of the activity.
+    @periods: The number of periods of the indicator.'''
+    
+    result = add_element(activity, 'result', type=generator.choice(['1', '2', '3']))
+    
+    add_element(result, 'title', text(generator, 3))
+    add_element(result, 'description', text(generator, 8))
+    
+    indicator = add_element(result, 'indicator', measure="1")
+    
+    add_element(indicator, 'title', text(generator, 2))
+    add_element(indicator, 'description', text(generator, 5))
+    add_element(indicator, 'baseline', year="2010", value=str(generator.randint(0, 100)))
+    
+    for index in range(periods):
+        period = add_element(indicator, 'period')
+        
+        add_element(period, 'period-start', iso_date=date(generator))
+        add_element(period, 'period-end', iso_date=date(generator))
+        add_element(period, 'target', value=str(generator.randint(0, 1000)))
+        add_element(period, 'actual', value=str(generator.randint(0, 1000)))
+
+def add_extension(generator, activity):
+    '''Adds a non-IATI standard element with children to an activity.
+    
+    Parameters
+    @generator: A random.Random instance.
+    @activity: The ElementTree of the activity.'''
+    
+    extension = add_element(activity, '{' + extension_namespace + '}' + generator.choice(['project', 'marker', 'note']),
+                            text(generator, 3), code=str(generator.randint(1, 99)))
+    
+    add_element(extension, '{' + extension_namespace + '}detail', text(generator, 4))
+
+def generate_activity(generator, parent, publisher, number, settings):
+    '''Adds a synthetic iati-activity element to an iati-activities element.
+    
+    Parameters
+    @generator: A random.Random instance.
+    @parent: The ElementTree of the iati-activities element.
+    @publisher: The reference of the reporting organisation.
+    @number: The number of the activity within the publisher.
+    @settings: A dictionary with the numbers of transactions, locations, results,
+               periods and extensions per activity.'''
+    
+    currency = generator.choice(currencies)
+    country = generator.choice(countries)
+    
+    activity = add_element(parent, 'iati-activity', default_currency=currency, last_updated_datetime=date(generator))
+    activity.set('{http://www.w3.org/XML/1998/namespace}lang', generator.choice(languages))
+    
+    add_element(activity, 'iati-identifier', publisher + "-" + str(number))
+    add_element(activity, 'reporting-org', text(generator, 2), ref=publisher, type="10")
+    add_element(activity, 'participating-org', text(generator, 2), ref=publisher, role="Funding", type="10")
+    add_element(activity, 'participating-org', text(generator, 2), role="Implementing", type="21")
+    add_element(activity, 'title', text(generator, 5))
+    add_element(activity, 'description', "\n    " + text(generator, 30) + "\n  ", type="1")
+    add_element(activity, 'activity-status', code=str(generator.randint(1, 5)))
+    add_element(activity, 'activity-date', type="start-planned", iso_date=date(generator))
+    add_element(activity, 'activity-date', type="end-planned", iso_date=date(generator))
+    add_element(activity, 'recipient-country', country, code=country, percentage="100")
+    add_element(activity, 'sector', text(generator, 1), code=generator.choice(sectors), vocabulary="DAC")
+    add_element(activity, 'collaboration-type', code="1")
+    add_element(activity, 'default-flow-type', code="10")
+    add_element(activity, 'default-finance-type', code="110")
+    add_element(activity, 'default-aid-type', code="C01")
+    add_element(activity, 'default-tied-status', code="5")
+    
+    budget = add_element(activity, 'budget', type="1")
+    add_element(budget, 'period-start', iso_date=date(generator))
+    add_element(budget, 'period-end', iso_date=date(generator))
+    add_element(budget, 'value', str(generator.randint(1000, 10000000)), currency=currency, value_date=date(generator))
+    
+    for index in range(settings['locations']):
+        add_location(generator, activity, country)
+    
+    for index in range(settings['transactions']):
+        add_transaction(generator, activity, currency, publisher)
+    
+    for index in range(settings['results']):
+        add_result(generator, activity, settings['periods'])
+    
+    for index in range(settings['extensions']):
+        add_extension(generator, activity)
+    
+    return activity
+
+def generate_document(generator, number, settings):
+    '''Returns a synthetic iati-activities document.
+    
+    Parameters
+    @generator: A random.Random instance.
+    @number: The number of the document, used for the publisher reference.
+    @settings: A dictionary with the number of activities and the numbers of
+               elements per activity, see generate_activity.
+    
+    Returns
+    @xml: A string of the XML document.'''
+    
+    ET.register_namespace('ext', extension_namespace)
+    
+    root = ET.Element('iati-activities', dict([('version', versions[number % len(versions)]),
+                                               ('generated-datetime', date(generator) + 'T00:00:00')]))
+    
+    publisher = "XM-SYN-" + str(number)
+    
+    for index in range(settings['activities']):
+        generate_activity(generator, root, publisher, index, settings)
+    
+    return ET.tostring(root, encoding='UTF-8')
+
+def generate_metadata(name):
+    '''Returns registry metadata for a synthetic document, as used for the provenance.
+    
+    Parameters
+    @name: The document name.
+    
+    Returns
+    @metadata: A dictionary of the metadata.'''
+    
+    return dict([('name', name),
+                 ('download_url', 'http://example.org/synthetic/' + name + '.xml'),
+                 ('metadata_modified', '2013-01-01T00:00:00'),
+                 ('isopen', True)])
+
+def main():
+    '''Writes synthetic activity XMLs and their metadata to a local folder, in the
+    layout that ActivitiesToTurtle expects.'''
+    
+    # Settings
+    xml_folder = "/media/Acer/School/IATI-data/benchmark/xml/activities/"
+    documents = 10
+    seed = 1
+    
+    settings = dict([('activities', 100),
+                     ('transactions', 5),
+                     ('locations', 2),
+                     ('results', 1),
+                     ('periods', 2),
+                     ('extensions', 1)])
+    
+    if not os.path.isdir(xml_folder):
+        os.makedirs(xml_folder)
+    
+    generator = random.Random(seed)
+    
+    for number in range(documents):
+        name = "synthetic-" + str(number)
+        
+        with open(xml_folder + name + '.xml', 'w') as xml_file:
+            xml_file.write(generate_document(generator, number, settings))
+        
+        with open(xml_folder + name + '.json', 'w') as json_file:
+            json.dump(generate_metadata(name), json_file)
+        
+        print "Generated: Document " + name
+    
+    print "Done!"
+
+if __name__ == "__main__":
+    main()
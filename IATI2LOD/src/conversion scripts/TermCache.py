@@ -0,0 +1,61 @@
+## TermCache.py
+## Shared cache of the URIRefs that the element classes create from a namespace.
+
+from rdflib import Namespace
+
+# Settings
+max_terms = 100000
+
+namespaces = {}
+
+class InternedNamespace(Namespace):
+    '''Class for a RDFLib Namespace that returns the same URIRef object for the same
+    term, instead of concatenating and creating a new URIRef on every lookup. The
+    number of cached terms is bounded by max_terms, after which the cache starts over.'''
+    
+    def __new__(cls, value):
+        namespace = Namespace.__new__(cls, value)
+        namespace.terms = {}
+        
+        return namespace
+    
+    def __getitem__(self, key, default=None):
+        try:
+            return self.terms[key]
+        
+        except KeyError:
+            term = Namespace.term(self, key)
+            
+            if len(self.terms) >= max_terms:
+                self.terms.clear()
+            
+            self.terms[key] = term
+            
+            return term
+        
+        except TypeError:
+            # Unhashable keys such as slices are not cached
+            return Namespace.term(self, key)
+    
+    def term(self, name):
+        return self[name]
+
+def namespace(uri):
+    '''Returns the shared interning namespace of an URI, so the element classes of all
+    activities, organisations and codelists use the same cache.
+    
+    Parameters
+    @uri: The URI of the namespace, such as a RDFLib Namespace.
+    
+    Returns
+    @namespace: An InternedNamespace.'''
+    
+    key = unicode(uri)
+    
+    try:
+        return namespaces[key]
+    
+    except KeyError:
+        namespaces[key] = InternedNamespace(key)
+        
+        return namespaces[key]
@@ -0,0 +1,165 @@
+## TripleSink.py
+## Writes triples straight to N-Triples or N-Quads instead of a RDFLib Graph.
+
+import os, re, shutil
+from rdflib import Literal, BNode
+
+non_ascii = re.compile(u'[^\x00-\x7f]')
+
+def escape_non_ascii(text):
+    '''Returns a string with the characters outside ASCII as \\u or \\U escapes, since
+    N-Triples files are ASCII.
+    
+    Parameters
+    @text: A unicode string.
+    
+    Returns
+    @text: The escaped unicode string.'''
+    
+    def escape(match):
+        code = ord(match.group(0))
+        
+        if code > 0xFFFF:
+            return u'\\U%08X' % code
+        
+        return u'\\u%04X' % code
+    
+    return non_ascii.sub(escape, text)
+
+def term_to_nt(term):
+    '''Returns the N-Triples notation of a RDFLib term.
+    
+    Parameters
+    @term: A RDFLib URIRef, BNode or Literal.
+    
+    Returns
+    @nt: A unicode string of the term.'''
+    
+    if isinstance(term, Literal):
+        text = unicode(term).replace('\\', '\\\\').replace('"', '\\"')
+        text = text.replace('\n', '\\n').replace('\r', '\\r')
+        
+        if not term.language == None:
+            return u'"' + escape_non_ascii(text) + u'"@' + term.language
+        
+        if not term.datatype == None:
+            return u'"' + escape_non_ascii(text) + u'"^^<' + escape_non_ascii(unicode(term.datatype)) + u'>'
+        
+        return u'"' + escape_non_ascii(text) + u'"'
+    
+    if isinstance(term, BNode):
+        return u'_:' + unicode(term)
+    
+    return u'<' + escape_non_ascii(unicode(term)) + u'>'
+
+class NTriplesSink :
+    '''Class for writing triples to a file as soon as they are added. It offers the
+    add and bind methods of a RDFLib Graph, so the element classes can use it in
+    place of a Graph.'''
+    
+    def __init__(self, file, graph_uri=None):
+        '''Initializes the sink.
+        
+        Parameters
+        @file: An open file to write to.
+        @graph_uri: The URI of the named graph to write N-Quads, or None for N-Triples.'''
+        
+        self.file = file
+        self.count = 0
+        self.seen = set()
+        
+        self.start(graph_uri)
+    
+    def start(self, graph_uri=None):
+        '''Starts a new group of triples, such as the next activity. Duplicate triples
+        are only filtered within one group, so memory use stays bounded.
+        
+        Parameters
+        @graph_uri: The URI of the named graph of the group, or None for N-Triples.'''
+        
+        self.seen.clear()
+        
+        if graph_uri == None:
+            self.end = u' .\n'
+        else:
+            self.end = u' <' + unicode(graph_uri) + u'> .\n'
+    
+    def bind(self, prefix, namespace):
+        '''Ignored, N-Triples and N-Quads have no prefixes.
+        
+        Parameters
+        @prefix: The prefix.
+        @namespace: The namespace.'''
+        
+        pass
+    
+    def add(self, triple):
+        '''Writes a triple to the file.
+        
+        Parameters
+        @triple: A tuple of subject, predicate and object.'''
+        
+        if triple in self.seen:
+            return
+        
+        self.seen.add(triple)
+        self.count += 1
+        
+        subject, predicate, object = triple
+        
+        line = term_to_nt(subject) + u' ' + term_to_nt(predicate) + u' ' + term_to_nt(object) + self.end
+        
+        self.file.write(line.encode('utf-8'))
+    
+    def __len__(self):
+        '''Returns the number of triples written.
+        
+        Returns
+        @count: The number of triples.'''
+        
+        return self.count
+
+class ShardWriter :
+    '''Class for joining N-Triples or N-Quads files into numbered shards of about
+    the same size, such as activities-00000.nq, activities-00001.nq and so on.'''
+    
+    def __init__(self, prefix, extension, shard_size):
+        '''Initializes the writer.
+        
+        Parameters
+        @prefix: The location of the shards without number, such as /data/activities.
+        @extension: The extension of the shards, such as .nq.
+        @shard_size: The number of bytes after which a new shard is started.'''
+        
+        self.prefix = prefix
+        self.extension = extension
+        self.shard_size = shard_size
+        
+        self.number = 0
+        self.file = None
+    
+    def add(self, file_name):
+        '''Appends a file to the current shard and removes the file.
+        
+        Parameters
+        @file_name: The location of the file.'''
+        
+        if (not self.file == None) and (self.file.tell() >= self.shard_size):
+            self.file.close()
+            self.file = None
+            self.number += 1
+        
+        if self.file == None:
+            self.file = open(self.prefix + '-%05d' % self.number + self.extension, 'wb')
+        
+        with open(file_name, 'rb') as input_file:
+            shutil.copyfileobj(input_file, self.file)
+        
+        os.remove(file_name)
+    
+    def close(self):
+        '''Closes the current shard.'''
+        
+        if not self.file == None:
+            self.file.close()
+            self.file = None
@@ -1,7 +1,7 @@
 ## By Kasper Brandt
 ## Last updated on 26-05-2013
 
-import os, sys, datetime, urllib2, AddProvenance
+import os, sys, datetime, AddProvenance, HttpClient
 from rdflib import Namespace, Graph
 
 # Settings
@@ -33,8 +33,7 @@ for dbpedia_file in dbpedia_files:
                 dbpedia_url = "http://dbpedia.org/data/" + dbpedia_item + ".ttl"
                 source_ttls.append(dbpedia_url)
                 
-                turtle_response = urllib2.urlopen(dbpedia_url)
-                turtle_data = turtle_response.read()
+                turtle_data = HttpClient.read(dbpedia_url)
                 
                 print "Retrieved data from " + dbpedia_url + ", writing to file..."
                 
@@ -1,7 +1,7 @@
 ## By Kasper Brandt
 ## Last updated on 26-05-2013
 
-import os, sys, datetime, urllib2, AddProvenance
+import os, sys, datetime, AddProvenance, HttpClient
 from rdflib import Namespace, Graph
 
 # Settings
@@ -30,7 +30,7 @@ with open(factbook_file, 'r') as f:
             factbook_url = "http://wifo5-04.informatik.uni-mannheim.de/factbook/data/" + factbook_item
             sources.append(factbook_url)
             
-            turtle_data = urllib2.urlopen(factbook_url).read()
+            turtle_data = HttpClient.read(factbook_url)
             
             print "Retrieved data from " + factbook_url + ", writing to file..."
             
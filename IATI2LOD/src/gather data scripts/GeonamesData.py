@@ -1,7 +1,7 @@
 ## By Kasper Brandt
 ## Last updated on 26-05-2013
 
-import os, sys, datetime, urllib2, AddProvenance
+import os, sys, datetime, AddProvenance, HttpClient
 from rdflib import Namespace, Graph
 
 # Settings
@@ -51,8 +51,8 @@ for geonames_file in geonames_files:
                     source_rdfs.append(geonames_about_url)
                     source_rdfs.append(geonames_contains_url)
                     
-                    rdf_about_data = urllib2.urlopen(geonames_about_url).read()
-                    rdf_contains_data = urllib2.urlopen(geonames_contains_url).read()
+                    rdf_about_data = HttpClient.read(geonames_about_url)
+                    rdf_contains_data = HttpClient.read(geonames_contains_url)
                     
                     print "Retrieved data from " + geonames_about_url + ", writing to file (" + str(total_count) + " of " + str(total_from_file) + ")..."
                     
@@ -1,7 +1,7 @@
 ## By Kasper Brandt
 ## Last updated on 26-05-2013
 
-import os, sys, datetime, urllib, urllib2, AddProvenance
+import os, sys, datetime, urllib, AddProvenance, HttpClient
 import xml.etree.ElementTree as ET
 from rdflib import Namespace, Graph, Literal, RDF
 
@@ -107,7 +107,7 @@ for indicator in indicators:
     url = indicator_webservice + indicator
     sources.append(url)
     
-    response = urllib2.urlopen(url).read()
+    response = HttpClient.read(url)
     xml = ET.fromstring(response)
     
     for indicator_node in xml:
@@ -163,8 +163,8 @@ for indicator in indicators:
                     url = webservice + params_encoded
                     
                     try:
-                        response = urllib2.urlopen(url).read()
-                    except urllib2.HTTPError as e:
+                        response = HttpClient.read(url)
+                    except HttpClient.HttpError as e:
                         print "Connection failed..."
                         errors += 1
                         break
@@ -1,94 +1,184 @@
 ## By Kasper Brandt
 ## Last updated on 22-05-2013
 
-from SPARQLWrapper import SPARQLWrapper, JSON
-from rdflib import RDF, RDFS, Literal, URIRef, Namespace, OWL
-from rdflib.graph import Graph
-import xml.etree.ElementTree as ET
-import glob, os, sys, re
+import glob, os, re, mmap, itertools, multiprocessing, LocationTable
 
-# Settings
-turtle_folder = "/media/Acer/School/IATI-data/mappings/"
-activities_folder = "/media/Acer/School/IATI-data/activity/"
+# The subject line of a location or recipient country block, with any indentation and
+# other types of the subject
+block_pattern = re.compile(r'^[ \t]*(\S+)[ \t]+a[ \t]+[^\n]*iati:(location|country)(?![\w-])', re.MULTILINE)
+literal_pattern = re.compile(r'\"(.+?)\"')
 
-locations = {}
-location_count = 0
+def literal(line):
+    '''Returns the text of the literal on a line of a block.
+    
+    Parameters
+    @line: A line of a Turtle block.
+    
+    Returns
+    @text: The text between the first quotes, or None.'''
+    
+    match = literal_pattern.search(line)
+    
+    if match == None:
+        return None
+    
+    return match.group(1)
 
-# Retrieve TTL files from the activities folder
-for folder in glob.glob(activities_folder + '*'):
-    print "Checking out folder " + str(folder) + "..."
+def read_block(data, position):
+    '''Returns the predicate lines of a block, up to the line that ends the block.
     
-    for activity_file in glob.glob(folder + '/*.ttl'):
+    Parameters
+    @data: The memory-mapped Turtle file.
+    @position: A position on the subject line of the block.
+    
+    Returns
+    @lines: A list of the lines of the block.'''
+    
+    lines = []
+    
+    # The rest of the subject line holds the types of the subject
+    end = data.find('\n', position)
+    
+    if (end == -1) or (data[position:end].rstrip().endswith('.')):
+        return lines
+    
+    position = end + 1
+    
+    while position < len(data):
+        end = data.find('\n', position)
+        
+        if end == -1:
+            end = len(data)
         
-        with open(activity_file, 'r') as turtle_file:
-            turtle_file_data = turtle_file.read()
-            
-            # Check whether the file has a location
-            if "iati:location" in turtle_file_data:
-                print "Found location in " + str(activity_file) + "..."
-                location_count += 1
+        line = data[position:end]
+        position = end + 1
+        
+        if not ":" in line:
+            break
+        
+        lines.append(line)
+        
+        if line.endswith(' .'):
+            break
+    
+    return lines
+
+def scan_file(activity_file):
+    '''Finds the locations of a Turtle file in one pass over the memory-mapped file.
+    
+    Parameters
+    @activity_file: The location of a Turtle file of an activity.
+    
+    Returns
+    @locations: A dictionary of location URI to a dictionary of location information.'''
+    
+    locations = {}
+    country_label = None
+    
+    with open(activity_file, 'rb') as turtle_file:
+        if os.fstat(turtle_file.fileno()).st_size == 0:
+            return locations
+        
+        data = mmap.mmap(turtle_file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        try:
+            for match in block_pattern.finditer(data):
+                subject = match.group(1)
                 
-                location_information = {}
-                done_location = False
-                done_country = False
+                if match.group(2) == 'location':
+                    location_information = {}
+                    
+                    for line in read_block(data, match.end()):
+                        if "rdfs:label" in line:
+                            location_information['label'] = literal(line)
+                        
+                        elif "iati:coordinates-precision" in line:
+                            location_information['precision'] = line.rsplit('/',1)[1].split('>',1)[0]
+                        
+                        elif "iati:latitude" in line:
+                            location_information['latitude'] = literal(line)
+                        
+                        elif "iati:longitude" in line:
+                            location_information['longitude'] = literal(line)
+                    
+                    locations[subject.replace("<","").replace(">","")] = location_information
                 
-                # Look up the location information
-                turtle_file.seek(0)
-                while not done_location:
-                    line = turtle_file.readline()
+                elif ("/recipient-country/" in subject) and (country_label == None):
+                    for line in read_block(data, match.end()):
+                        if "rdfs:label" in line:
+                            country_label = literal(line)
+        
+        finally:
+            data.close()
+    
+    # The recipient country is the country of all locations of the activity
+    if not country_label == None:
+        for location_information in locations.values():
+            location_information['country_label'] = country_label
+    
+    return locations
 
-                    if "iati:location " in line:
-                        location_id = line.split()[0].replace("<","").replace(">","")
-                        
-                        while not done_location:
-                            line = turtle_file.readline()
-                            
-                            if ":" in line:
-                                if "rdfs:label" in line:
-                                    match = re.search(r'\"(.+?)\"', line)
-                                    location_information['label'] = match.group(0).replace('"', '')
-                                    
-                                elif "iati:coordinates-precision" in line:
-                                    location_information['precision'] = line.rsplit('/',1)[1][:1]
-                                    
-                                elif "iati:latitude" in line:
-                                    match_lat = re.search(r'\"(.+?)\"', line)
-                                    location_information['latitude'] = match_lat.group(0).replace('"', '')
-                                    
-                                elif "iati:longitude" in line:
-                                    match_long = re.search(r'\"(.+?)\"', line)
-                                    location_information['longitude'] = match_long.group(0).replace('"', '')
-                                    
-                            else:
-                                done_location = True
-                                
-                # Look up recipient country information
-                turtle_file.seek(0)
-                if ("/recipient-country/" in turtle_file_data):
-                    while not done_country:
-                         line = turtle_file.readline()
-                         
-                         if ("/recipient-country/" in line) and ("> a iati:country ;" in line):
-                             while not done_country:
-                                line = turtle_file.readline()
-                                 
-                                if ":" in line:
-                                    if "rdfs:label" in line:
-                                        match_country = re.search(r'\"(.+?)\"', line)
-                                        location_information['country_label'] = match_country.group(0).replace('"', '')
-                                        
-                                else:
-                                    done_country = True
-                                    
-            locations[location_id] = location_information
-            
-print "Writing to file..."
+def scan_folder(folder):
+    '''Finds the locations of the Turtle files in a folder, run by the worker processes.
+    
+    Parameters
+    @folder: The folder of the Turtle files of a document.
+    
+    Returns
+    @folder: The folder.
+    @locations: A dictionary of location URI to a dictionary of location information.'''
+    
+    locations = {}
+    
+    for activity_file in glob.glob(folder + '/*.ttl'):
+        locations.update(scan_file(activity_file))
+    
+    return folder, locations
 
-with open(turtle_folder + 'locations.help', 'w') as locations_file:
-    for key in locations.keys():
-        locations_file.write("id: " + str(key) + "\n")
-        for location_key in locations[key].keys():
-            locations_file.write(str(location_key) + ": " + str(locations[key][location_key]) + "\n")
-        locations_file.write("\n")
+def main():
+    '''Gathers the locations of the converted activities in parallel and writes them to
+    a location table for GeonamesLocations.'''
+    
+    # Settings
+    turtle_folder = "/media/Acer/School/IATI-data/mappings/"
+    activities_folder = "/media/Acer/School/IATI-data/activity/"
+    
+    # Number of folders scanned in parallel, 1 scans in this process
+    processes = multiprocessing.cpu_count()
+    
+    folders = [folder for folder in sorted(glob.glob(activities_folder + '*')) if os.path.isdir(folder)]
+    
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(scan_folder, folders)
+    else:
+        pool = None
+        results = itertools.imap(scan_folder, folders)
+    
+    locations = {}
+    
+    for folder, folder_locations in results:
+        print "Checked out folder " + str(folder) + ", found " + str(len(folder_locations)) + " locations..."
+        
+        locations.update(folder_locations)
+    
+    if not pool == None:
+        pool.close()
+        pool.join()
+    
+    print "Writing to file..."
+    
+    table = LocationTable.LocationTable()
+    
+    for key in sorted(locations.keys()):
+        location_information = locations[key]
+        location_information['link'] = key
         
-print "Done, total number of locations: " + str(location_count)
\ No newline at end of file
+        table.append(location_information)
+    
+    LocationTable.write_table(table, turtle_folder + 'locations.table')
+    
+    print "Done, total number of locations: " + str(len(locations))
+
+if __name__ == "__main__":
+    main()
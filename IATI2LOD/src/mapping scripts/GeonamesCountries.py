@@ -4,7 +4,7 @@
 from rdflib import RDF, RDFS, Literal, URIRef, Namespace, OWL
 from rdflib.graph import Graph
 import xml.etree.ElementTree as ET
-import os, sys, httplib2, urllib, datetime, AddProvenance
+import os, sys, httplib2, urllib, datetime, AddProvenance, HttpClient
 
 # Settings
 turtle_folder = "/media/Acer/School/IATI-data/mappings/Geonames/"
@@ -57,11 +57,11 @@ for country in root.findall('Country'):
         url = url + "&featureCode=" + feature_code
     
     try:
-        response, content = httplib2.Http().request(url, "GET")
+        response, content = HttpClient.request(url, "GET")
         
     except httplib2.ServerNotFoundError as e:
         print e
-        sys.exit(0)
+        sys.exit(1)
         
     geonames_xml = ET.fromstring(content)
     
@@ -202,11 +202,11 @@ for not_found_country in not_found:
     url = webservice + params_encoded
     
     try:
-        response, content = httplib2.Http().request(url, "GET")
+        response, content = HttpClient.request(url, "GET")
         
     except httplib2.ServerNotFoundError as e:
         print e
-        sys.exit(0)
+        sys.exit(1)
      
     if not content == None:
         
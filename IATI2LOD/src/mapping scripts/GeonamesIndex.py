@@ -0,0 +1,388 @@
+## GeonamesIndex.py
+## Local indexes over a GeoNames dump, for matching locations without the web services.
+
+import math, unicodedata
+
+# Settings
+cell_size = 1.0
+earth_radius = 6371.0
+
+# Columns of the GeoNames dump files (allCountries.txt, cities1000.txt, ...)
+columns = ['geonameid', 'name', 'asciiname', 'alternatenames', 'latitude', 'longitude',
+           'feature_class', 'feature_code', 'country_code', 'cc2', 'admin1_code', 'admin2_code',
+           'admin3_code', 'admin4_code', 'population', 'elevation', 'dem', 'timezone', 'modification_date']
+
+def read_dump(dump_file, feature_classes=None):
+    '''Reads the features of a GeoNames dump file.
+    
+    Parameters
+    @dump_file: The location of a tab separated GeoNames dump file.
+    @feature_classes: A list of feature classes to keep, such as ['A', 'P'], or None for all.
+    
+    Returns
+    @feature: A dictionary of the columns of each feature.'''
+    
+    with open(dump_file, 'r') as file:
+        for line in file:
+            values = line.rstrip('\n').split('\t')
+            
+            if len(values) < len(columns):
+                continue
+            
+            feature = dict(zip(columns, values))
+            
+            if (not feature_classes == None) and (not feature['feature_class'] in feature_classes):
+                continue
+            
+            yield feature
+
+def read_country_info(country_info_file):
+    '''Reads the GeoNames countryInfo.txt file.
+    
+    Parameters
+    @country_info_file: The location of the countryInfo.txt file.
+    
+    Returns
+    @countries: A dictionary of ISO country code to a dictionary with the geonameid,
+                name and capital of the country.'''
+    
+    countries = {}
+    
+    with open(country_info_file, 'r') as file:
+        for line in file:
+            if line.startswith('#'):
+                continue
+            
+            values = line.rstrip('\n').split('\t')
+            
+            if len(values) < 17:
+                continue
+            
+            countries[values[0]] = dict([('geonameid', values[16]),
+                                         ('name', values[4]),
+                                         ('capital', values[5])])
+    
+    return countries
+
+def distance(latitude, longitude, other_latitude, other_longitude):
+    '''Returns the great circle distance between two points.
+    
+    Parameters
+    @latitude: The latitude of the first point in degrees.
+    @longitude: The longitude of the first point in degrees.
+    @other_latitude: The latitude of the second point in degrees.
+    @other_longitude: The longitude of the second point in degrees.
+    
+    Returns
+    @distance: The distance in kilometres.'''
+    
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    other_latitude, other_longitude = math.radians(other_latitude), math.radians(other_longitude)
+    
+    a = math.sin((other_latitude - latitude) / 2) ** 2 + \
+        math.cos(latitude) * math.cos(other_latitude) * math.sin((other_longitude - longitude) / 2) ** 2
+    
+    return 2 * earth_radius * math.asin(min(1.0, math.sqrt(a)))
+
+class SpatialIndex :
+    '''Class for finding the nearest GeoNames feature to a point. The features are
+    kept in a grid of cells of cell_size degrees, which is searched ring by ring
+    around the cell of the point. The capital (PPLC) of each country is kept as well.'''
+    
+    def __init__(self):
+        '''Initializes the index.'''
+        
+        self.cells = {}
+        self.capitals = {}
+        self.count = 0
+    
+    def cell(self, latitude, longitude):
+        '''Returns the grid cell of a point.
+        
+        Parameters
+        @latitude: The latitude in degrees.
+        @longitude: The longitude in degrees.
+        
+        Returns
+        @cell: A tuple of the row and column of the cell.'''
+        
+        return (int(math.floor((latitude + 90.0) / cell_size)),
+                int(math.floor((longitude + 180.0) / cell_size)) % int(360 / cell_size))
+    
+    def add(self, feature):
+        '''Adds a feature from the GeoNames dump.
+        
+        Parameters
+        @feature: A dictionary of the columns of the feature, see read_dump.'''
+        
+        try:
+            latitude = float(feature['latitude'])
+            longitude = float(feature['longitude'])
+        except ValueError:
+            return
+        
+        self.cells.setdefault(self.cell(latitude, longitude), []).append((latitude,
+                                                                           longitude,
+                                                                           feature['geonameid'],
+                                                                           feature['feature_class'],
+                                                                           feature['feature_code'],
+                                                                           feature['country_code']))
+        self.count += 1
+        
+        if feature['feature_code'] == 'PPLC':
+            self.capitals[feature['country_code']] = feature['geonameid']
+    
+    def ring(self, row, column, radius):
+        '''Returns the cells at a number of cells from a cell.
+        
+        Parameters
+        @row: The row of the centre cell.
+        @column: The column of the centre cell.
+        @radius: The number of cells from the centre cell.
+        
+        Returns
+        @cells: A list of cells.'''
+        
+        columns = int(360 / cell_size)
+        
+        if radius == 0:
+            return [(row, column)]
+        
+        cells = []
+        
+        for row_offset in range(-radius, radius + 1):
+            if abs(row_offset) == radius:
+                column_offsets = range(-radius, radius + 1)
+            else:
+                column_offsets = [-radius, radius]
+            
+            for column_offset in column_offsets:
+                cells.append((row + row_offset, (column + column_offset) % columns))
+        
+        return cells
+    
+    def nearest(self, latitude, longitude, feature_codes=None, feature_classes=None, max_distance=None):
+        '''Returns the feature nearest to a point.
+        
+        Parameters
+        @latitude: The latitude in degrees.
+        @longitude: The longitude in degrees.
+        @feature_codes: A list of feature codes to consider, such as ['ADM1'], or None.
+        @feature_classes: A list of feature classes to consider, such as ['P'], or None.
+        @max_distance: The maximum distance in kilometres or None.
+        
+        Returns
+        @feature: A tuple of latitude, longitude, geonameid, feature class, feature code
+                  and country code, or None if no feature was found.'''
+        
+        row, column = self.cell(latitude, longitude)
+        
+        best = None
+        best_distance = None
+        
+        for radius in range(0, int(180 / cell_size) + 1):
+            # The nearest point of the ring is at least this far away
+            ring_distance = max(0, radius - 1) * cell_size * 111.19 * \
+                            math.cos(math.radians(min(89.0, abs(latitude) + radius * cell_size)))
+            
+            if (not best_distance == None) and (ring_distance > best_distance):
+                break
+            
+            if (not max_distance == None) and (ring_distance > max_distance):
+                break
+            
+            for cell in self.ring(row, column, radius):
+                for feature in self.cells.get(cell, []):
+                    if (not feature_codes == None) and (not feature[4] in feature_codes):
+                        continue
+                    
+                    if (not feature_classes == None) and (not feature[3] in feature_classes):
+                        continue
+                    
+                    feature_distance = distance(latitude, longitude, feature[0], feature[1])
+                    
+                    if (best_distance == None) or (feature_distance < best_distance):
+                        best = feature
+                        best_distance = feature_distance
+        
+        if (not max_distance == None) and (not best_distance == None) and (best_distance > max_distance):
+            return None
+        
+        return best
+
+def build_spatial_index(dump_files, feature_classes=None):
+    '''Builds a spatial index of one or more GeoNames dump files.
+    
+    Parameters
+    @dump_files: A list of locations of GeoNames dump files.
+    @feature_classes: A list of feature classes to keep or None for all.
+    
+    Returns
+    @index: A SpatialIndex.'''
+    
+    index = SpatialIndex()
+    
+    for dump_file in dump_files:
+        for feature in read_dump(dump_file, feature_classes):
+            index.add(feature)
+    
+    return index
+
+def normalise(name):
+    '''Returns a name in lower case, without accents and punctuation, for comparing names.
+    
+    Parameters
+    @name: A (utf-8 encoded) string of the name.
+    
+    Returns
+    @name: The normalised unicode string.'''
+    
+    if not isinstance(name, unicode):
+        name = name.decode('utf-8', 'replace')
+    
+    name = unicodedata.normalize('NFKD', name)
+    name = u"".join([character for character in name if not unicodedata.combining(character)])
+    name = u"".join([character if character.isalnum() else u" " for character in name.lower()])
+    
+    return u" ".join(name.split())
+
+class NameIndex :
+    '''Class for looking up GeoNames features by name or alternate name. Names are
+    indexed as a whole and per word, and the results are ranked by population, with
+    countries, administrative divisions and populated places before other features.'''
+    
+    feature_class_rank = dict([('A', 0), ('P', 1)])
+    
+    def __init__(self):
+        '''Initializes the index.'''
+        
+        self.features = {}
+        self.names = {}
+        self.words = {}
+    
+    def add(self, feature):
+        '''Adds a feature from the GeoNames dump.
+        
+        Parameters
+        @feature: A dictionary of the columns of the feature, see read_dump.'''
+        
+        try:
+            population = int(feature['population'])
+        except ValueError:
+            population = 0
+        
+        geonameid = feature['geonameid']
+        
+        self.features[geonameid] = (-population,
+                                    self.feature_class_rank.get(feature['feature_class'], 2),
+                                    feature['country_code'])
+        
+        names = set([normalise(feature['name']), normalise(feature['asciiname'])])
+        
+        for alternate_name in feature['alternatenames'].split(','):
+            names.add(normalise(alternate_name))
+        
+        names.discard(u"")
+        
+        for name in names:
+            self.names.setdefault(name, []).append(geonameid)
+            
+            for word in name.split():
+                self.words.setdefault(word, set()).add(geonameid)
+    
+    def best(self, geonameids, country_code=None):
+        '''Returns the highest ranked feature of a collection of features.
+        
+        Parameters
+        @geonameids: A collection of geonameids.
+        @country_code: An ISO country code to keep only the features in that country, or None.
+        
+        Returns
+        @geonameid: The geonameid of the best feature or None.'''
+        
+        best = None
+        
+        for geonameid in geonameids:
+            feature = self.features[geonameid]
+            
+            if (not country_code == None) and (not feature[2] == country_code):
+                continue
+            
+            if (best == None) or (feature[:2] < self.features[best][:2]):
+                best = geonameid
+        
+        return best
+    
+    def search(self, label, country_code=None):
+        '''Returns the best matching feature of a label. Features of which a name equals
+        the label are preferred over features of which a name contains all words of it.
+        
+        Parameters
+        @label: The label to look up.
+        @country_code: An ISO country code to keep only the features in that country, or None.
+        
+        Returns
+        @geonameid: The geonameid of the best matching feature or None.'''
+        
+        name = normalise(label)
+        
+        if name == u"":
+            return None
+        
+        match = self.best(self.names.get(name, []), country_code)
+        
+        if not match == None:
+            return match
+        
+        candidates = None
+        
+        for word in name.split():
+            if not word in self.words:
+                return None
+            
+            if candidates == None:
+                candidates = self.words[word]
+            else:
+                candidates = candidates & self.words[word]
+        
+        return self.best(candidates, country_code)
+
+def build_name_index(dump_files, feature_classes=None):
+    '''Builds a name index of one or more GeoNames dump files.
+    
+    Parameters
+    @dump_files: A list of locations of GeoNames dump files.
+    @feature_classes: A list of feature classes to keep or None for all.
+    
+    Returns
+    @index: A NameIndex.'''
+    
+    index = NameIndex()
+    
+    for dump_file in dump_files:
+        for feature in read_dump(dump_file, feature_classes):
+            index.add(feature)
+    
+    return index
+
+def build_indexes(dump_files, feature_classes=None):
+    '''Builds a spatial and a name index of one or more GeoNames dump files, reading
+    the files once.
+    
+    Parameters
+    @dump_files: A list of locations of GeoNames dump files.
+    @feature_classes: A list of feature classes to keep or None for all.
+    
+    Returns
+    @spatial_index: A SpatialIndex.
+    @name_index: A NameIndex.'''
+    
+    spatial_index = SpatialIndex()
+    name_index = NameIndex()
+    
+    for dump_file in dump_files:
+        for feature in read_dump(dump_file, feature_classes):
+            spatial_index.add(feature)
+            name_index.add(feature)
+    
+    return spatial_index, name_index
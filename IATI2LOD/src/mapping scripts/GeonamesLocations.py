@@ -4,7 +4,33 @@
 from rdflib import RDF, RDFS, Literal, URIRef, Namespace, OWL
 from rdflib.graph import Graph
 import xml.etree.ElementTree as ET
-import os, sys, httplib2, json, urllib, urllib2, AddProvenance, datetime
+import os, sys, glob, httplib2, json, urllib, urllib2, AddProvenance, datetime, HttpClient, GeonamesIndex, LookupCache, LocationTable
+import GeonamesScheduler, itertools, array, math
+
+# The web service algorithm of each classification, as used in the lookup cache
+algorithms = dict([(1, 'algorithm_one'),
+                   (2, 'algorithm_two'),
+                   (3, 'algorithm_three'),
+                   (4, 'algorithm_four'),
+                   (5, 'algorithm_five')])
+
+# Precision buckets of the GeographicalPrecision codes, which decide the Geonames
+# feature to look for: a place, an ADM2 or ADM1 division, a country or a capital
+no_bucket = 0
+place_bucket = 1
+adm2_bucket = 2
+adm1_bucket = 3
+country_bucket = 4
+capital_bucket = 5
+
+# Bucket of each precision code as stored in a location table, an unknown code (-1)
+# indexes the last entry
+precision_buckets = [no_bucket] * 256
+precision_buckets[0:10] = [place_bucket, place_bucket, place_bucket, adm2_bucket, adm1_bucket,
+                           adm1_bucket, country_bucket, capital_bucket, capital_bucket, country_bucket]
+
+# The CreditBudget of the web service calls, or None to call without limits
+budget = None
 
 def connect(url):
     '''Connects to the given URL and returns response.
@@ -15,8 +41,11 @@ def connect(url):
     Returns
     @content: Content of the response or None in case of a fail.'''
     
+    if not budget == None:
+        return GeonamesScheduler.fetch(url, budget)
+    
     try:
-        response, content = httplib2.Http().request(url, "GET")
+        response, content = HttpClient.request(url, "GET")
     
     except httplib2.ServerNotFoundError as e:
         print e
@@ -24,15 +53,46 @@ def connect(url):
     
     return content
 
+def retrieve_location_records(locations_folder):
+    '''Retrieves all locations from the location records that ActivitiesToTurtle writes,
+    a JSON lines file per document.
+    
+    Parameters
+    @locations_folder: Local folder with the location records.
+    
+    Returns
+    @locations: List of dictionaries containing location information.'''
+    
+    locations = {}
+    
+    for records_file in sorted(glob.glob(locations_folder + '*.jsonl')):
+        with open(records_file, 'r') as file:
+            for line in file:
+                record = json.loads(line)
+                
+                location = dict([(str(key), value.encode('utf-8')) for key, value in record.items()])
+                location['link'] = location.pop('id')
+                
+                locations[location['link']] = location
+    
+    return locations.values()
+
 def retrieve_locations(locations_file):
     '''Retrieves all locations from a local file.
     
     Parameters
-    @file: Local file with location information.
+    @file: Local file with location information (a location table or the older text
+           format), or a folder with location records.
     
     Returns
     @locations: List of dictionaries containing location information.'''
     
+    if os.path.isdir(locations_file):
+        return retrieve_location_records(locations_file)
+    
+    if locations_file.endswith('.table'):
+        return LocationTable.read_table(locations_file).locations()
+    
     all_locations = []
     file_done = False
     location_count = 0
@@ -71,44 +131,86 @@ def retrieve_locations(locations_file):
                         
     return all_locations
 
-def classify_locations(locations):
-    '''Retrieves all locations from a local file.
+def retrieve_location_table(locations_file):
+    '''Retrieves all locations from a local file as a location table.
+    
+    Parameters
+    @locations_file: A location table, a file in the older text format or a folder
+                     with location records, see retrieve_locations.
+    
+    Returns
+    @table: A LocationTable.LocationTable.'''
+    
+    if (not os.path.isdir(locations_file)) and (locations_file.endswith('.table')):
+        return LocationTable.read_table(locations_file)
+    
+    table = LocationTable.LocationTable()
+    
+    for location in retrieve_locations(locations_file):
+        table.append(location)
+    
+    return table
+
+def classify_locations(table):
+    '''Classifies all locations of a location table by the information available, column
+    by column: 1 for coordinates with a known precision, 2 for coordinates, 3 for a label
+    and a country label, 4 for a label, 5 for a country label and 0 for none of these.
+    
+    Parameters
+    @table: A LocationTable.LocationTable.
+    
+    Returns
+    @classifications: An array of the classification of each location.
+    @buckets: An array of the precision bucket of each location.'''
+    
+    buckets = array.array('b', [precision_buckets[precision] for precision in table.precisions])
+    
+    coordinates = [not (math.isnan(latitude) or math.isnan(longitude))
+                   for latitude, longitude in itertools.izip(table.latitudes, table.longitudes)]
+    labels = [not label == '' for label in table.strings['label']]
+    country_labels = [not country_label == '' for country_label in table.strings['country_label']]
+    
+    classifications = array.array('b', [(1 if bucket else 2) if coordinate else
+                                        (3 if country_label else 4) if label else
+                                        (5 if country_label else 0)
+                                        for coordinate, bucket, label, country_label
+                                        in itertools.izip(coordinates, buckets, labels, country_labels)])
+    
+    return classifications, buckets
+
+def group_locations(table, classifications, buckets):
+    '''Groups the classified locations of a location table by algorithm.
     
     Parameters
-    @locations: List of dictionaries containing location information.
+    @table: A LocationTable.LocationTable.
+    @classifications: An array of the classification of each location.
+    @buckets: An array of the precision bucket of each location.
     
     Returns
-    @locations: List of dictionaries containing location information, added the classification.'''
+    @groups: A dictionary of classification to a list of dictionaries of location
+             information, with the classification and precision bucket added.
+             Locations with classification 0 are left out.'''
     
-    for location in locations:
-        keys = location.keys()
+    groups = dict([(classification, []) for classification in algorithms])
+    
+    for index, classification in enumerate(classifications):
+        if classification == 0:
+            continue
         
-        if ("latitude" in keys) and ("longitude" in keys) and ("precision" in keys):
-            location['classification'] = 1
-            
-        elif ("latitude" in keys) and ("longitude" in keys):
-            location['classification'] = 2
-            
-        elif ("country_label" in keys) and ("label" in keys):
-            location['classification'] = 3
-            
-        elif ("label" in keys):
-            location['classification'] = 4
-            
-        elif ("country_label" in keys):
-            location['classification'] = 5 
+        location = table.location(index)
+        location['classification'] = classification
+        location['bucket'] = buckets[index]
         
-        else:
-            location['classification'] = 0
-            
-    return locations
+        groups[classification].append(location)
+    
+    return groups
 
 def algorithm_one(location, geonames_uri, username, country_info):
     '''The algorithm for finding locations based on a precision smaller than 6, latitude 
     and longitude of a location.
     
     Parameters
-    @location: A dictionary of location information.
+    @location: A dictionary of location information, with a precision bucket.
     @geonames_uri: Base URI of Geonames.
     @username: Geonames username.
     @country_info: XML Etree containing information about countries.
@@ -116,19 +218,21 @@ def algorithm_one(location, geonames_uri, username, country_info):
     Returns
     @match: The matching Geonames URI.'''
     
-    if location['precision'] < '3':
+    bucket = location['bucket']
+    
+    if bucket == place_bucket:
         service = "findNearbyPlaceName?"
         featureCode = ""
         print "Finding nearby place name..."
-    elif location['precision'] == '3':
+    elif bucket == adm2_bucket:
         service = "findNearby?"
         featureCode = "ADM2"
         print "Finding nearby place ADM2..."
-    elif (location['precision'] == '4') or (location['precision'] == '5'):
+    elif bucket == adm1_bucket:
         service = "findNearby?"
         featureCode = "ADM1"
         print "Finding nearby place ADM1..."
-    elif location['precision'] > '5':
+    elif (bucket == country_bucket) or (bucket == capital_bucket):
         service = "countryCode?"
         featureCode = ""
         print "Finding nearby country or capital..."
@@ -149,7 +253,7 @@ def algorithm_one(location, geonames_uri, username, country_info):
     url = webservice + params_encoded
     content = connect(url)
     
-    if location['precision'] < '6':
+    if (bucket == place_bucket) or (bucket == adm2_bucket) or (bucket == adm1_bucket):
         if not content == None:
             geonames_xml = ET.fromstring(content)
             geoname = geonames_xml.find('geoname')
@@ -162,9 +266,6 @@ def algorithm_one(location, geonames_uri, username, country_info):
                 status = geonames_xml.find('status')
                 if not status == None:
                     print status.attrib['message']
-                    if "timeout" in status.attrib['message']:
-                        print "Trying again..."
-                        return algorithm_one(location, geonames_uri, username, country_info)
                     return None
                 else:
                     print "Trying again, broad search..."
@@ -193,9 +294,6 @@ def algorithm_one(location, geonames_uri, username, country_info):
                             status = geonames_xml.find('status')
                             if not status == None:
                                 print status.attrib['message']
-                                if "timeout" in status.attrib['message']:
-                                    print "Trying again..."
-                                    return algorithm_one(location, geonames_uri, username, country_info)
                                 return None
                             else:
                                 return 0
@@ -206,7 +304,7 @@ def algorithm_one(location, geonames_uri, username, country_info):
         else:
             return None
         
-    elif location['precision'] > '5':
+    elif (bucket == country_bucket) or (bucket == capital_bucket):
         if len(content) > 5:
                 print "Country code not found..."
                 
@@ -234,9 +332,6 @@ def algorithm_one(location, geonames_uri, username, country_info):
                         status = geonames_xml.find('status')
                         if not status == None:
                             print status.attrib['message']
-                            if "timeout" in status.attrib['message']:
-                                print "Trying again..."
-                                return algorithm_one(location, geonames_uri, username, country_info)
                             return None
                         else:
                             return 0
@@ -246,7 +341,7 @@ def algorithm_one(location, geonames_uri, username, country_info):
         
         country_code = content.rstrip()
             
-        if (location['precision'] == '6') or (location['precision'] == '9'):
+        if bucket == country_bucket:
             print "Trying to find " + country_code + "..."
             for country in country_info:
                 if country.find('countryCode').text == country_code:
@@ -255,7 +350,7 @@ def algorithm_one(location, geonames_uri, username, country_info):
             
             return 0
                     
-        elif (location['precision'] == '7') or (location['precision'] == '8'):
+        elif bucket == capital_bucket:
             for country in country_info:
                 if country.find('countryCode').text == country_code:
                     capital = country.find('capital').text
@@ -287,9 +382,6 @@ def algorithm_one(location, geonames_uri, username, country_info):
                     status = geonames_xml.find('status')
                     if not status == None:
                         print status.attrib['message']
-                        if "timeout" in status.attrib['message']:
-                            print "Trying again..."
-                            return algorithm_one(location, geonames_uri, username, country_info)
                         return None            
                     else:
                         return 0
@@ -334,9 +426,6 @@ def algorithm_two(location, geonames_uri, username):
             status = geonames_xml.find('status')
             if not status == None:
                 print status.attrib['message']
-                if "timeout" in status.attrib['message']:
-                    print "Trying again..."
-                    return algorithm_two(location, geonames_uri, username)
                 return None
             else:
                 print "Trying again, broad search..."
@@ -344,8 +433,8 @@ def algorithm_two(location, geonames_uri, username):
                 webservice = geonames_uri + "findNearby?"
                     
                 params = dict([('username', username),
-                               ('lat', str(latitude)),
-                               ('lng', str(longitude))])
+                               ('lat', str(location['latitude'])),
+                               ('lng', str(location['longitude']))])
                 
                 params_encoded = urllib.urlencode(params).replace('+', '%20').replace('%0A%0A','%20')       
                 url = webservice + params_encoded
@@ -365,9 +454,6 @@ def algorithm_two(location, geonames_uri, username):
                         status = geonames_xml.find('status')
                         if not status == None:
                             print status.attrib['message']
-                            if "timeout" in status.attrib['message']:
-                                print "Trying again..."
-                                return algorithm_two(location, geonames_uri, username)
                             return None
                         else:
                             return 0
@@ -378,6 +464,139 @@ def algorithm_two(location, geonames_uri, username):
     else:
         return None
     
+def offline_match(feature):
+    '''Returns the Geonames URI of a feature of a local index.
+    
+    Parameters
+    @feature: A feature tuple of GeonamesIndex.SpatialIndex or None.
+    
+    Returns
+    @match: The matching Geonames URI or 0 if there is no feature.'''
+    
+    if feature == None:
+        return 0
+    
+    return "http://sws.geonames.org/" + str(feature[2])
+
+def offline_algorithm_one(location, spatial_index, countries):
+    '''The offline version of algorithm_one, which looks up the nearest feature in a local
+    GeoNames index instead of calling the findNearby services.
+    
+    Parameters
+    @location: A dictionary of location information, with a precision bucket.
+    @spatial_index: A GeonamesIndex.SpatialIndex.
+    @countries: A dictionary of country information, see GeonamesIndex.read_country_info.
+    
+    Returns
+    @match: The matching Geonames URI or 0 if not found.'''
+    
+    bucket = location['bucket']
+    
+    if bucket == no_bucket:
+        return offline_algorithm_two(location, spatial_index)
+    
+    latitude = float(location['latitude'])
+    longitude = float(location['longitude'])
+    
+    if bucket == place_bucket:
+        feature = spatial_index.nearest(latitude, longitude, feature_classes=['P'])
+    elif bucket == adm2_bucket:
+        feature = spatial_index.nearest(latitude, longitude, feature_codes=['ADM2'])
+    elif bucket == adm1_bucket:
+        feature = spatial_index.nearest(latitude, longitude, feature_codes=['ADM1'])
+    else:
+        # The country of the nearest feature
+        nearest = spatial_index.nearest(latitude, longitude)
+        
+        if nearest == None:
+            return 0
+        
+        country_code = nearest[5]
+        
+        if bucket == capital_bucket:
+            capital = spatial_index.capitals.get(country_code)
+        
+            if not capital == None:
+                return "http://sws.geonames.org/" + str(capital)
+        
+        elif country_code in countries:
+            return "http://sws.geonames.org/" + str(countries[country_code]['geonameid'])
+        
+        return 0
+    
+    if feature == None:
+        # Broad search
+        feature = spatial_index.nearest(latitude, longitude)
+    
+    return offline_match(feature)
+
+def offline_algorithm_two(location, spatial_index):
+    '''The offline version of algorithm_two, which looks up the nearest populated place in
+    a local GeoNames index instead of calling the findNearbyPlaceName service.
+    
+    Parameters
+    @location: A dictionary of location information.
+    @spatial_index: A GeonamesIndex.SpatialIndex.
+    
+    Returns
+    @match: The matching Geonames URI or 0 if not found.'''
+    
+    latitude = float(location['latitude'])
+    longitude = float(location['longitude'])
+    
+    feature = spatial_index.nearest(latitude, longitude, feature_classes=['P'])
+    
+    if feature == None:
+        # Broad search
+        feature = spatial_index.nearest(latitude, longitude)
+    
+    return offline_match(feature)
+
+def offline_search(label, name_index, country_code=None):
+    '''Looks up a label in a local GeoNames name index instead of the search service.
+    
+    Parameters
+    @label: The label to look up.
+    @name_index: A GeonamesIndex.NameIndex.
+    @country_code: An ISO country code to search within or None.
+    
+    Returns
+    @match: The matching Geonames URI or 0 if not found.'''
+    
+    geonameid = name_index.search(label, country_code)
+    
+    if geonameid == None:
+        return 0
+    
+    return "http://sws.geonames.org/" + str(geonameid)
+
+def offline_algorithm_three(location, name_index, country_codes):
+    '''The offline version of algorithm_three. The label is looked up within the country
+    of the country label first, then anywhere, then the country label itself.
+    
+    Parameters
+    @location: A dictionary of location information.
+    @name_index: A GeonamesIndex.NameIndex.
+    @country_codes: A dictionary of normalised country name to ISO country code.
+    
+    Returns
+    @match: The matching Geonames URI or 0 if not found.'''
+    
+    country_code = country_codes.get(GeonamesIndex.normalise(location['country_label']))
+    
+    if not country_code == None:
+        match = offline_search(location['label'], name_index, country_code)
+        
+        if not match == 0:
+            return match
+    
+    match = offline_search(location['label'], name_index)
+    
+    if not match == 0:
+        return match
+    
+    return offline_search(location['country_label'], name_index)
+
 def algorithm_three(location, geonames_uri, username):
     '''The algorithm for finding locations with a label and a country label.
     
@@ -417,9 +636,6 @@ def algorithm_three(location, geonames_uri, username):
             status = geonames_xml.find('status')
             if not status == None:
                 print status.attrib['message']
-                if "timeout" in status.attrib['message']:
-                    print "Trying again..."
-                    return algorithm_three(location, geonames_uri, username)
                 return None
             else:
                 
@@ -451,9 +667,6 @@ def algorithm_three(location, geonames_uri, username):
                         status = geonames_xml.find('status')
                         if not status == None:
                             print status.attrib['message']
-                            if "timeout" in status.attrib['message']:
-                                print "Trying again..."
-                                return algorithm_three(location, geonames_uri, username)
                             return None
                         else:
                             return 0
@@ -497,9 +710,6 @@ def algorithm_four(location, geonames_uri, username):
             status = geonames_xml.find('status')
             if not status == None:
                 print status.attrib['message']
-                if "timeout" in status.attrib['message']:
-                    print "Trying again..."
-                    return algorithm_three(location, geonames_uri, username)
                 return None
             else:
                 return 0
@@ -543,18 +753,21 @@ def algorithm_five(location, geonames_uri, username):
             status = geonames_xml.find('status')
             if not status == None:
                 print status.attrib['message']
-                if "timeout" in status.attrib['message']:
-                    print "Trying again..."
-                    return algorithm_three(location, geonames_uri, username)
                 return None
             else:
                 return 0
 
-def find_location(location, country_info):
+def find_location(location, country_info, spatial_index=None, countries=None, name_index=None, country_codes=None):
     '''Retrieves location match from Geonames based on the information available.
     
     Parameters
     @location: A dictionary of location information.
+    @country_info: XML Etree containing information about countries, or None offline.
+    @spatial_index: A GeonamesIndex.SpatialIndex to match coordinates offline, or None.
+    @countries: A dictionary of country information for the offline matching, or None.
+    @name_index: A GeonamesIndex.NameIndex to match labels offline, or None.
+    @country_codes: A dictionary of normalised country name to ISO country code for
+                    the offline matching, or None.
      
     Returns
     @match: A Geonames URL.'''
@@ -562,6 +775,17 @@ def find_location(location, country_info):
     geonames_uri = "http://api.geonames.org/"
     username = "KasperBrandt"
     
+    if (not spatial_index == None) and (location['classification'] == 1):
+        return offline_algorithm_one(location, spatial_index, countries)
+    elif (not spatial_index == None) and (location['classification'] == 2):
+        return offline_algorithm_two(location, spatial_index)
+    elif (not name_index == None) and (location['classification'] == 3):
+        return offline_algorithm_three(location, name_index, country_codes)
+    elif (not name_index == None) and (location['classification'] == 4):
+        return offline_search(location['label'], name_index)
+    elif (not name_index == None) and (location['classification'] == 5):
+        return offline_search(location['country_label'], name_index)
+    
     if location['classification'] == 1:
         match = algorithm_one(location, geonames_uri, username, country_info)
         return match
@@ -585,20 +809,40 @@ def main():
     
     # Settings
     turtle_folder = "/media/Acer/School/IATI-data/mappings/Geonames/"
-    locations_file = "/media/Acer/School/IATI-data/mappings/locations.help"
+    # The location records of ActivitiesToTurtle, or the locations.table of GatherLocations
+    locations_file = "/media/Acer/School/IATI-data/activity/locations/"
     Iati = Namespace("http://purl.org/collections/iati/")
     start_time = datetime.datetime.now()
     
+    # Match coordinates and labels with a local GeoNames dump instead of the web services
+    offline = False
+    geonames_dumps = ["/media/Acer/School/IATI-data/geonames/allCountries.txt"]
+    country_info_file = "/media/Acer/School/IATI-data/geonames/countryInfo.txt"
+    
+    # Cache of the web service lookups, None to disable, and the days a result is kept
+    cache_file = "/media/Acer/School/IATI-data/mappings/Geonames/lookups.db"
+    cache_days = 90
+    
+    # Web service calls in flight at the same time and the credits they may use
+    max_in_flight = 4
+    hourly_credits = 1000
+    daily_credits = 20000
+    
+    # Number of lookups after which the mappings found so far are written
+    checkpoint_interval = 500
+    
     found = 0
     not_found = 0
+    failed = 0
     
     # Read location file
     print "Retrieving locations from file..."
-    all_locations = retrieve_locations(locations_file)
+    table = retrieve_location_table(locations_file)
     
-    # Classify locations
+    # Classify locations and group them by algorithm
     print "Classifying locations..."
-    all_locations = classify_locations(all_locations)
+    classifications, buckets = classify_locations(table)
+    groups = group_locations(table, classifications, buckets)
     
     # Initialize graph
     locations_graph = Graph()
@@ -606,42 +850,97 @@ def main():
     locations_graph.bind('gn', "http://sws.geonames.org/")
     locations_graph.bind('owl', "http://www.w3.org/2002/07/owl#")
     
-    # Retrieve all general country information
-    country_info = connect("http://api.geonames.org/countryInfo?username=kasperbrandt")
-    country_info = ET.fromstring(country_info)
+    cache = None
+    
+    if offline:
+        # Only administrative divisions and populated places are matched
+        print "Loading GeoNames dump..."
+        spatial_index, name_index = GeonamesIndex.build_indexes(geonames_dumps, ['A', 'P'])
+        countries = GeonamesIndex.read_country_info(country_info_file)
+        country_codes = dict([(GeonamesIndex.normalise(country['name']), code) for code, country in countries.items()])
+        country_info = None
+        
+        print "Loaded " + str(spatial_index.count) + " features..."
+    
+    else:
+        spatial_index = None
+        name_index = None
+        countries = None
+        country_codes = None
+        
+        if not cache_file == None:
+            cache = LookupCache.LookupCache(cache_file, cache_days * 24 * 3600)
+        
+        global budget
+        budget = GeonamesScheduler.CreditBudget(hourly_credits, daily_credits)
+        
+        # Retrieve all general country information
+        country_info = connect("http://api.geonames.org/countryInfo?username=kasperbrandt")
+        
+        if country_info == None:
+            print "Could not retrieve country information, exiting..."
+            sys.exit(1)
+        
+        country_info = ET.fromstring(country_info)
     
-    if country_info == None:
-        print "Could not retrieve country information, exiting..."
-        sys.exit(0)
+    # Look up the locations that are not in the cache, in one batch per algorithm
+    cached = []
+    batches = []
     
-    # Retrieve location match from Geonames
-    for location in all_locations:
+    for classification in sorted(groups):
+        lookups = []
         
-        if not location['classification'] == 0:
-            print "Looking for " + location['link'] + "..."
-            match = find_location(location, country_info)
+        for location in groups[classification]:
+            match = None
             
-            if (not match == None) and (not match == 0):
-                locations_graph.add((URIRef(location['link']),
-                                     OWL.sameAs,
-                                     URIRef(match)))
-                
-                found += 1
-                
-            elif match == 0:
-                # Did not find any results
-                not_found += 1
+            if not cache == None:
+                location['key'] = LookupCache.location_key(algorithms[classification], location)
+                match = cache.get(location['key'])
             
-            elif match == None:
-                # No more credits
-                print "Credits are gone.."
-                locations_turtle = locations_graph.serialize(format='turtle')
+            if match == None:
+                lookups.append(location)
+            else:
+                location['cached'] = True
+                cached.append((location, match))
+        
+        if not groups[classification] == []:
+            print "Looking up " + str(len(lookups)) + " of " + str(len(groups[classification])) + \
+                  " locations with " + algorithms[classification] + "..."
+        
+        batches.append(lookups)
     
-                with open(turtle_folder + 'geonames-locations.ttl', 'w') as turtle_file:
-                    turtle_file.write(locations_turtle)
-                    
-                sys.exit(0)
+    # The batches run one after the other, each in the threads of the scheduler
+    scheduler = GeonamesScheduler.Scheduler(max_in_flight)
+    results = itertools.chain(cached, *[scheduler.map(find_location, lookups, country_info, spatial_index,
+                                                      countries, name_index, country_codes)
+                                        for lookups in batches])
+    
+    for location, match in results:
+        print "Looked up " + location['link'] + "..."
         
+        if (not cache == None) and (not match == None) and (not 'cached' in location):
+            cache.put(location['key'], match)
+        
+        if (not match == None) and (not match == 0):
+            locations_graph.add((URIRef(location['link']),
+                                 OWL.sameAs,
+                                 URIRef(match)))
+            
+            found += 1
+        
+        elif match == 0:
+            # Did not find any results
+            not_found += 1
+        
+        elif match == None:
+            # Failed after all retries, looked up again on the next run
+            failed += 1
+        
+        # Checkpoint the mappings found so far
+        if (found + not_found + failed) % checkpoint_interval == 0:
+            with open(turtle_folder + 'geonames-locations.ttl', 'w') as turtle_file:
+                turtle_file.write(locations_graph.serialize(format='turtle'))
+    
     # Write to file
     print "Done, writing " + str(found) + " mappings to file..."    
     locations_turtle = locations_graph.serialize(format='turtle')
@@ -651,6 +950,13 @@ def main():
     
     print "Did not find " + str(not_found) + " mappings..."
     
+    if failed > 0:
+        print "Could not look up " + str(failed) + " locations, run again to retry them..."
+    
+    if not cache == None:
+        print "Found " + str(cache.hits) + " lookups in the cache..."
+        cache.close()
+    
     # Add provenance
     provenance = Graph()
     
@@ -0,0 +1,263 @@
+## GeonamesScheduler.py
+## Schedules the Geonames web service calls within the hourly and daily credits.
+
+import collections, datetime, threading, time, Queue, httplib2, HttpClient
+import xml.etree.ElementTree as ET
+
+# Settings
+hourly_credits = 1000
+daily_credits = 20000
+max_retries = 6
+backoff_base = 2.0
+backoff_max = 300.0
+max_pauses = 3
+
+# Geonames status codes of exceeded credit limits and of overloaded servers
+limit_codes = ['18', '19', '20']
+retry_codes = ['13', '22']
+
+class CreditBudget :
+    '''Class for keeping the web service calls within the hourly and daily credits,
+    shared by the threads of a Scheduler. A call waits until a credit is available
+    in both windows, or until a pause set after a limit error has passed. After
+    max_pauses pauses the budget is exhausted and no more calls are made.'''
+    
+    def __init__(self, hourly=hourly_credits, daily=daily_credits, pauses=max_pauses):
+        '''Initializes the budget.
+        
+        Parameters
+        @hourly: The number of credits per hour.
+        @daily: The number of credits per day.
+        @pauses: The number of limit errors after which the budget is exhausted.'''
+        
+        self.hourly = hourly
+        self.daily = daily
+        self.max_pauses = pauses
+        self.calls = collections.deque()
+        self.paused_until = 0
+        self.pauses = 0
+        self.exhausted = False
+        self.lock = threading.Lock()
+    
+    def wait_time(self, now):
+        '''Returns the seconds until a call can be made. Must be called with the lock.
+        
+        Parameters
+        @now: The current time in seconds.
+        
+        Returns
+        @seconds: The number of seconds to wait, 0 if a call can be made now.'''
+        
+        while self.calls and (self.calls[0] <= now - 86400):
+            self.calls.popleft()
+        
+        wait = max(0, self.paused_until - now)
+        
+        if len(self.calls) >= self.daily:
+            wait = max(wait, self.calls[len(self.calls) - self.daily] + 86400 - now)
+        
+        hour_start = now - 3600
+        hour_calls = [call for call in self.calls if call > hour_start]
+        
+        if len(hour_calls) >= self.hourly:
+            wait = max(wait, hour_calls[len(hour_calls) - self.hourly] + 3600 - now)
+        
+        return wait
+    
+    def acquire(self):
+        '''Waits until a credit is available and uses it.
+        
+        Returns
+        @acquired: True if a call can be made, False if the budget is exhausted.'''
+        
+        while True:
+            with self.lock:
+                if self.exhausted:
+                    return False
+                
+                now = time.time()
+                wait = self.wait_time(now)
+                
+                if wait <= 0:
+                    self.calls.append(now)
+                    return True
+            
+            print "Out of credits, pausing until " + time.strftime('%H:%M:%S', time.localtime(now + wait)) + "..."
+            time.sleep(wait)
+    
+    def pause(self, code):
+        '''Pauses all calls after Geonames reported an exceeded limit: until the next
+        hour for the hourly limit, and until the next day (UTC) for the others. A
+        limit that is still exceeded after max_pauses pauses exhausts the budget.
+        
+        Parameters
+        @code: The Geonames status code.'''
+        
+        now = time.time()
+        
+        if code == '19':
+            until = now + 3600
+        else:
+            tomorrow = datetime.datetime.utcnow().date() + datetime.timedelta(days=1)
+            until = now + (datetime.datetime.combine(tomorrow, datetime.time()) - datetime.datetime.utcnow()).total_seconds()
+        
+        with self.lock:
+            # Limit errors of calls made before the pause started count once
+            if self.paused_until <= now:
+                self.pauses += 1
+            
+            if self.pauses > self.max_pauses:
+                print "Credits still exceeded after " + str(self.max_pauses) + " pauses, stopping the lookups..."
+                self.exhausted = True
+            else:
+                self.paused_until = max(self.paused_until, until)
+
+def status(content):
+    '''Returns the error status of a Geonames response.
+    
+    Parameters
+    @content: The content of the response.
+    
+    Returns
+    @code: The status code or None if the response is not an error.
+    @message: The status message or None.'''
+    
+    if not content.lstrip().startswith('<'):
+        return None, None
+    
+    try:
+        element = ET.fromstring(content).find('status')
+    except ET.ParseError:
+        return None, None
+    
+    if element == None:
+        return None, None
+    
+    return element.attrib.get('value'), element.attrib.get('message', '')
+
+def fetch(url, budget):
+    '''Calls a Geonames web service within the credits. Timeouts and overloaded servers
+    are retried with exponential backoff, exceeded limits pause the budget and are
+    retried when it resumes, unless the budget is exhausted.
+    
+    Parameters
+    @url: The URL of the call.
+    @budget: A CreditBudget.
+    
+    Returns
+    @content: The content of the response or None if all retries failed or the budget
+              is exhausted.'''
+    
+    attempt = 0
+    
+    while attempt <= max_retries:
+        if not budget.acquire():
+            return None
+        
+        try:
+            response, content = HttpClient.request(url, "GET")
+        except httplib2.ServerNotFoundError as e:
+            print e
+            content = None
+        except Exception as e:
+            print "Error calling " + url + ": " + str(e)
+            content = None
+        
+        if not content == None:
+            code, message = status(content)
+            
+            if code in limit_codes:
+                print message
+                budget.pause(code)
+                continue
+            
+            if (not code in retry_codes) and ((message == None) or (not "timeout" in message)):
+                return content
+            
+            print message
+        
+        delay = min(backoff_max, backoff_base ** attempt)
+        attempt += 1
+        
+        if attempt <= max_retries:
+            print "Trying again in " + str(delay) + " seconds..."
+            time.sleep(delay)
+    
+    return None
+
+class Scheduler :
+    '''Class for running lookups in a number of threads, keeping a bounded number of
+    lookups in flight.'''
+    
+    def __init__(self, workers):
+        '''Initializes the scheduler.
+        
+        Parameters
+        @workers: The number of lookups in flight at the same time.'''
+        
+        self.workers = workers
+    
+    def work(self, function, arguments, tasks, results):
+        '''Runs lookups until a None task is received.
+        
+        Parameters
+        @function: The lookup function.
+        @arguments: A tuple of extra arguments of the lookup function.
+        @tasks: A Queue of items to look up.
+        @results: A Queue of tuples of item and result.'''
+        
+        while True:
+            item = tasks.get()
+            
+            if item == None:
+                return
+            
+            try:
+                result = function(item, *arguments)
+            except Exception as e:
+                print "Error looking up " + str(item) + ": " + str(e)
+                result = None
+            
+            results.put((item, result))
+    
+    def map(self, function, items, *arguments):
+        '''Looks up items in the threads of the scheduler.
+        
+        Parameters
+        @function: The lookup function, called with an item and the extra arguments.
+        @items: A list of items.
+        @arguments: The extra arguments of the lookup function.
+        
+        Returns
+        @item: Each item, in the order the lookups finish.
+        @result: The result of the lookup of the item.'''
+        
+        tasks = Queue.Queue()
+        results = Queue.Queue()
+        
+        threads = [threading.Thread(target=self.work, args=(function, arguments, tasks, results))
+                   for index in range(self.workers)]
+        
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        
+        in_flight = 0
+        
+        for item in items:
+            if in_flight >= self.workers:
+                yield results.get()
+                in_flight -= 1
+            
+            tasks.put(item)
+            in_flight += 1
+        
+        while in_flight > 0:
+            yield results.get()
+            in_flight -= 1
+        
+        for thread in threads:
+            tasks.put(None)
+        
+        for thread in threads:
+            thread.join()
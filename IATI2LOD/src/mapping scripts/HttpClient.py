@@ -0,0 +1,98 @@
+## HttpClient.py
+## Shared HTTP client with keep-alive connections per host.
+## A copy of the conversion scripts module without download, which only the crawler uses.
+
+import httplib, httplib2, socket, threading
+
+# Settings
+cache_folder = None
+timeout = 60
+
+pool = threading.local()
+
+class HttpError(Exception):
+    '''Raised when a server answers with a status other than 200.'''
+    
+    def __init__(self, url, status):
+        '''Initializes the error.
+        
+        Parameters
+        @url: The URL that was requested.
+        @status: The status of the response.'''
+        
+        Exception.__init__(self, "HTTP status " + str(status) + " for " + str(url))
+        
+        self.url = url
+        self.status = status
+
+def get_http():
+    '''Returns the httplib2 Http object of the current thread.
+    The Http object keeps one open connection per host, so consecutive requests
+    to the same host reuse the connection instead of connecting again.
+    
+    Returns
+    @http: A httplib2 Http object.'''
+    
+    try:
+        return pool.http
+    
+    except AttributeError:
+        pool.http = httplib2.Http(cache_folder, timeout=timeout)
+        return pool.http
+
+def reset():
+    '''Closes the connections of the current thread.'''
+    
+    try:
+        http = pool.http
+    except AttributeError:
+        return
+    
+    for connection in http.connections.values():
+        connection.close()
+    
+    del pool.http
+
+def request(url, method="GET", headers=None, body=None):
+    '''Sends a request over the pooled connections of the current thread. GET and HEAD
+    requests are retried once on a new connection if the connection breaks.
+    
+    Parameters
+    @url: The URL to connect to.
+    @method: The HTTP method.
+    @headers: A dictionary of request headers or None.
+    @body: The request body or None.
+    
+    Returns
+    @response: The httplib2 Response.
+    @content: The content of the response.'''
+    
+    try:
+        return get_http().request(url, method, headers=headers, body=body)
+    
+    except (socket.error, httplib.HTTPException):
+        # A broken keep-alive connection is dropped. Only idempotent requests are tried
+        # once more, since the server may have handled the first one already.
+        reset()
+        
+        if not method in ['GET', 'HEAD']:
+            raise
+        
+        return get_http().request(url, method, headers=headers, body=body)
+
+def read(url, headers=None):
+    '''Returns the content of a GET request.
+    
+    Parameters
+    @url: The URL to connect to.
+    @headers: A dictionary of request headers or None.
+    
+    Returns
+    @content: The content of the response.'''
+    
+    response, content = request(url, "GET", headers=headers)
+    
+    if not response['status'] == '200':
+        raise HttpError(url, response['status'])
+    
+    return content
@@ -0,0 +1,221 @@
+## LocationTable.py
+## Columnar binary table of locations, written by GatherLocations and read by GeonamesLocations.
+
+import array, math, os, struct, sys
+
+# The file starts with the magic and the number of rows, followed by the columns:
+# latitude and longitude (doubles, NaN if missing), precision (signed bytes, -1 if
+# missing) and the string columns (offsets into an utf-8 string table, empty if missing).
+magic = 'IATILOC1'
+header = struct.Struct('<8sI')
+string_columns = ['link', 'label', 'country_label']
+
+class LocationTable :
+    '''Class for a table of locations, with a typed array per numeric column and a
+    list per string column.'''
+    
+    def __init__(self):
+        '''Initializes an empty table.'''
+        
+        self.latitudes = array.array('d')
+        self.longitudes = array.array('d')
+        self.precisions = array.array('b')
+        self.strings = dict([(column, []) for column in string_columns])
+    
+    def __len__(self):
+        return len(self.precisions)
+    
+    def append(self, location):
+        '''Adds a location to the table.
+        
+        Parameters
+        @location: A dictionary of location information, with the URI under 'link'.'''
+        
+        self.latitudes.append(parse_float(location.get('latitude')))
+        self.longitudes.append(parse_float(location.get('longitude')))
+        self.precisions.append(parse_precision(location.get('precision')))
+        
+        for column in string_columns:
+            value = location.get(column)
+            
+            if value == None:
+                value = ''
+            elif isinstance(value, unicode):
+                value = value.encode('utf-8')
+            
+            self.strings[column].append(value)
+    
+    def location(self, index):
+        '''Returns a row of the table as a dictionary, with only the available information.
+        
+        Parameters
+        @index: The index of the row.
+        
+        Returns
+        @location: A dictionary of location information.'''
+        
+        location = {}
+        
+        for column in string_columns:
+            if not self.strings[column][index] == '':
+                location[column] = self.strings[column][index]
+        
+        if not math.isnan(self.latitudes[index]):
+            location['latitude'] = repr(self.latitudes[index])
+        
+        if not math.isnan(self.longitudes[index]):
+            location['longitude'] = repr(self.longitudes[index])
+        
+        if not self.precisions[index] == -1:
+            location['precision'] = str(self.precisions[index])
+        
+        return location
+    
+    def locations(self):
+        '''Returns all rows of the table as dictionaries.
+        
+        Returns
+        @locations: A list of dictionaries of location information.'''
+        
+        return [self.location(index) for index in range(len(self))]
+
+def parse_float(value):
+    '''Returns a coordinate as a float.
+    
+    Parameters
+    @value: A string of the coordinate or None.
+    
+    Returns
+    @value: The float, or NaN if missing or not a number.'''
+    
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+def parse_precision(value):
+    '''Returns a precision code as an integer.
+    
+    Parameters
+    @value: A string of the precision code or None.
+    
+    Returns
+    @value: The integer, or -1 if missing or not a number.'''
+    
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return -1
+    
+    if (value < 0) or (value > 127):
+        return -1
+    
+    return value
+
+def write_array(file, values):
+    '''Writes an array in little-endian byte order.
+    
+    Parameters
+    @file: An open file.
+    @values: An array.array.'''
+    
+    if sys.byteorder == 'big':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    
+    values.tofile(file)
+
+def read_array(file, typecode, count):
+    '''Reads an array in little-endian byte order.
+    
+    Parameters
+    @file: An open file.
+    @typecode: The type code of the array.
+    @count: The number of values.
+    
+    Returns
+    @values: An array.array.'''
+    
+    values = array.array(typecode)
+    values.fromfile(file, count)
+    
+    if sys.byteorder == 'big':
+        values.byteswap()
+    
+    return values
+
+def write_strings(file, strings):
+    '''Writes a string column as the offsets of the strings followed by the strings.
+    
+    Parameters
+    @file: An open file.
+    @strings: A list of utf-8 encoded strings.'''
+    
+    offsets = array.array('I', [0])
+    
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+    
+    write_array(file, offsets)
+    file.write(''.join(strings))
+
+def read_strings(file, count):
+    '''Reads a string column.
+    
+    Parameters
+    @file: An open file.
+    @count: The number of strings.
+    
+    Returns
+    @strings: A list of utf-8 encoded strings.'''
+    
+    offsets = read_array(file, 'I', count + 1)
+    data = file.read(offsets[-1])
+    
+    return [data[offsets[index]:offsets[index + 1]] for index in range(count)]
+
+def write_table(table, file_name):
+    '''Writes a table to a file. The file is written under a temporary name first, so a
+    partly written table is never read.
+    
+    Parameters
+    @table: A LocationTable.
+    @file_name: The location of the file.'''
+    
+    with open(file_name + '.part', 'wb') as file:
+        file.write(header.pack(magic, len(table)))
+        
+        write_array(file, table.latitudes)
+        write_array(file, table.longitudes)
+        write_array(file, table.precisions)
+        
+        for column in string_columns:
+            write_strings(file, table.strings[column])
+    
+    os.rename(file_name + '.part', file_name)
+
+def read_table(file_name):
+    '''Reads a table from a file.
+    
+    Parameters
+    @file_name: The location of the file.
+    
+    Returns
+    @table: A LocationTable.'''
+    
+    table = LocationTable()
+    
+    with open(file_name, 'rb') as file:
+        file_magic, count = header.unpack(file.read(header.size))
+        
+        if not file_magic == magic:
+            raise ValueError("Not a location table: " + file_name)
+        
+        table.latitudes = read_array(file, 'd', count)
+        table.longitudes = read_array(file, 'd', count)
+        table.precisions = read_array(file, 'b', count)
+        
+        for column in string_columns:
+            table.strings[column] = read_strings(file, count)
+    
+    return table
@@ -0,0 +1,121 @@
+## LookupCache.py
+## Persistent cache of location lookups, so duplicates and reruns do not query the web services again.
+
+import sqlite3, time, GeonamesIndex
+
+# Settings
+coordinate_decimals = 4
+
+class LookupCache :
+    '''Class for a SQLite cache of lookup results, keyed by algorithm, normalised
+    parameters and precision. Matches and misses are both stored, and expire after
+    a time to live.'''
+    
+    def __init__(self, file_name, ttl=None):
+        '''Initializes the cache.
+        
+        Parameters
+        @file_name: The location of the SQLite database, created if it does not exist.
+        @ttl: The number of seconds a result stays valid, or None to keep results.'''
+        
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        
+        self.connection = sqlite3.connect(file_name)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS lookups ('
+                                'algorithm TEXT NOT NULL, '
+                                'parameters TEXT NOT NULL, '
+                                'precision TEXT NOT NULL, '
+                                'match TEXT NOT NULL, '
+                                'stored REAL NOT NULL, '
+                                'PRIMARY KEY (algorithm, parameters, precision))')
+        self.connection.commit()
+    
+    def get(self, key):
+        '''Returns the stored result of a lookup.
+        
+        Parameters
+        @key: A tuple of algorithm, parameters and precision, see location_key.
+        
+        Returns
+        @match: The stored Geonames URI, 0 for a stored miss, or None if the lookup
+                is not stored or has expired.'''
+        
+        row = self.connection.execute('SELECT match, stored FROM lookups '
+                                      'WHERE algorithm = ? AND parameters = ? AND precision = ?', key).fetchone()
+        
+        if (row == None) or ((not self.ttl == None) and (row[1] + self.ttl < time.time())):
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        
+        if row[0] == u"":
+            return 0
+        
+        return str(row[0])
+    
+    def put(self, key, match):
+        '''Stores the result of a lookup. The result is committed at once, so it is
+        kept when the script stops.
+        
+        Parameters
+        @key: A tuple of algorithm, parameters and precision, see location_key.
+        @match: The Geonames URI or 0 if nothing was found.'''
+        
+        if match == 0:
+            match = u""
+        
+        self.connection.execute('INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?)',
+                                key + (match, time.time()))
+        self.connection.commit()
+    
+    def close(self):
+        '''Closes the database.'''
+        
+        self.connection.close()
+
+def normalise_coordinate(coordinate):
+    '''Returns a coordinate rounded to coordinate_decimals decimals.
+    
+    Parameters
+    @coordinate: A string of the coordinate.
+    
+    Returns
+    @coordinate: The rounded coordinate, or the stripped string if it is not a number.'''
+    
+    try:
+        return "%.*f" % (coordinate_decimals, float(coordinate))
+    except ValueError:
+        return coordinate.strip()
+
+def location_key(algorithm, location):
+    '''Returns the cache key of a location, with only the parameters the algorithm uses.
+    
+    Parameters
+    @algorithm: The name of the algorithm.
+    @location: A dictionary of location information, with a classification and, for
+               classification 1, a precision bucket.
+    
+    Returns
+    @key: A tuple of algorithm, parameters and precision.'''
+    
+    classification = location['classification']
+    
+    if classification in [1, 2]:
+        parameters = [normalise_coordinate(location['latitude']), normalise_coordinate(location['longitude'])]
+    elif classification == 3:
+        parameters = [GeonamesIndex.normalise(location['label']), GeonamesIndex.normalise(location['country_label'])]
+    elif classification == 4:
+        parameters = [GeonamesIndex.normalise(location['label'])]
+    else:
+        parameters = [GeonamesIndex.normalise(location['country_label'])]
+    
+    # Precisions in the same bucket are looked up the same way
+    if classification == 1:
+        precision = str(location['bucket'])
+    else:
+        precision = ""
+    
+    return (unicode(algorithm), u"|".join(parameters), unicode(precision))
@@ -0,0 +1,77 @@
+## test_ConversionManifest.py
+## Tests of the conversion manifest. Run from src with: python -m unittest discover -s tests
+
+import os, sys, shutil, tempfile, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'conversion scripts'))
+
+import ConversionManifest, ActivitiesToTurtle
+
+class CodeVersionTest(unittest.TestCase):
+    
+    def test_converter_modules(self):
+        names = [module.__name__ for module in ConversionManifest.converter_modules(ActivitiesToTurtle)]
+        
+        for name in ['ActivitiesToTurtle', 'IatiConverter', 'IatiElements', 'AttributeHelper', 'AddProvenance',
+                     'TripleSink', 'TermCache', 'HandlerStatistics']:
+            self.assertIn(name, names)
+        
+        self.assertNotIn('rdflib', names)
+        self.assertEqual(names, sorted(names))
+    
+    def test_settings_change_version(self):
+        modules = [ConversionManifest]
+        
+        self.assertEqual(ConversionManifest.code_version(modules, ['turtle']),
+                         ConversionManifest.code_version(modules, ['turtle']))
+        self.assertNotEqual(ConversionManifest.code_version(modules, ['turtle']),
+                            ConversionManifest.code_version(modules, ['nt']))
+
+class ConversionManifestTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.document = os.path.join(self.folder, 'doc.xml')
+        self.output = os.path.join(self.folder, 'doc', 'activity.ttl')
+        self.manifest_file = os.path.join(self.folder, 'manifest.json')
+        
+        os.makedirs(os.path.dirname(self.output))
+        
+        for file_name in [self.document, self.output]:
+            with open(file_name, 'w') as file:
+                file.write('content')
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_needs_conversion(self):
+        manifest = ConversionManifest.ConversionManifest(self.manifest_file, 'version-1')
+        
+        self.assertTrue(manifest.needs_conversion(self.document))
+        
+        manifest.record(self.document, [self.output])
+        manifest.save()
+        
+        manifest = ConversionManifest.ConversionManifest(self.manifest_file, 'version-1')
+        self.assertFalse(manifest.needs_conversion(self.document))
+        
+        manifest = ConversionManifest.ConversionManifest(self.manifest_file, 'version-2')
+        self.assertTrue(manifest.needs_conversion(self.document))
+    
+    def test_changed_document(self):
+        manifest = ConversionManifest.ConversionManifest(self.manifest_file, 'version-1')
+        manifest.record(self.document, [self.output])
+        
+        with open(self.document, 'w') as file:
+            file.write('changed content')
+        
+        self.assertTrue(manifest.needs_conversion(self.document))
+    
+    def test_removed_document(self):
+        manifest = ConversionManifest.ConversionManifest(self.manifest_file, 'version-1')
+        manifest.record(self.document, [self.output])
+        
+        self.assertEqual(manifest.remove_documents([]), ['doc.xml'])
+        self.assertFalse(os.path.exists(os.path.dirname(self.output)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+## test_CrawlState.py
+## Tests of the crawl state. Run from src with: python -m unittest discover -s tests
+
+import os, sys, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'conversion scripts'))
+
+import CrawlState
+
+class CrawlStateTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.state = CrawlState.CrawlState(':memory:')
+        self.state.start_run()
+    
+    def next_run(self):
+        self.state.finish_run()
+        self.assertFalse(self.state.start_run())
+    
+    def test_changes(self):
+        self.state.record('activities', 'a', '2013-01-01', 'downloaded', 10, 'hash-a')
+        self.state.record('activities', 'b', '2013-01-01', 'skipped')
+        self.state.record('activities', 'c', None, 'failed')
+        
+        self.assertEqual(self.state.changes('activities'), {'new': 1, 'skipped': 1, 'failed': 1})
+        
+        self.next_run()
+        
+        self.state.record('activities', 'a', '2013-02-01', 'downloaded', 12, 'hash-a2')
+        self.state.record('activities', 'b', '2013-01-01', 'downloaded', 5, 'hash-b')
+        self.state.record('activities', 'c', '2013-01-01', 'unchanged')
+        
+        self.assertEqual(self.state.changes('activities'), {'updated': 1, 'new': 2})
+    
+    def test_needs_update(self):
+        self.assertTrue(self.state.needs_update('activities', 'a', '2013-01-01'))
+        
+        self.state.record('activities', 'a', '2013-01-01', 'downloaded', 10, 'hash-a')
+        
+        self.assertFalse(self.state.needs_update('activities', 'a', '2013-01-01'))
+        self.assertTrue(self.state.needs_update('activities', 'a', '2013-02-01'))
+        
+        self.state.record('activities', 'b', '2013-01-01', 'skipped')
+        
+        self.assertTrue(self.state.needs_update('activities', 'b', '2013-01-01'))
+    
+    def test_resumed_run(self):
+        self.state.record('activities', 'a', '2013-01-01', 'downloaded', 10, 'hash-a')
+        
+        self.assertTrue(self.state.start_run())
+        self.assertTrue(self.state.done_in_run('activities', 'a'))
+        
+        self.state.record('activities', 'a', '2013-01-01', 'unchanged')
+        
+        self.assertEqual(self.state.lookup('activities', 'a')['change'], 'new')
+    
+    def test_removed(self):
+        self.state.record('activities', 'a', '2013-01-01', 'downloaded', 10, 'hash-a')
+        self.state.record('activities', 'b', '2013-01-01', 'downloaded', 10, 'hash-b')
+        
+        self.assertEqual(self.state.mark_removed('activities', ['a']), ['b'])
+        self.assertEqual(self.state.lookup('activities', 'b')['status'], 'removed')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+## test_GatherLocations.py
+## Tests of gathering the locations of converted activities. Run from src with: python -m unittest discover -s tests
+
+import os, sys, shutil, tempfile, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mapping scripts'))
+
+import GatherLocations
+
+activity_turtle = '''@prefix iati: <http://purl.org/collections/iati/> .
+
+<http://purl.org/collections/iati/activity/A/location/1> a iati:location, iati:place ;
+    rdfs:label "Nairobi"@en ;
+    iati:coordinates-precision <http://purl.org/collections/iati/codelist/GeographicalPrecision/10> ;
+    iati:latitude "-1.28" ;
+    iati:longitude "36.81" .
+
+<http://purl.org/collections/iati/activity/A/location/2>  a  iati:location ;
+        rdfs:label "Mombasa"@en .
+
+<http://purl.org/collections/iati/activity/A/recipient-country/KE> a iati:country ;
+    rdfs:label "Kenya"@en .
+
+<http://purl.org/collections/iati/activity/A/location/3> a iati:location .
+
+<http://purl.org/collections/iati/activity/A/other> a iati:location-type ;
+    rdfs:label "Not a location"@en .
+'''
+
+class GatherLocationsTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.activity_file = os.path.join(self.folder, 'A.ttl')
+        
+        with open(self.activity_file, 'w') as file:
+            file.write(activity_turtle)
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_scan_file(self):
+        locations = GatherLocations.scan_file(self.activity_file)
+        
+        self.assertEqual(locations, {'http://purl.org/collections/iati/activity/A/location/1':
+                                         {'label': 'Nairobi', 'precision': '10', 'latitude': '-1.28',
+                                          'longitude': '36.81', 'country_label': 'Kenya'},
+                                     'http://purl.org/collections/iati/activity/A/location/2':
+                                         {'label': 'Mombasa', 'country_label': 'Kenya'},
+                                     'http://purl.org/collections/iati/activity/A/location/3':
+                                         {'country_label': 'Kenya'}})
+    
+    def test_empty_file(self):
+        open(self.activity_file, 'w').close()
+        
+        self.assertEqual(GatherLocations.scan_file(self.activity_file), {})
+    
+    def test_scan_folder(self):
+        folder, locations = GatherLocations.scan_folder(self.folder)
+        
+        self.assertEqual(folder, self.folder)
+        self.assertEqual(len(locations), 3)
+
+if __name__ == "__main__":
+    unittest.main()
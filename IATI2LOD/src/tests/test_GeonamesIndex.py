@@ -0,0 +1,82 @@
+## test_GeonamesIndex.py
+## Tests of the local GeoNames indexes. Run from src with: python -m unittest discover -s tests
+
+import os, sys, shutil, tempfile, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mapping scripts'))
+
+import GeonamesIndex
+
+# geonameid, name, alternate names, latitude, longitude, feature class, feature code, country code, population
+places = [('184745', 'Nairobi', 'Nairobi City,Nairobbi', '-1.28333', '36.81667', 'P', 'PPLC', 'KE', '2750547'),
+          ('186301', 'Mombasa', '', '-4.05466', '39.66359', 'P', 'PPLA', 'KE', '799668'),
+          ('192950', 'Kenya', 'Republic of Kenya', '1', '38', 'A', 'PCLI', 'KE', '40046566'),
+          ('3688689', u'Bogot\xe1'.encode('utf-8'), 'Bogota', '4.60971', '-74.08175', 'P', 'PPLC', 'CO', '7674366'),
+          ('9999999', 'Nairobi Hill', '', '-1.3', '36.8', 'T', 'HLL', 'KE', '0'),
+          ('8888888', 'Date Line', '', '0.5', '179.9', 'P', 'PPL', 'FJ', '10')]
+
+def dump_line(place):
+    geonameid, name, alternate_names, latitude, longitude, feature_class, feature_code, country_code, population = place
+    
+    values = [geonameid, name, name, alternate_names, latitude, longitude, feature_class, feature_code,
+              country_code, '', '', '', '', '', population, '', '', '', '2013-01-01']
+    
+    return '\t'.join(values) + '\n'
+
+class GeonamesIndexTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.dump_file = os.path.join(self.folder, 'dump.txt')
+        
+        with open(self.dump_file, 'w') as file:
+            for place in places:
+                file.write(dump_line(place))
+            
+            file.write('too\tfew\tcolumns\n')
+        
+        self.spatial_index, self.name_index = GeonamesIndex.build_indexes([self.dump_file])
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_read_dump(self):
+        self.assertEqual(len(list(GeonamesIndex.read_dump(self.dump_file))), len(places))
+        self.assertEqual([feature['geonameid'] for feature in GeonamesIndex.read_dump(self.dump_file, ['A'])],
+                         ['192950'])
+    
+    def test_distance(self):
+        self.assertAlmostEqual(GeonamesIndex.distance(0, 0, 0, 1), 111.19, 2)
+    
+    def test_nearest(self):
+        self.assertEqual(self.spatial_index.nearest(-1.29, 36.82)[2], '184745')
+        self.assertEqual(self.spatial_index.nearest(-1.3, 36.8)[2], '9999999')
+        self.assertEqual(self.spatial_index.nearest(-1.3, 36.8, feature_classes=['P'])[2], '184745')
+        self.assertEqual(self.spatial_index.nearest(-4, 39.6, feature_codes=['PPLC'])[2], '184745')
+    
+    def test_nearest_across_date_line(self):
+        self.assertEqual(self.spatial_index.nearest(0.5, -179.9)[2], '8888888')
+    
+    def test_nearest_max_distance(self):
+        self.assertEqual(self.spatial_index.nearest(-1.29, 36.82, max_distance=0.1), None)
+    
+    def test_capitals(self):
+        self.assertEqual(self.spatial_index.capitals, {'KE': '184745', 'CO': '3688689'})
+    
+    def test_normalise(self):
+        self.assertEqual(GeonamesIndex.normalise(u'  Bogot\xe1, D.C. '), u'bogota d c')
+    
+    def test_search(self):
+        self.assertEqual(self.name_index.search('nairobbi'), '184745')
+        self.assertEqual(self.name_index.search(u'BOGOT\xc1'), '3688689')
+        self.assertEqual(self.name_index.search('Republic of Kenya'), '192950')
+        self.assertEqual(self.name_index.search('Nairobi', 'CO'), None)
+        self.assertEqual(self.name_index.search('Timbuktu'), None)
+        self.assertEqual(self.name_index.search('...'), None)
+    
+    def test_search_words(self):
+        # No name equals the label, so the features with all of its words are ranked
+        self.assertEqual(self.name_index.search('hill nairobi'), '9999999')
+        self.assertEqual(self.name_index.search('city nairobi'), '184745')
+
+if __name__ == "__main__":
+    unittest.main()
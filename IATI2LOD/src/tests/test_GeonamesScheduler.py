@@ -0,0 +1,105 @@
+## test_GeonamesScheduler.py
+## Tests of the scheduling of Geonames calls. Run from src with: python -m unittest discover -s tests
+
+import os, sys, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mapping scripts'))
+
+import GeonamesScheduler
+
+limit_response = '<geonames><status message="the daily limit of 20000 credits has been exceeded" value="18"/></geonames>'
+
+class CreditBudgetTest(unittest.TestCase):
+    
+    def test_wait_time(self):
+        budget = GeonamesScheduler.CreditBudget(hourly=2, daily=3)
+        now = 100000.0
+        
+        self.assertEqual(budget.wait_time(now), 0)
+        
+        budget.calls.extend([now - 4000, now - 1800, now - 600])
+        
+        # The daily credits are used, the first call of the last day expires first
+        self.assertEqual(budget.wait_time(now), now - 4000 + 86400 - now)
+        
+        # Calls older than a day are dropped
+        self.assertEqual(budget.wait_time(now + 86400 - 3900), 0)
+        self.assertEqual(len(budget.calls), 2)
+    
+    def test_hourly_credits(self):
+        budget = GeonamesScheduler.CreditBudget(hourly=2, daily=100)
+        now = 100000.0
+        
+        budget.calls.extend([now - 3000, now - 60])
+        
+        self.assertEqual(budget.wait_time(now), 600)
+    
+    def test_exhausted_after_pauses(self):
+        budget = GeonamesScheduler.CreditBudget(pauses=1)
+        
+        budget.pause('19')
+        self.assertFalse(budget.exhausted)
+        
+        # A limit error of a call made before the pause does not count
+        budget.pause('19')
+        self.assertFalse(budget.exhausted)
+        
+        budget.paused_until = 0
+        budget.pause('19')
+        self.assertTrue(budget.exhausted)
+        self.assertFalse(budget.acquire())
+
+class FetchTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.request = GeonamesScheduler.HttpClient.request
+        self.sleep = GeonamesScheduler.time.sleep
+        GeonamesScheduler.time.sleep = lambda seconds: None
+    
+    def tearDown(self):
+        GeonamesScheduler.HttpClient.request = self.request
+        GeonamesScheduler.time.sleep = self.sleep
+    
+    def test_status(self):
+        self.assertEqual(GeonamesScheduler.status(limit_response),
+                         ('18', 'the daily limit of 20000 credits has been exceeded'))
+        self.assertEqual(GeonamesScheduler.status('<geonames><geoname/></geonames>'), (None, None))
+        self.assertEqual(GeonamesScheduler.status('{"geonames": []}'), (None, None))
+    
+    def test_stops_when_exhausted(self):
+        GeonamesScheduler.HttpClient.request = lambda url, method: ({}, limit_response)
+        
+        budget = GeonamesScheduler.CreditBudget(pauses=0)
+        
+        self.assertEqual(GeonamesScheduler.fetch('http://api.geonames.org/findNearby?', budget), None)
+        self.assertTrue(budget.exhausted)
+    
+    def test_retries_overloaded_server(self):
+        responses = ['<geonames><status message="server overloaded" value="22"/></geonames>',
+                     '<geonames><geoname/></geonames>']
+        
+        GeonamesScheduler.HttpClient.request = lambda url, method: ({}, responses.pop(0))
+        
+        budget = GeonamesScheduler.CreditBudget()
+        
+        self.assertEqual(GeonamesScheduler.fetch('http://api.geonames.org/findNearby?', budget),
+                         '<geonames><geoname/></geonames>')
+        self.assertEqual(len(budget.calls), 2)
+
+class SchedulerTest(unittest.TestCase):
+    
+    def test_map(self):
+        scheduler = GeonamesScheduler.Scheduler(3)
+        
+        results = dict(scheduler.map(lambda item, offset: item + offset, range(10), 100))
+        
+        self.assertEqual(results, dict([(item, item + 100) for item in range(10)]))
+    
+    def test_failed_lookup(self):
+        scheduler = GeonamesScheduler.Scheduler(2)
+        
+        results = dict(scheduler.map(lambda item: 10 / item, [0, 5]))
+        
+        self.assertEqual(results, {0: None, 5: 2})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+## test_IatiConverter.py
+## Tests of the conversion of IATI XML to triples. Run from src with: python -m unittest discover -s tests
+## The expected triples in data/activities.nt were written by the converter before the
+## element handlers were dispatched through a tag table.
+
+import os, sys, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'conversion scripts'))
+
+import IatiConverter
+import xml.etree.ElementTree as ET
+from rdflib import Namespace, Graph, Literal
+
+data_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+Iati = Namespace("http://purl.org/collections/iati/")
+
+def convert_activity(xml):
+    '''Returns the graph and the failed elements of an activity.'''
+    
+    converter = IatiConverter.ConvertActivity(xml, '1.01', None)
+    graph, id, last_updated, version, fails = converter.convert(Iati)
+    
+    return graph, fails
+
+def nt_triples(graph):
+    '''Returns the triples of a graph as a set of N-Triples lines.'''
+    
+    return set([line for line in graph.serialize(format='nt').splitlines() if line.strip()])
+
+class ConvertActivityTest(unittest.TestCase):
+    
+    def test_activities_match_expected_triples(self):
+        graph = Graph()
+        
+        for activity in ET.parse(os.path.join(data_folder, 'activities.xml')).getroot().findall('iati-activity'):
+            activity_graph, fails = convert_activity(activity)
+            
+            self.assertEqual(fails, [])
+            
+            for triple in activity_graph:
+                graph.add(triple)
+        
+        with open(os.path.join(data_folder, 'activities.nt'), 'r') as file:
+            expected = set([line for line in file.read().splitlines() if line.strip()])
+        
+        converted = nt_triples(graph)
+        
+        self.assertEqual(sorted(expected - converted), [])
+        self.assertEqual(sorted(converted - expected), [])
+    
+    def test_conditions(self):
+        activity = ET.fromstring('<iati-activity xml:lang="en">'
+                                 '<iati-identifier>NL-1-ACT-3</iati-identifier>'
+                                 '<conditions attached="1">'
+                                 '<condition type="1">Policy reform</condition>'
+                                 '<condition type="2">Performance</condition>'
+                                 '</conditions>'
+                                 '</iati-activity>')
+        
+        graph, fails = convert_activity(activity)
+        
+        self.assertEqual(fails, [])
+        self.assertIn((Iati['activity/NL-1-ACT-3'], Iati['activity-conditions-attached'], Literal('1')), graph)
+        
+        conditions = list(graph.objects(Iati['activity/NL-1-ACT-3'], Iati['activity-condition']))
+        
+        self.assertEqual(len(conditions), 2)
+        self.assertEqual(sorted([graph.value(condition, Iati['condition-type']) for condition in conditions]),
+                         [Iati['codelist/ConditionType/1'], Iati['codelist/ConditionType/2']])
+
+class Elements :
+    
+    def title(self, xml):
+        pass
+    
+    def activity_date(self, xml):
+        pass
+    
+    def convert_unknown(self, xml):
+        pass
+    
+    def _add_record(self, xml):
+        pass
+    
+    def location_key(self, xml, precision):
+        pass
+    
+    id = 'not a handler'
+
+class ElementDispatcherTest(unittest.TestCase):
+    
+    def test_only_tag_handlers(self):
+        dispatcher = IatiConverter.ElementDispatcher(Elements, IatiConverter.activity_handler_name)
+        
+        self.assertEqual(sorted(dispatcher.handlers.keys()), ['activity_date', 'title'])
+    
+    def test_lookup(self):
+        dispatcher = IatiConverter.ElementDispatcher(Elements, IatiConverter.activity_handler_name)
+        
+        self.assertEqual(dispatcher.lookup('activity-date'), ('activity_date', Elements.__dict__['activity_date']))
+        self.assertEqual(dispatcher.lookup('{http://example.org/ext}title'), ('title', Elements.__dict__['title']))
+        self.assertEqual(dispatcher.lookup('_add-record'), ('_add_record', None))
+        self.assertEqual(dispatcher.lookup('location-key'), ('location_key', None))
+        self.assertEqual(dispatcher.lookup('convert-unknown'), ('convert_unknown', None))
+    
+    def test_handler_names(self):
+        self.assertEqual(IatiConverter.activity_handler_name('default-aid-type'), 'aid_type')
+        self.assertEqual(IatiConverter.activity_handler_name('custom:extra-field'), 'extra_field')
+        self.assertEqual(IatiConverter.plain_handler_name('reporting-org'), 'reporting_org')
+    
+    def test_element_classes(self):
+        self.assertNotIn('_add_location_record', IatiConverter.activity_dispatcher.handlers)
+        self.assertIn('conditions', IatiConverter.activity_dispatcher.handlers)
+        self.assertIn('reporting_org', IatiConverter.organisation_dispatcher.handlers)
+
+if __name__ == "__main__":
+    unittest.main()
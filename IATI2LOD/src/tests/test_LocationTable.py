@@ -0,0 +1,58 @@
+## test_LocationTable.py
+## Tests of the columnar location table. Run from src with: python -m unittest discover -s tests
+
+import os, sys, shutil, tempfile, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mapping scripts'))
+
+import LocationTable
+
+class LocationTableTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_round_trip(self):
+        table = LocationTable.LocationTable()
+        table.append({'link': 'http://example.org/location/1', 'label': 'Nairobi', 'country_label': 'Kenya',
+                      'latitude': '-1.28', 'longitude': '36.81', 'precision': '2'})
+        table.append({'link': 'http://example.org/location/2', 'label': u'Bogot\xe1'})
+        
+        file_name = os.path.join(self.folder, 'locations.table')
+        LocationTable.write_table(table, file_name)
+        
+        self.assertFalse(os.path.exists(file_name + '.part'))
+        
+        read = LocationTable.read_table(file_name)
+        
+        self.assertEqual(len(read), 2)
+        self.assertEqual(read.location(0), {'link': 'http://example.org/location/1', 'label': 'Nairobi',
+                                            'country_label': 'Kenya', 'latitude': '-1.28',
+                                            'longitude': '36.81', 'precision': '2'})
+        self.assertEqual(read.location(1), {'link': 'http://example.org/location/2',
+                                            'label': u'Bogot\xe1'.encode('utf-8')})
+    
+    def test_invalid_values_are_missing(self):
+        table = LocationTable.LocationTable()
+        table.append({'link': 'http://example.org/location/1', 'latitude': 'unknown', 'precision': '200'})
+        
+        self.assertEqual(table.locations(), [{'link': 'http://example.org/location/1'}])
+    
+    def test_multi_digit_precision(self):
+        table = LocationTable.LocationTable()
+        table.append({'link': 'http://example.org/location/1', 'precision': '10'})
+        
+        self.assertEqual(table.location(0)['precision'], '10')
+    
+    def test_read_other_file(self):
+        file_name = os.path.join(self.folder, 'locations.help')
+        
+        with open(file_name, 'wb') as file:
+            file.write('Not a table at all')
+        
+        self.assertRaises(ValueError, LocationTable.read_table, file_name)
+
+if __name__ == "__main__":
+    unittest.main()
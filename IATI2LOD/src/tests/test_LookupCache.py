@@ -0,0 +1,66 @@
+## test_LookupCache.py
+## Tests of the cache of location lookups. Run from src with: python -m unittest discover -s tests
+
+import os, sys, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mapping scripts'))
+
+import LookupCache
+
+class LocationKeyTest(unittest.TestCase):
+    
+    def test_coordinates_are_rounded(self):
+        location = {'classification': 1, 'bucket': 2, 'latitude': '-1.283333', 'longitude': ' 36.816667'}
+        
+        self.assertEqual(LookupCache.location_key('algorithm_one', location),
+                         (u'algorithm_one', u'-1.2833|36.8167', u'2'))
+    
+    def test_precisions_of_a_bucket_share_a_key(self):
+        location = {'classification': 1, 'latitude': '10', 'longitude': '20'}
+        other = dict(location)
+        
+        location.update({'precision': '1', 'bucket': 3})
+        other.update({'precision': '2', 'bucket': 3})
+        
+        self.assertEqual(LookupCache.location_key('algorithm_one', location),
+                         LookupCache.location_key('algorithm_one', other))
+    
+    def test_labels_are_normalised(self):
+        location = {'classification': 3, 'label': u'Bogot\xe1,', 'country_label': 'COLOMBIA'}
+        
+        self.assertEqual(LookupCache.location_key('algorithm_three', location),
+                         (u'algorithm_three', u'bogota|colombia', u''))
+    
+    def test_only_used_parameters(self):
+        location = {'classification': 4, 'label': 'Nairobi', 'country_label': 'Kenya'}
+        
+        self.assertEqual(LookupCache.location_key('algorithm_four', location),
+                         (u'algorithm_four', u'nairobi', u''))
+
+class LookupCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.cache = LookupCache.LookupCache(':memory:')
+        self.key = (u'algorithm_four', u'nairobi', u'')
+    
+    def tearDown(self):
+        self.cache.close()
+    
+    def test_match_and_miss(self):
+        self.assertEqual(self.cache.get(self.key), None)
+        
+        self.cache.put(self.key, 'http://sws.geonames.org/184745')
+        self.assertEqual(self.cache.get(self.key), 'http://sws.geonames.org/184745')
+        
+        self.cache.put(self.key, 0)
+        self.assertEqual(self.cache.get(self.key), 0)
+        
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+    
+    def test_expired_results(self):
+        self.cache.ttl = -1
+        self.cache.put(self.key, 'http://sws.geonames.org/184745')
+        
+        self.assertEqual(self.cache.get(self.key), None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+## test_TripleSink.py
+## Tests of the streaming N-Triples and N-Quads writer. Run from src with: python -m unittest discover -s tests
+
+import os, sys, shutil, tempfile, unittest, StringIO
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'conversion scripts'))
+
+import TripleSink
+from rdflib import Graph, Literal, URIRef, BNode, XSD
+
+class TermToNtTest(unittest.TestCase):
+    
+    def test_uri(self):
+        self.assertEqual(TripleSink.term_to_nt(URIRef('http://example.org/a')), u'<http://example.org/a>')
+    
+    def test_blank_node(self):
+        self.assertEqual(TripleSink.term_to_nt(BNode('b1')), u'_:b1')
+    
+    def test_literals(self):
+        self.assertEqual(TripleSink.term_to_nt(Literal('Water')), u'"Water"')
+        self.assertEqual(TripleSink.term_to_nt(Literal('Water', lang='en')), u'"Water"@en')
+        self.assertEqual(TripleSink.term_to_nt(Literal('5', datatype=XSD.integer)),
+                         u'"5"^^<http://www.w3.org/2001/XMLSchema#integer>')
+    
+    def test_escaping(self):
+        self.assertEqual(TripleSink.term_to_nt(Literal(u'say "hi"\\\nnow\r')), u'"say \\"hi\\"\\\\\\nnow\\r"')
+    
+    def test_non_ascii(self):
+        self.assertEqual(TripleSink.term_to_nt(Literal(u'Bogot\xe1 \U0001F30D')), u'"Bogot\\u00E1 \\U0001F30D"')
+        self.assertEqual(TripleSink.term_to_nt(URIRef(u'http://example.org/Bogot\xe1')),
+                         u'<http://example.org/Bogot\\u00E1>')
+
+class NTriplesSinkTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.triples = [(URIRef('http://example.org/activity/1'), URIRef('http://example.org/title'),
+                         Literal(u'Caf\xe9 "Nairobi"\nwells', lang='en')),
+                        (URIRef('http://example.org/activity/1'), URIRef('http://example.org/value'),
+                         Literal('1000', datatype=XSD.decimal)),
+                        (URIRef('http://example.org/activity/1'), URIRef('http://example.org/sector'),
+                         URIRef('http://example.org/sector/14030'))]
+    
+    def test_same_graph(self):
+        file = StringIO.StringIO()
+        sink = TripleSink.NTriplesSink(file)
+        
+        for triple in self.triples + self.triples:
+            sink.add(triple)
+        
+        self.assertEqual(len(sink), 3)
+        
+        graph = Graph()
+        graph.parse(data=file.getvalue(), format='nt')
+        
+        self.assertEqual(set(graph), set(self.triples))
+    
+    def test_quads(self):
+        file = StringIO.StringIO()
+        sink = TripleSink.NTriplesSink(file, 'http://example.org/graph/1')
+        
+        sink.add(self.triples[2])
+        sink.start('http://example.org/graph/2')
+        sink.add(self.triples[2])
+        
+        self.assertEqual(file.getvalue().splitlines(),
+                         ['<http://example.org/activity/1> <http://example.org/sector> '
+                          '<http://example.org/sector/14030> <http://example.org/graph/1> .',
+                          '<http://example.org/activity/1> <http://example.org/sector> '
+                          '<http://example.org/sector/14030> <http://example.org/graph/2> .'])
+
+class ShardWriterTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_shards(self):
+        writer = TripleSink.ShardWriter(os.path.join(self.folder, 'activities'), '.nq', 10)
+        
+        for index in range(3):
+            file_name = os.path.join(self.folder, 'part' + str(index))
+            
+            with open(file_name, 'wb') as file:
+                file.write('x' * 6)
+            
+            writer.add(file_name)
+        
+        writer.close()
+        
+        self.assertEqual(sorted(os.listdir(self.folder)), ['activities-00000.nq', 'activities-00001.nq'])
+        self.assertEqual(os.path.getsize(os.path.join(self.folder, 'activities-00000.nq')), 12)
+
+if __name__ == "__main__":
+    unittest.main()